@@ -3,6 +3,8 @@ import re
 from copy import deepcopy
 from pathlib import Path
 
+from bots_manager import BotManager
+
 
 class BotCreationManager:
 	def __init__(self, bots_folder="../Bots"):
@@ -121,6 +123,7 @@ class BotCreationManager:
 			"active_iam_set": self._default_iam_set(),
 			"active_dataset_id": "",
 			"dataset_injection_persistence": 6,
+			"dataset_injection_token_budget": BotManager.DEFAULT_DATASET_INJECTION_TOKEN_BUDGET,
 			"example_messages": "",
 			"example_injection_threshold": 0,
 		}
@@ -6,19 +6,38 @@ import datetime
 import base64
 import shutil
 import re
+import threading
+import time
 from copy import deepcopy
 from pathlib import Path
 
+from dataset_store import get_dataset_store
+
 
 class BotManager:
     PROTECTED_BOT_NAME = "Nova"
     DEFAULT_IAM_SET = "IAM_1"
+    # Tokens of dataset context injected per turn; 0 disables the cap.
+    DEFAULT_DATASET_INJECTION_TOKEN_BUDGET = 1024
+    # "history_reader": only reads the turn's history snapshot and its own state, safe to run in parallel.
+    # "iam_writer": mutates chat IAM files; "exclusive": unknown side effects. Both run alone.
+    MODULE_CONCURRENCY_CLASSES = ("history_reader", "iam_writer", "exclusive")
+    DEFAULT_MODULE_CONCURRENCY = "exclusive"
+    # Module files are re-stat'ed at most this often; within the window definitions come straight from memory.
+    MODULE_REGISTRY_REVALIDATE_SECONDS = 1.0
 
     def __init__(self, bots_folder="../Bots"):
         """Initialize the bot manager with the path to the Bots folder"""
         self.bots_folder = (Path(__file__).parent / bots_folder).resolve()
         self.current_bot = None
         self.bots_cache = {}
+        self._bot_cache_stamps = {}
+        self._bot_cache_lock = threading.RLock()
+        self._bot_revisions = {}
+        self._bot_revision_counter = 0
+        self._module_registry_lock = threading.RLock()
+        self._module_registry = None
+        self._module_registry_revision = 0
         self._sync_module_settings_for_all_bots()
 
     def _iter_bot_names(self):
@@ -95,6 +114,9 @@ class BotManager:
         return Path(__file__).parent.parent / "Modules"
 
     def _list_available_modules(self):
+        return list(self._load_module_registry()["names"])
+
+    def _scan_module_names(self):
         modules_root = self._modules_root()
         if not modules_root.exists() or not modules_root.is_dir():
             return []
@@ -170,7 +192,12 @@ class BotManager:
         return "\n".join(lines) + ("\n" if lines else "")
 
     def _read_module_default_settings(self, module_name):
-        module_dir = self._modules_root() / module_name
+        entry = self._load_module_registry()["entries"].get(module_name)
+        if entry is not None:
+            return dict(entry["definition"].get("settings_defaults") or {})
+        return self._read_module_default_settings_file(self._modules_root() / module_name, module_name)
+
+    def _read_module_default_settings_file(self, module_dir, module_name):
         settings_file = self._pick_module_settings_file(module_dir, module_name)
         if not settings_file or not settings_file.exists() or not settings_file.is_file():
             return {}
@@ -246,21 +273,27 @@ class BotManager:
             return candidates[0]
         return None
 
-    def _extract_module_prompt(self, python_file, module_name):
+    def _parse_module_source(self, python_file):
         if not python_file or not python_file.exists() or not python_file.is_file():
-            return ""
+            return None
 
         try:
             source = python_file.read_text(encoding='utf-8').strip()
         except Exception:
-            return ""
+            return None
 
         if not source:
-            return ""
+            return None
 
         try:
-            tree = ast.parse(source)
+            return ast.parse(source)
         except Exception:
+            return None
+
+    def _extract_module_prompt(self, python_file, module_name, tree=None):
+        if tree is None:
+            tree = self._parse_module_source(python_file)
+        if tree is None:
             return ""
 
         docstring = ast.get_docstring(tree)
@@ -282,13 +315,40 @@ class BotManager:
 
         return ""
 
-    def get_module_definitions(self):
-        definitions = []
-        modules_root = self._modules_root()
-        if not modules_root.exists() or not modules_root.is_dir():
-            return definitions
+    def _extract_module_scheduling(self, tree):
+        """Read MODULE_DEPENDS_ON / MODULE_CONCURRENCY declarations used by the prompt pipeline scheduler."""
+        scheduling = {"depends_on": [], "concurrency": self.DEFAULT_MODULE_CONCURRENCY}
+        if tree is None:
+            return scheduling
 
-        def _asset_url(module_name, file_path):
+        for node in tree.body:
+            if not isinstance(node, ast.Assign):
+                continue
+            for target in node.targets:
+                if not isinstance(target, ast.Name):
+                    continue
+                try:
+                    value = ast.literal_eval(node.value)
+                except Exception:
+                    continue
+                if target.id == "MODULE_DEPENDS_ON" and isinstance(value, (list, tuple)):
+                    scheduling["depends_on"] = [str(item).strip() for item in value if str(item).strip()]
+                elif target.id == "MODULE_CONCURRENCY" and isinstance(value, str):
+                    concurrency = value.strip().lower()
+                    if concurrency in self.MODULE_CONCURRENCY_CLASSES:
+                        scheduling["concurrency"] = concurrency
+
+        return scheduling
+
+    def _path_stamp(self, path):
+        try:
+            stat = path.stat()
+            return (stat.st_mtime_ns, stat.st_size)
+        except Exception:
+            return None
+
+    def _build_module_registry_entry(self, module_name, module_dir):
+        def _asset_url(file_path):
             if not file_path:
                 return ""
             url = f"/Modules/{module_name}/{file_path.name}"
@@ -298,30 +358,102 @@ class BotManager:
             except Exception:
                 return url
 
-        for module_name in self._list_available_modules():
-            module_dir = modules_root / module_name
-            python_file = self._pick_module_file(module_dir, ".py")
-            script_file = self._pick_module_file(module_dir, ".js")
-            style_file = self._pick_module_file(module_dir, ".css")
-            settings_file = self._pick_module_settings_file(module_dir, module_name)
-            script_files = sorted([path for path in module_dir.glob("*.js") if path.is_file()], key=lambda item: item.name.lower())
-            style_files = sorted([path for path in module_dir.glob("*.css") if path.is_file()], key=lambda item: item.name.lower())
-
-            prompt_text = self._extract_module_prompt(python_file, module_name)
-            definitions.append({
-                "name": module_name,
-                "prompt_key": self._module_prompt_key(module_name),
-                "prompt": prompt_text,
-                "python_file": str(python_file) if python_file else "",
-                "script_url": _asset_url(module_name, script_file),
-                "style_url": _asset_url(module_name, style_file),
-                "script_urls": [_asset_url(module_name, path) for path in script_files],
-                "style_urls": [_asset_url(module_name, path) for path in style_files],
-                "settings_file": _asset_url(module_name, settings_file),
-                "settings_defaults": self._read_module_default_settings(module_name)
-            })
+        python_file = self._pick_module_file(module_dir, ".py")
+        script_file = self._pick_module_file(module_dir, ".js")
+        style_file = self._pick_module_file(module_dir, ".css")
+        settings_file = self._pick_module_settings_file(module_dir, module_name)
+        script_files = sorted([path for path in module_dir.glob("*.js") if path.is_file()], key=lambda item: item.name.lower())
+        style_files = sorted([path for path in module_dir.glob("*.css") if path.is_file()], key=lambda item: item.name.lower())
+
+        module_tree = self._parse_module_source(python_file)
+        prompt_text = self._extract_module_prompt(python_file, module_name, tree=module_tree)
+        scheduling = self._extract_module_scheduling(module_tree)
+        definition = {
+            "name": module_name,
+            "prompt_key": self._module_prompt_key(module_name),
+            "prompt": prompt_text,
+            "python_file": str(python_file) if python_file else "",
+            "script_url": _asset_url(script_file),
+            "style_url": _asset_url(style_file),
+            "script_urls": [_asset_url(path) for path in script_files],
+            "style_urls": [_asset_url(path) for path in style_files],
+            "settings_file": _asset_url(settings_file),
+            "settings_defaults": self._read_module_default_settings_file(module_dir, module_name),
+            "depends_on": scheduling["depends_on"],
+            "concurrency": scheduling["concurrency"]
+        }
+
+        # The folder stamp catches added/removed files; file stamps catch in-place edits.
+        watched = [module_dir, python_file, settings_file, *script_files, *style_files]
+        stamps = {}
+        for path in watched:
+            if path is not None:
+                stamps[str(path)] = self._path_stamp(path)
+        return {"definition": definition, "stamps": stamps}
+
+    def _module_registry_entry_fresh(self, entry):
+        for path_text, stamp in entry["stamps"].items():
+            if self._path_stamp(Path(path_text)) != stamp:
+                return False
+        return True
 
-        return definitions
+    def _load_module_registry(self, force=False):
+        """Return the cached module registry, re-stat'ing module files at most once per revalidate window."""
+        with self._module_registry_lock:
+            registry = self._module_registry
+            now = time.monotonic()
+            if registry is not None and not force and (now - registry["checked_at"]) < self.MODULE_REGISTRY_REVALIDATE_SECONDS:
+                return registry
+
+            modules_root = self._modules_root()
+            root_stamp = self._path_stamp(modules_root)
+            if registry is not None and not force and root_stamp is not None and registry["root_stamp"] == root_stamp:
+                names = registry["names"]
+            else:
+                names = tuple(self._scan_module_names())
+
+            previous_entries = registry["entries"] if registry is not None else {}
+            entries = {}
+            rebuilt = []
+            for module_name in names:
+                entry = previous_entries.get(module_name)
+                if force or entry is None or not self._module_registry_entry_fresh(entry):
+                    entry = self._build_module_registry_entry(module_name, modules_root / module_name)
+                    rebuilt.append(module_name)
+                entries[module_name] = entry
+
+            if registry is not None and not rebuilt and names == registry["names"]:
+                registry["checked_at"] = now
+                return registry
+
+            self._module_registry_revision += 1
+            self._module_registry = {
+                "revision": self._module_registry_revision,
+                "root_stamp": root_stamp,
+                "names": names,
+                "entries": entries,
+                "definitions": [entries[module_name]["definition"] for module_name in names],
+                "checked_at": now,
+            }
+            if registry is not None:
+                print(f"[BotManager] Module registry refreshed: {', '.join(rebuilt) or 'module list changed'}")
+            return self._module_registry
+
+    def invalidate_module_registry(self):
+        with self._module_registry_lock:
+            self._module_registry = None
+        self.invalidate_bot_cache()
+
+    def get_module_names(self):
+        return list(self._load_module_registry()["names"])
+
+    def get_module_definition_map(self):
+        """Shared name -> definition map for hot paths; callers must treat the definitions as read-only."""
+        registry = self._load_module_registry()
+        return {module_name: registry["entries"][module_name]["definition"] for module_name in registry["names"]}
+
+    def get_module_definitions(self):
+        return deepcopy(self._load_module_registry()["definitions"])
 
     def _default_iam_set(self):
         return self.DEFAULT_IAM_SET
@@ -353,6 +485,7 @@ class BotManager:
             "active_iam_set": self._default_iam_set(),
             "active_dataset_id": "",
             "dataset_injection_persistence": 6,
+            "dataset_injection_token_budget": self.DEFAULT_DATASET_INJECTION_TOKEN_BUDGET,
             "example_messages": "",
             "example_injection_threshold": 0,
         }
@@ -363,32 +496,18 @@ class BotManager:
             return ""
         return safe
 
+    def _datasets_file(self):
+        return Path(__file__).parent.parent / "Datasets" / "datasets.json"
+
     def _resolve_dataset_name(self, bot_name, dataset_id):
         safe_dataset_id = self._normalize_active_dataset_id(dataset_id)
         if not safe_dataset_id:
             return "None"
 
-        datasets_file = Path(__file__).parent.parent / "Datasets" / "datasets.json"
-        if not datasets_file.exists() or not datasets_file.is_file():
-            return "None"
-
-        try:
-            payload = json.loads(datasets_file.read_text(encoding='utf-8'))
-        except Exception:
-            return "None"
-
-        datasets = payload.get("datasets") if isinstance(payload, dict) else None
-        if not isinstance(datasets, list):
+        dataset = get_dataset_store(self._datasets_file()).get_dataset(safe_dataset_id)
+        if not isinstance(dataset, dict):
             return "None"
-
-        for row in datasets:
-            if not isinstance(row, dict):
-                continue
-            if str(row.get("id") or "").strip() != safe_dataset_id:
-                continue
-            return str(row.get("name") or "Unnamed Dataset").strip() or "Unnamed Dataset"
-
-        return "None"
+        return str(dataset.get("name") or "Unnamed Dataset").strip() or "Unnamed Dataset"
 
     def _normalize_example_messages(self, value):
         if value is None:
@@ -411,6 +530,19 @@ class BotManager:
             parsed = 6
         return max(0, parsed)
 
+    def _normalize_dataset_injection_token_budget(self, value):
+        if value is None or value == "":
+            return self.DEFAULT_DATASET_INJECTION_TOKEN_BUDGET
+        try:
+            parsed = int(value)
+        except Exception:
+            parsed = self.DEFAULT_DATASET_INJECTION_TOKEN_BUDGET
+        return max(0, parsed)
+
+    def normalize_dataset_injection_token_budget(self, value=None):
+        """Per-bot dataset token budget with BotManager's default applied; used by the prompt pipeline."""
+        return self._normalize_dataset_injection_token_budget(value)
+
     def _normalize_prompt_order(self, prompt_order):
         default_order = self._default_prompt_order()
         if not isinstance(prompt_order, list):
@@ -517,6 +649,7 @@ class BotManager:
                         "active_dataset_id": self._normalize_active_dataset_id(bot_config.get("active_dataset_id")),
                         "active_dataset_name": self._resolve_dataset_name(bot_name, bot_config.get("active_dataset_id")),
                         "dataset_injection_persistence": self._normalize_dataset_injection_persistence(bot_config.get("dataset_injection_persistence", 6)),
+                        "dataset_injection_token_budget": self._normalize_dataset_injection_token_budget(bot_config.get("dataset_injection_token_budget")),
                         "example_messages": self._normalize_example_messages(bot_config.get("example_messages")),
                         "example_injection_threshold": self._normalize_example_injection_threshold(bot_config.get("example_injection_threshold", 0)),
                         "short_description": bot_config.get("short_description", bot_config.get("description", "")[:100])
@@ -524,8 +657,66 @@ class BotManager:
                     
         return bots
     
+    def _bot_source_stamps(self, bot_name):
+        """Stamp every file load_bot reads so a cached bot can be validated without re-reading it."""
+        bot_path = self.bots_folder / bot_name
+        settings_folder = bot_path / "ModuleSettings"
+        registry = self._load_module_registry()
+        paths = [
+            bot_path / "core.txt",
+            bot_path / "scenario.txt",
+            bot_path / "config.json",
+            bot_path / "Coverart",
+            bot_path / "IAMs",
+            settings_folder,
+        ]
+        paths.extend(settings_folder / self._module_settings_filename(module_name) for module_name in registry["names"])
+        stamps = {str(path): self._path_stamp(path) for path in paths}
+        stamps["__module_registry__"] = registry["revision"]
+        # The dataset name shown on the bot comes from the shared store, which may be ahead of the file.
+        stamps["__dataset_store__"] = get_dataset_store(self._datasets_file()).revision()
+        return stamps
+
+    def _cached_bot(self, bot_name, stamps):
+        with self._bot_cache_lock:
+            bot_info = self.bots_cache.get(bot_name)
+            if bot_info is None or self._bot_cache_stamps.get(bot_name) != stamps:
+                return None
+            return deepcopy(bot_info)
+
+    def invalidate_bot_cache(self, bot_name=None):
+        with self._bot_cache_lock:
+            if bot_name is None:
+                self.bots_cache.clear()
+                self._bot_cache_stamps.clear()
+                self._bot_revisions.clear()
+                return
+            self.bots_cache.pop(bot_name, None)
+            self._bot_cache_stamps.pop(bot_name, None)
+            self._bot_revisions.pop(bot_name, None)
+
+    def get_bot_revision(self, bot_name):
+        """Opaque revision that changes whenever the bot is edited or reloaded from changed files."""
+        with self._bot_cache_lock:
+            revision = self._bot_revisions.get(bot_name)
+            if revision is None:
+                # Global counter, so a dropped revision is never handed out again.
+                self._bot_revision_counter += 1
+                revision = self._bot_revision_counter
+                self._bot_revisions[bot_name] = revision
+            return revision
+
     def load_bot(self, bot_name):
-        """Load a specific bot by name"""
+        """Load a specific bot by name, serving unchanged bots from the validated cache"""
+        if not bot_name:
+            return None
+
+        stamps = self._bot_source_stamps(bot_name)
+        cached = self._cached_bot(bot_name, stamps)
+        if cached is not None:
+            self.current_bot = cached
+            return cached
+
         bot_path = self.bots_folder / bot_name
         core_file = bot_path / "core.txt"
         scenario_file = bot_path / "scenario.txt"
@@ -590,6 +781,7 @@ class BotManager:
             "active_dataset_id": self._normalize_active_dataset_id(bot_config.get("active_dataset_id")),
             "active_dataset_name": self._resolve_dataset_name(bot_name, bot_config.get("active_dataset_id")),
             "dataset_injection_persistence": self._normalize_dataset_injection_persistence(bot_config.get("dataset_injection_persistence", 6)),
+            "dataset_injection_token_budget": self._normalize_dataset_injection_token_budget(bot_config.get("dataset_injection_token_budget")),
             "example_messages": self._normalize_example_messages(bot_config.get("example_messages")),
             "example_injection_threshold": self._normalize_example_injection_threshold(bot_config.get("example_injection_threshold", 0)),
             "short_description": bot_config.get("short_description", bot_config.get("description", "")[:100]),
@@ -597,9 +789,14 @@ class BotManager:
             "iams_folder": str(self._get_iams_root(bot_name)),
         }
         
+        # Stamps were taken before reading, so an edit that lands mid-load still forces the next reload.
+        with self._bot_cache_lock:
+            self.bots_cache[bot_name] = bot_info
+            self._bot_cache_stamps[bot_name] = stamps
+            self._bot_revisions.pop(bot_name, None)
+
+        bot_info = deepcopy(bot_info)
         self.current_bot = bot_info
-        self.bots_cache[bot_name] = bot_info
-        
         print(f"[BotManager] Loaded bot '{bot_name}'")
         return bot_info
     
@@ -630,14 +827,8 @@ class BotManager:
 
         try:
             source_path.rename(target_path)
-            if bot_name in self.bots_cache:
-                bot_info = self.bots_cache.pop(bot_name)
-                bot_info["name"] = new_name
-                bot_info["path"] = str(target_path)
-                bot_info["core_file"] = str(target_path / "core.txt")
-                bot_info["iam_folder"] = str(target_path / "IAM")
-                bot_info["iams_folder"] = str(target_path / "IAMs")
-                self.bots_cache[new_name] = bot_info
+            self.invalidate_bot_cache(bot_name)
+            self.invalidate_bot_cache(new_name)
             if self.current_bot and self.current_bot.get("name") == bot_name:
                 self.current_bot["name"] = new_name
                 self.current_bot["path"] = str(target_path)
@@ -710,6 +901,8 @@ class BotManager:
             config["active_dataset_id"] = self._normalize_active_dataset_id(updates.get("active_dataset_id"))
         if updates.get("dataset_injection_persistence") is not None:
             config["dataset_injection_persistence"] = self._normalize_dataset_injection_persistence(updates.get("dataset_injection_persistence"))
+        if updates.get("dataset_injection_token_budget") is not None:
+            config["dataset_injection_token_budget"] = self._normalize_dataset_injection_token_budget(updates.get("dataset_injection_token_budget"))
         if updates.get("example_messages") is not None:
             config["example_messages"] = self._normalize_example_messages(updates.get("example_messages"))
         if updates.get("example_injection_threshold") is not None:
@@ -720,6 +913,7 @@ class BotManager:
         except Exception as e:
             print(f"[BotManager] Error writing config for '{bot_name}': {e}")
 
+        self.invalidate_bot_cache(bot_name)
         return self.load_bot(bot_name)
 
     def _normalize_fit(self, fit):
@@ -908,6 +1102,7 @@ class BotManager:
             target_name = self._sanitize_iam_set_name(iam_set)
             target = iams_root / target_name
             target.mkdir(parents=True, exist_ok=True)
+            self.invalidate_bot_cache(bot_name)
             return target_name
 
         numeric_indexes = [self._extract_iam_index(name) for name in existing]
@@ -915,6 +1110,7 @@ class BotManager:
         next_index = (max(numeric_indexes) + 1) if numeric_indexes else 1
         target_name = f"IAM_{next_index}"
         (iams_root / target_name).mkdir(parents=True, exist_ok=True)
+        self.invalidate_bot_cache(bot_name)
         return target_name
 
     def delete_iam_set(self, bot_name, iam_set):
@@ -948,6 +1144,7 @@ class BotManager:
                 except Exception:
                     pass
 
+        self.invalidate_bot_cache(bot_name)
         return True
 
     def _read_iam_entry(self, iam_file):
@@ -1017,6 +1214,7 @@ class BotManager:
                 print(f"[BotManager] Error replacing IAM for '{bot_name}': {e}")
                 return False
 
+        self.invalidate_bot_cache(bot_name)
         return True
 
     def add_iam(self, bot_name, content, iam_set=None):
@@ -1037,6 +1235,7 @@ class BotManager:
         try:
             serialized = self._serialize_iam_content(content)
             iam_file.write_text(serialized, encoding='utf-8')
+            self.invalidate_bot_cache(bot_name)
             return self._read_iam_entry(iam_file)
         except Exception as e:
             print(f"[BotManager] Error writing IAM for '{bot_name}': {e}")
@@ -1052,6 +1251,7 @@ class BotManager:
             return False
         try:
             iam_file.write_text(self._serialize_iam_content(content), encoding='utf-8')
+            self.invalidate_bot_cache(bot_name)
             return True
         except Exception as e:
             print(f"[BotManager] Error updating IAM for '{bot_name}': {e}")
@@ -1067,6 +1267,7 @@ class BotManager:
             return False
         try:
             iam_file.unlink()
+            self.invalidate_bot_cache(bot_name)
             return True
         except Exception as e:
             print(f"[BotManager] Error deleting IAM for '{bot_name}': {e}")
@@ -1086,8 +1287,7 @@ class BotManager:
             
         try:
             shutil.rmtree(bot_path)
-            if bot_name in self.bots_cache:
-                del self.bots_cache[bot_name]
+            self.invalidate_bot_cache(bot_name)
             if self.current_bot and self.current_bot["name"] == bot_name:
                 self.current_bot = None
             print(f"[BotManager] Deleted bot '{bot_name}'")
@@ -3,7 +3,11 @@
 # Chat metadata stored per-chat in chat_meta.json
 
 import json
+import os
 import shutil
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime
 
@@ -11,14 +15,38 @@ from datetime import datetime
 class ChatManager:
     DEFAULT_IAM_SET = "IAM_1"
     MAX_ASSISTANT_VARIANTS = 6
-
-    def __init__(self, bots_folder="../Bots"):
+    CHAT_INDEX_FILE = "chat_index.json"
+    CHAT_INDEX_VERSION = 1
+    # Per-message index updates are batched; a crash before the write is repaired by mtime drift checks.
+    CHAT_INDEX_SAVE_DEBOUNCE_SECONDS = 2.0
+    STORAGE_MODES = ("journal", "files")
+    JOURNAL_FILE = "chat_journal.jsonl"
+    JOURNAL_FSYNC_BATCH = 8
+    JOURNAL_FSYNC_INTERVAL_SECONDS = 1.0
+    JOURNAL_COMPACT_THRESHOLD = 64
+    CHAT_CACHE_MAX_ENTRIES = 16
+    # Live message lists kept for chats other than the selected one (e.g. replies finishing in the background).
+    CHAT_STATE_MAX_ENTRIES = 16
+
+    def __init__(self, bots_folder="../Bots", storage_mode="journal"):
         """Initialize the chat manager"""
         self.bots_folder = (Path(__file__).parent / bots_folder).resolve()
         self.current_chat_id = None
-        self.current_chat_messages = []
         self.current_bot_name = None
-        
+        self._chat_states_lock = threading.Lock()
+        self._chat_locks = {}
+        self._chat_messages_by_key = OrderedDict()
+        self._chat_index = None
+        self._chat_index_lock = threading.RLock()
+        self._chat_index_dirty = False
+        self._chat_index_timer = None
+        self.storage_mode = "journal"
+        self.set_storage_mode(storage_mode)
+        self._journal_lock = threading.RLock()
+        self._journal_state = {}
+        self._chat_cache = OrderedDict()
+        self._chat_generations = {}
+        self._chat_cache_lock = threading.RLock()
 
     def _ensure_chat_folder_structure(self, bot_name, chat_name):
         """Create the chat folder structure in Bots/{BotName}/Chat{ChatName}/"""
@@ -59,6 +87,7 @@ class ChatManager:
         try:
             meta_file = self._chat_meta_file(chat_folder)
             meta_file.write_text(json.dumps(next_meta, indent=2), encoding='utf-8')
+            self._update_chat_index_meta(chat_folder, next_meta)
             return True
         except Exception as e:
             print(f"[ChatManager] Error saving chat metadata in '{chat_folder}': {e}")
@@ -89,8 +118,8 @@ class ChatManager:
         return self._write_chat_meta(chat_folder, patch)
         
     def _load_chats_list(self):
-        """Legacy compatibility shim: return chats discovered dynamically from bot folders."""
-        return self._scan_all_chats()
+        """Legacy compatibility shim: return chats from the persistent chat index."""
+        return self._indexed_chats()
             
     def _save_chats_list(self, chats_list):
         """Legacy compatibility shim: persist metadata into each chat folder's chat_meta.json."""
@@ -150,28 +179,36 @@ class ChatManager:
         if not iam_folder or not iam_folder.exists():
             return {"user": 0, "total": 0}
 
-        user_count = 0
-        total_count = 0
+        roles_by_file = {}
         for iam_file in sorted(iam_folder.glob("*.txt")):
             try:
                 with open(iam_file, 'r', encoding='utf-8') as f:
                     payload = json.load(f)
 
                 if isinstance(payload, dict) and payload.get("role") in ("user", "assistant"):
-                    total_count += 1
-                    if payload.get("role") == "user":
-                        user_count += 1
+                    roles_by_file[iam_file.name] = [payload.get("role")]
                     continue
 
                 if isinstance(payload, dict) and ("user" in payload or "assistant" in payload):
+                    roles = []
                     if payload.get("user"):
-                        user_count += 1
-                        total_count += 1
+                        roles.append("user")
                     if payload.get("assistant"):
-                        total_count += 1
+                        roles.append("assistant")
+                    roles_by_file[iam_file.name] = roles
             except Exception:
                 continue
 
+        for record in self._read_chat_journal(iam_folder.parent):
+            role = str(record["message"].get("role", "")).strip().lower()
+            if role in ("user", "assistant"):
+                roles_by_file[Path(record["file"]).name] = [role]
+
+        user_count = 0
+        total_count = 0
+        for roles in roles_by_file.values():
+            total_count += len(roles)
+            user_count += sum(1 for role in roles if role == "user")
         return {"user": user_count, "total": total_count}
 
     def _count_user_messages_in_iam_files(self, iam_folder):
@@ -181,16 +218,14 @@ class ChatManager:
         if not chat_id:
             return 0
 
-        for chat in self._load_chats_list():
-            if chat.get("id") != chat_id:
-                continue
+        chat = self._find_chat_index_entry(chat_id, bot_name)
+        if chat:
             stored = chat.get("total_message_count")
             if isinstance(stored, int):
                 return stored
             stored_legacy = chat.get("message_count")
             if isinstance(stored_legacy, int):
                 return stored_legacy
-            break
 
         chat_folder = self._get_chat_folder(chat_id, bot_name)
         if not chat_folder:
@@ -201,13 +236,11 @@ class ChatManager:
         if not chat_id:
             return 0
 
-        for chat in self._load_chats_list():
-            if chat.get("id") != chat_id:
-                continue
+        chat = self._find_chat_index_entry(chat_id, bot_name)
+        if chat:
             stored = chat.get("user_message_count")
             if isinstance(stored, int):
                 return stored
-            break
 
         chat_folder = self._get_chat_folder(chat_id, bot_name)
         if not chat_folder:
@@ -223,51 +256,56 @@ class ChatManager:
         for chat_dir in bot_dir.iterdir():
             if not chat_dir.is_dir() or not chat_dir.name.startswith("Chat"):
                 continue
-
-            iam_folder = chat_dir / "IAM"
-            message_count = 0
-            user_message_count = 0
-            last_message_time = None
-            if iam_folder.exists():
-                iam_files = list(iam_folder.glob("*.txt"))
-                counts = self._count_messages_in_iam_files(iam_folder)
-                user_message_count = int(counts.get("user", 0))
-                message_count = int(counts.get("total", 0))
-                if iam_files:
-                    last_message_time = max(f.stat().st_mtime for f in iam_files)
-
-            title, timestamp = self._parse_chat_folder_name(chat_dir.name)
-            if timestamp is None:
-                timestamp = datetime.fromtimestamp(chat_dir.stat().st_mtime).strftime("%Y%m%d_%H%M%S")
-
-            if last_message_time is None:
-                last_updated = datetime.fromtimestamp(chat_dir.stat().st_mtime).strftime("%Y%m%d_%H%M%S")
-            else:
-                last_updated = datetime.fromtimestamp(last_message_time).strftime("%Y%m%d_%H%M%S")
-
-            meta = self._read_chat_meta(chat_dir)
-            title = str(meta.get("title") or title)
-            created = str(meta.get("created") or timestamp)
-            updated = str(meta.get("last_updated") or last_updated)
-            last_opened = str(meta.get("last_opened") or updated)
-            persona_name = str(meta.get("persona_name") or "User")
-
-            chats.append({
-                "id": chat_dir.name,
-                "bot": bot_name,
-                "title": title,
-                "created": created,
-                "last_updated": updated,
-                "last_opened": last_opened,
-                "persona_name": persona_name,
-                "message_count": message_count,
-                "user_message_count": user_message_count,
-                "total_message_count": message_count,
-                "chat_folder": str(chat_dir)
-            })
+            chats.append(self._scan_chat_dir(bot_name, chat_dir))
 
         return chats
 
+    def _scan_chat_dir(self, bot_name, chat_dir):
+        iam_folder = chat_dir / "IAM"
+        message_count = 0
+        user_message_count = 0
+        last_message_time = None
+        if iam_folder.exists():
+            iam_files = list(iam_folder.glob("*.txt"))
+            counts = self._count_messages_in_iam_files(iam_folder)
+            user_message_count = int(counts.get("user", 0))
+            message_count = int(counts.get("total", 0))
+            journal_file = self._journal_file(chat_dir)
+            if journal_file.exists():
+                iam_files.append(journal_file)
+            if iam_files:
+                last_message_time = max(f.stat().st_mtime for f in iam_files)
+
+        title, timestamp = self._parse_chat_folder_name(chat_dir.name)
+        if timestamp is None:
+            timestamp = datetime.fromtimestamp(chat_dir.stat().st_mtime).strftime("%Y%m%d_%H%M%S")
+
+        if last_message_time is None:
+            last_updated = datetime.fromtimestamp(chat_dir.stat().st_mtime).strftime("%Y%m%d_%H%M%S")
+        else:
+            last_updated = datetime.fromtimestamp(last_message_time).strftime("%Y%m%d_%H%M%S")
+
+        meta = self._read_chat_meta(chat_dir)
+        title = str(meta.get("title") or title)
+        created = str(meta.get("created") or timestamp)
+        updated = str(meta.get("last_updated") or last_updated)
+        last_opened = str(meta.get("last_opened") or updated)
+        persona_name = str(meta.get("persona_name") or "User")
+
+        return {
+            "id": chat_dir.name,
+            "bot": bot_name,
+            "title": title,
+            "created": created,
+            "last_updated": updated,
+            "last_opened": last_opened,
+            "persona_name": persona_name,
+            "message_count": message_count,
+            "user_message_count": user_message_count,
+            "total_message_count": message_count,
+            "chat_folder": str(chat_dir)
+        }
+
     def _scan_all_chats(self):
         if not self.bots_folder.exists():
             return []
@@ -280,7 +318,307 @@ class ChatManager:
 
         chats.sort(key=lambda x: x.get("last_opened") or x.get("last_updated", ""), reverse=True)
         return chats
-            
+
+    # Persistent chat index (Bots/chat_index.json)
+    # Entries are keyed by "<bot>/<chat id>" and carry the same fields as a chat scan plus
+    # the IAM/meta mtimes seen when the entry was built. Bot folder mtimes are tracked so that
+    # chats added/removed outside the app are picked up by rescanning only the affected bot.
+
+    def _chat_index_file(self):
+        return self.bots_folder / self.CHAT_INDEX_FILE
+
+    def _chat_index_key(self, bot_name, chat_id):
+        return f"{bot_name}/{chat_id}"
+
+    def _path_mtime(self, path):
+        try:
+            return Path(path).stat().st_mtime_ns
+        except Exception:
+            return None
+
+    def _empty_chat_index(self):
+        return {"version": self.CHAT_INDEX_VERSION, "bots": {}, "chats": {}}
+
+    def _build_chat_index_entry(self, bot_name, chat_dir):
+        chat_dir = Path(chat_dir)
+        entry = self._scan_chat_dir(bot_name, chat_dir)
+        entry["iam_mtime"] = self._path_mtime(chat_dir / "IAM")
+        entry["meta_mtime"] = self._path_mtime(self._chat_meta_file(chat_dir))
+        return entry
+
+    def _public_chat_index_entry(self, entry):
+        chat = dict(entry)
+        chat.pop("iam_mtime", None)
+        chat.pop("meta_mtime", None)
+        return chat
+
+    def _read_chat_index_file(self):
+        index_file = self._chat_index_file()
+        if not index_file.exists():
+            return None
+        try:
+            payload = json.loads(index_file.read_text(encoding='utf-8').strip() or "{}")
+        except Exception as e:
+            print(f"[ChatManager] Chat index unreadable, rebuilding: {e}")
+            return None
+        if not isinstance(payload, dict) or payload.get("version") != self.CHAT_INDEX_VERSION:
+            return None
+        if not isinstance(payload.get("bots"), dict) or not isinstance(payload.get("chats"), dict):
+            return None
+        return payload
+
+    def _save_chat_index(self):
+        with self._chat_index_lock:
+            if self._chat_index is None or not self.bots_folder.exists():
+                return False
+            if self._chat_index_timer is not None:
+                self._chat_index_timer.cancel()
+                self._chat_index_timer = None
+            index_file = self._chat_index_file()
+            temp_file = index_file.with_name(f"{index_file.name}.tmp")
+            try:
+                temp_file.write_text(json.dumps(self._chat_index, separators=(",", ":")), encoding='utf-8')
+                os.replace(temp_file, index_file)
+                self._chat_index_dirty = False
+                return True
+            except Exception as e:
+                print(f"[ChatManager] Error saving chat index: {e}")
+                return False
+
+    def _mark_chat_index_dirty(self):
+        """Schedule a debounced index write for per-message updates."""
+        with self._chat_index_lock:
+            self._chat_index_dirty = True
+            if self._chat_index_timer is not None:
+                return
+            timer = threading.Timer(self.CHAT_INDEX_SAVE_DEBOUNCE_SECONDS, self._flush_chat_index)
+            timer.daemon = True
+            self._chat_index_timer = timer
+            timer.start()
+
+    def _flush_chat_index(self):
+        with self._chat_index_lock:
+            self._chat_index_timer = None
+            if not self._chat_index_dirty:
+                return True
+            return self._save_chat_index()
+
+    def flush(self):
+        """Sync pending journal appends and write pending chat index changes; call on shutdown."""
+        self._sync_chat_journals()
+        return self._flush_chat_index()
+
+    def _chat_index_bot_dirs(self):
+        if not self.bots_folder.exists():
+            return {}
+        bot_dirs = {}
+        for bot_dir in self.bots_folder.iterdir():
+            if bot_dir.is_dir():
+                bot_dirs[bot_dir.name] = bot_dir
+        return bot_dirs
+
+    def _reindex_bot_chats(self, index, bot_name, bot_dir, deep=False):
+        """Sync one bot's index entries with its chat folders, reusing entries whose mtimes match."""
+        chats = index["chats"]
+        prefix = f"{bot_name}/"
+        seen_keys = set()
+        changed = False
+        for chat_dir in bot_dir.iterdir():
+            if not chat_dir.is_dir() or not chat_dir.name.startswith("Chat"):
+                continue
+            key = self._chat_index_key(bot_name, chat_dir.name)
+            seen_keys.add(key)
+            entry = chats.get(key)
+            if entry is not None and not deep:
+                continue
+            if entry is not None and not self._chat_index_entry_drifted(entry, chat_dir):
+                continue
+            chats[key] = self._build_chat_index_entry(bot_name, chat_dir)
+            changed = True
+
+        for key in [key for key in chats if key.startswith(prefix) and key not in seen_keys]:
+            chats.pop(key, None)
+            changed = True
+
+        index["bots"][bot_name] = self._path_mtime(bot_dir)
+        return changed
+
+    def _chat_index_entry_drifted(self, entry, chat_dir):
+        if entry.get("chat_folder") != str(chat_dir):
+            return True
+        if entry.get("iam_mtime") != self._path_mtime(chat_dir / "IAM"):
+            return True
+        return entry.get("meta_mtime") != self._path_mtime(self._chat_meta_file(chat_dir))
+
+    def _refresh_chat_index(self, deep=False):
+        """Load the chat index and repair drift.
+
+        A shallow refresh only rescans bots whose folder mtime changed; a deep refresh also
+        re-stats every chat's IAM folder and chat_meta.json.
+        """
+        with self._chat_index_lock:
+            index = self._chat_index
+            changed = False
+            if index is None:
+                index = self._read_chat_index_file()
+                if index is None:
+                    index = self._empty_chat_index()
+                    changed = True
+                self._chat_index = index
+
+            bot_dirs = self._chat_index_bot_dirs()
+            for bot_name, bot_dir in bot_dirs.items():
+                if not deep and index["bots"].get(bot_name) == self._path_mtime(bot_dir):
+                    continue
+                if self._reindex_bot_chats(index, bot_name, bot_dir, deep=deep):
+                    changed = True
+
+            for bot_name in [name for name in index["bots"] if name not in bot_dirs]:
+                index["bots"].pop(bot_name, None)
+                changed = True
+            for key in [key for key, entry in index["chats"].items() if entry.get("bot") not in bot_dirs]:
+                index["chats"].pop(key, None)
+                changed = True
+
+            if changed:
+                self._save_chat_index()
+            return index
+
+    def rebuild_chat_index(self):
+        """Discard the chat index and rebuild it from the chat folders on disk."""
+        with self._chat_index_lock:
+            self._chat_index = self._empty_chat_index()
+            index = self._refresh_chat_index(deep=True)
+            print(f"[ChatManager] Rebuilt chat index with {len(index['chats'])} chats")
+            return len(index["chats"])
+
+    def _ensure_chat_index(self):
+        with self._chat_index_lock:
+            if self._chat_index is None:
+                return self._refresh_chat_index()
+            return self._chat_index
+
+    def _indexed_chats(self, bot_name=None, deep=False):
+        with self._chat_index_lock:
+            index = self._refresh_chat_index(deep=deep)
+            chats = [
+                self._public_chat_index_entry(entry)
+                for entry in index["chats"].values()
+                if bot_name is None or entry.get("bot") == bot_name
+            ]
+        chats.sort(key=lambda x: x.get("last_opened") or x.get("last_updated", ""), reverse=True)
+        return chats
+
+    def _find_chat_index_entry(self, chat_id, bot_name=None, refresh=True):
+        if not chat_id:
+            return None
+        with self._chat_index_lock:
+            index = self._ensure_chat_index()
+            entry = self._lookup_chat_index_entry(index, chat_id, bot_name)
+            if entry is None and refresh:
+                entry = self._lookup_chat_index_entry(self._refresh_chat_index(), chat_id, bot_name)
+            return self._public_chat_index_entry(entry) if entry else None
+
+    def _lookup_chat_index_entry(self, index, chat_id, bot_name=None):
+        chats = index.get("chats", {})
+        if bot_name:
+            return chats.get(self._chat_index_key(bot_name, chat_id))
+        for entry in chats.values():
+            if entry.get("id") == chat_id:
+                return entry
+        return None
+
+    def _index_chat_folder(self, chat_folder):
+        """Return the (bot, chat id) pair for a chat folder under the bots folder."""
+        try:
+            chat_folder = Path(chat_folder)
+            if chat_folder.parent.parent != self.bots_folder:
+                return None, None
+            return chat_folder.parent.name, chat_folder.name
+        except Exception:
+            return None, None
+
+    def _update_chat_index_meta(self, chat_folder, meta):
+        bot_name, chat_id = self._index_chat_folder(chat_folder)
+        if not bot_name or not chat_id.startswith("Chat"):
+            return
+        with self._chat_index_lock:
+            self._ensure_chat_index()
+            key = self._chat_index_key(bot_name, chat_id)
+            entry = self._chat_index["chats"].get(key)
+            changed = entry is None
+            if entry is None:
+                entry = self._build_chat_index_entry(bot_name, Path(chat_folder))
+                self._chat_index["chats"][key] = entry
+            updates = {
+                field: str(meta.get(field))
+                for field in ("title", "persona_name", "created", "last_updated", "last_opened")
+                if meta.get(field) is not None
+            }
+            updates["meta_mtime"] = self._path_mtime(self._chat_meta_file(chat_folder))
+            if any(entry.get(field) != value for field, value in updates.items()):
+                entry.update(updates)
+                changed = True
+            bot_mtime = self._path_mtime(Path(chat_folder).parent)
+            if self._chat_index["bots"].get(bot_name) != bot_mtime:
+                self._chat_index["bots"][bot_name] = bot_mtime
+                changed = True
+            if changed:
+                self._mark_chat_index_dirty()
+
+    def _update_chat_index_counts(self, chat_folder, messages=None):
+        bot_name, chat_id = self._index_chat_folder(chat_folder)
+        if not bot_name or not chat_id.startswith("Chat"):
+            return
+        with self._chat_index_lock:
+            self._ensure_chat_index()
+            key = self._chat_index_key(bot_name, chat_id)
+            entry = self._chat_index["chats"].get(key)
+            if entry is None:
+                self._chat_index["chats"][key] = self._build_chat_index_entry(bot_name, Path(chat_folder))
+                self._mark_chat_index_dirty()
+                return
+            updates = {"iam_mtime": self._path_mtime(Path(chat_folder) / "IAM")}
+            if messages is not None:
+                total_count = self._count_total_messages(messages)
+                updates["message_count"] = total_count
+                updates["total_message_count"] = total_count
+                updates["user_message_count"] = self._count_user_messages(messages)
+            if any(entry.get(field) != value for field, value in updates.items()):
+                entry.update(updates)
+                self._mark_chat_index_dirty()
+
+    def _remove_chat_index_entries(self, bot_name, chat_id=None):
+        with self._chat_index_lock:
+            self._ensure_chat_index()
+            chats = self._chat_index["chats"]
+            if chat_id:
+                keys = [self._chat_index_key(bot_name, chat_id)]
+            else:
+                keys = [key for key, entry in chats.items() if entry.get("bot") == bot_name]
+                self._chat_index["bots"].pop(bot_name, None)
+            for key in keys:
+                chats.pop(key, None)
+            bot_dir = self.bots_folder / bot_name
+            if chat_id and bot_dir.exists():
+                self._chat_index["bots"][bot_name] = self._path_mtime(bot_dir)
+            self._save_chat_index()
+
+    def _rename_chat_index_bot(self, bot_name, new_name):
+        with self._chat_index_lock:
+            self._ensure_chat_index()
+            chats = self._chat_index["chats"]
+            new_bot_dir = self.bots_folder / new_name
+            for key in [key for key, entry in chats.items() if entry.get("bot") == bot_name]:
+                entry = chats.pop(key)
+                entry["bot"] = new_name
+                entry["chat_folder"] = str(new_bot_dir / entry.get("id", ""))
+                chats[self._chat_index_key(new_name, entry.get("id", ""))] = entry
+            self._chat_index["bots"].pop(bot_name, None)
+            if new_bot_dir.exists():
+                self._chat_index["bots"][new_name] = self._path_mtime(new_bot_dir)
+            self._save_chat_index()
+
     def create_chat(self, bot_name, title=None, persona_name=None, iam_set=None):
         """Create a new chat conversation in Bots/{BotName}/Chat{ChatName}/"""
         timestamp = self._now_compact()
@@ -317,12 +655,15 @@ class ChatManager:
         })
         
         iam_messages = self._load_bot_iam_messages(bot_name, persona_name, iam_set)
+        key = self._chat_key(chat_id, bot_name)
+        with self._chat_lock(key):
+            self._store_chat_messages(key, iam_messages)
+            if iam_messages:
+                self._save_chat_messages(chat_id, iam_messages, bot_name)
         self.current_chat_id = chat_id
-        self.current_chat_messages = iam_messages
         self.current_bot_name = bot_name
 
         if iam_messages:
-            self._save_chat_messages(chat_id, iam_messages, bot_name)
             total_count = self._count_total_messages(iam_messages)
             user_count = self._count_user_messages(iam_messages)
             chat_info["message_count"] = total_count
@@ -335,10 +676,7 @@ class ChatManager:
     def get_chat_info(self, chat_id):
         if not chat_id:
             return None
-        for chat in self._load_chats_list():
-            if chat.get("id") == chat_id:
-                return chat
-        return None
+        return self._find_chat_index_entry(chat_id)
 
     def get_chat_persona(self, chat_id):
         chat_info = self.get_chat_info(chat_id)
@@ -450,17 +788,39 @@ class ChatManager:
         if self.current_bot_name == bot_name:
             self.current_bot_name = new_name
 
+        with self._chat_states_lock:
+            for key in [key for key in self._chat_locks if key[0] == bot_name]:
+                self._chat_locks[(new_name, key[1])] = self._chat_locks.pop(key)
+
+        self._rename_chat_index_bot(bot_name, new_name)
+        self.invalidate_chat_cache()
         return True
         
     def load_chat(self, chat_id, bot_name):
-        """Load a specific chat by ID from Bots/{BotName}/Chat{ChatName}/IAM/"""
+        """Load a specific chat by ID from Bots/{BotName}/Chat{ChatName}/IAM/ and make it the current chat"""
+        chat_folder, preferred_bot = self._resolve_chat_folder(chat_id, bot_name)
+        if chat_folder is None or not chat_folder.exists():
+            print(f"[ChatManager] Chat folder '{chat_folder}' not found")
+            return None
+
+        key = self._chat_key(chat_id, preferred_bot)
+        with self._chat_lock(key):
+            messages = self._load_chat_folder_messages(chat_folder)
+            self._store_chat_messages(key, messages)
+            public_messages = self._public_chat_messages(messages)
+
+        self.current_chat_id = chat_id
+        self.current_bot_name = preferred_bot
+
+        self._touch_chat_meta(chat_folder, include_opened=True)
+        
+        print(f"[ChatManager] Loaded chat '{chat_id}' with {len(messages)} messages")
+        return public_messages
+
+    def _resolve_chat_folder(self, chat_id, bot_name):
+        """Find a chat's folder; returns (chat_folder or None, bot name it belongs to)."""
         # Find chat info to get exact folder
-        chats_list = self._load_chats_list()
-        chat_info = None
-        for chat in chats_list:
-            if chat["id"] == chat_id:
-                chat_info = chat
-                break
+        chat_info = self._find_chat_index_entry(chat_id, bot_name) or self._find_chat_index_entry(chat_id)
 
         chat_folder = None
         preferred_bot = bot_name or (chat_info.get("bot") if chat_info else None)
@@ -492,11 +852,101 @@ class ChatManager:
                             chat_folder = scanned_folder
                             break
 
+        return chat_folder, preferred_bot
+
+    # Per-chat message state
+    # Every chat that is being written keeps its own live message list and lock, keyed by
+    # (bot, chat id), so a reply saved to one chat can never be journaled into another while
+    # the user switches chats. current_chat_messages is the list of the selected chat.
+
+    @property
+    def current_chat_messages(self):
+        if not self.current_chat_id:
+            return []
+        key = self._chat_key(self.current_chat_id, self.current_bot_name)
+        with self._chat_lock(key):
+            messages = self._chat_messages_for_key(key)
+        return messages if messages is not None else []
+
+    @current_chat_messages.setter
+    def current_chat_messages(self, messages):
+        if not self.current_chat_id:
+            return
+        key = self._chat_key(self.current_chat_id, self.current_bot_name)
+        with self._chat_lock(key):
+            self._store_chat_messages(key, messages if messages is not None else [])
+
+    def _chat_key(self, chat_id, bot_name=None):
+        if not bot_name and chat_id:
+            bot_name = (self._find_chat_index_entry(chat_id) or {}).get("bot")
+        return (str(bot_name or ""), str(chat_id or ""))
+
+    def _chat_lock(self, key):
+        with self._chat_states_lock:
+            lock = self._chat_locks.get(key)
+            if lock is None:
+                lock = threading.RLock()
+                self._chat_locks[key] = lock
+            return lock
+
+    def _chat_messages_for_key(self, key):
+        """The chat's live message list, loaded on first use; the caller holds the chat's lock."""
+        with self._chat_states_lock:
+            messages = self._chat_messages_by_key.get(key)
+            if messages is not None:
+                self._chat_messages_by_key.move_to_end(key)
+                return messages
+        chat_folder, _bot = self._resolve_chat_folder(key[1], key[0] or None)
         if chat_folder is None or not chat_folder.exists():
-            print(f"[ChatManager] Chat folder '{chat_folder}' not found")
             return None
+        messages = self._load_chat_folder_messages(chat_folder)
+        self._store_chat_messages(key, messages)
+        return messages
+
+    def _store_chat_messages(self, key, messages):
+        current_key = (str(self.current_bot_name or ""), str(self.current_chat_id or ""))
+        with self._chat_states_lock:
+            self._chat_messages_by_key[key] = messages
+            self._chat_messages_by_key.move_to_end(key)
+            for old_key in list(self._chat_messages_by_key):
+                if len(self._chat_messages_by_key) <= self.CHAT_STATE_MAX_ENTRIES:
+                    break
+                if old_key in (key, current_key):
+                    continue
+                # A chat that is mid-write keeps its list; it is dropped on a later store.
+                lock = self._chat_locks.get(old_key)
+                if lock is not None and not lock.acquire(blocking=False):
+                    continue
+                try:
+                    del self._chat_messages_by_key[old_key]
+                finally:
+                    if lock is not None:
+                        lock.release()
+
+    def _drop_chat_messages(self, bot_name=None, chat_id=None):
+        """Forget live message lists (one chat, one bot's chats, or all); they reload from disk on next use."""
+        with self._chat_states_lock:
+            keys = [
+                key for key in self._chat_messages_by_key
+                if (bot_name is None or key[0] == bot_name) and (chat_id is None or key[1] == chat_id)
+            ]
+        for key in keys:
+            with self._chat_lock(key):
+                with self._chat_states_lock:
+                    self._chat_messages_by_key.pop(key, None)
+
+    def get_chat_messages(self, chat_id, bot_name=None):
+        """Copy of a chat's live messages (internal fields included) without switching the current chat."""
+        if not chat_id:
+            return []
+        key = self._chat_key(chat_id, bot_name)
+        with self._chat_lock(key):
+            return self._copy_chat_messages(self._chat_messages_for_key(key))
             
+    def _read_chat_folder_messages(self, chat_folder):
+        """Parse a chat's IAM files plus pending journal records into ordered internal messages."""
         # Load all IAM.txt files and sort by persisted order/timestamp
+        chat_folder = Path(chat_folder)
         iam_folder = chat_folder / "IAM"
         messages = []
         
@@ -507,26 +957,8 @@ class ChatManager:
                     with open(iam_file, 'r', encoding='utf-8') as f:
                         payload = json.load(f)
 
-                    if isinstance(payload, dict) and "role" in payload and "content" in payload:
-                        timestamp = payload.get("timestamp") or self._now_iso()
-                        order = payload.get("order")
-                        try:
-                            order = int(order)
-                        except Exception:
-                            order = len(messages)
-
-                        loaded_message = {
-                            "role": str(payload.get("role", "")).strip().lower(),
-                            "content": payload.get("content", ""),
-                            "timestamp": timestamp,
-                            "__order": order,
-                            "__iam_file": iam_file.name
-                        }
-                        if loaded_message.get("role") == "assistant":
-                            loaded_message["variants"] = payload.get("variants")
-                            loaded_message["selected_variant_index"] = payload.get("selected_variant_index")
-                            self._normalize_assistant_variants(loaded_message)
-
+                    loaded_message = self._loaded_message_from_payload(payload, iam_file.name, len(messages))
+                    if loaded_message is not None:
                         messages.append(loaded_message)
                         continue
 
@@ -551,41 +983,195 @@ class ChatManager:
                 except Exception as e:
                     print(f"[ChatManager] Error loading message from {iam_file}: {e}")
 
+        # Replay journaled writes that have not been compacted into IAM files yet
+        journal_records = self._read_chat_journal(chat_folder)
+        if journal_records:
+            position_by_file = {
+                message.get("__iam_file"): position
+                for position, message in enumerate(messages)
+                if message.get("__iam_file")
+            }
+            for record in journal_records:
+                file_name = Path(record["file"]).name
+                loaded_message = self._loaded_message_from_payload(record["message"], file_name, len(messages))
+                if loaded_message is None:
+                    continue
+                position = position_by_file.get(file_name)
+                if position is None:
+                    position_by_file[file_name] = len(messages)
+                    messages.append(loaded_message)
+                else:
+                    messages[position] = loaded_message
+
         messages.sort(key=lambda msg: (
             int(msg.get("__order", 0)),
             str(msg.get("timestamp") or ""),
             str(msg.get("__iam_file") or "")
         ))
-        
-        self.current_chat_id = chat_id
-        self.current_chat_messages = messages
-        self.current_bot_name = preferred_bot
+        return messages
+
+    # Chat message cache
+    # Parsed messages are kept per chat folder in a small LRU. An entry is valid while its write
+    # generation matches (bumped by every write through ChatManager) and the IAM folder/journal
+    # mtimes are unchanged. Writers outside ChatManager call invalidate_chat_cache().
+
+    def _chat_cache_key(self, chat_folder):
+        return str(Path(chat_folder))
+
+    def _chat_cache_stamp(self, chat_folder):
+        return (
+            self._path_mtime(Path(chat_folder) / "IAM"),
+            self._path_mtime(self._journal_file(chat_folder))
+        )
+
+    def _copy_chat_messages(self, messages):
+        copied = []
+        for message in (messages or []):
+            if not isinstance(message, dict):
+                continue
+            item = dict(message)
+            if isinstance(item.get("variants"), list):
+                item["variants"] = [dict(variant) if isinstance(variant, dict) else variant for variant in item["variants"]]
+            copied.append(item)
+        return copied
+
+    def _bump_chat_generation(self, chat_folder):
+        key = self._chat_cache_key(chat_folder)
+        with self._chat_cache_lock:
+            generation = self._chat_generations.get(key, 0) + 1
+            self._chat_generations[key] = generation
+            self._chat_cache.pop(key, None)
+            return generation
+
+    def _store_chat_cache(self, chat_folder, messages, generation):
+        key = self._chat_cache_key(chat_folder)
+        with self._chat_cache_lock:
+            if self._chat_generations.get(key, 0) != generation:
+                return
+            self._chat_cache[key] = {
+                "generation": generation,
+                "stamp": self._chat_cache_stamp(chat_folder),
+                "messages": self._copy_chat_messages(messages)
+            }
+            self._chat_cache.move_to_end(key)
+            while len(self._chat_cache) > self.CHAT_CACHE_MAX_ENTRIES:
+                self._chat_cache.popitem(last=False)
+
+    def _write_through_chat_cache(self, chat_folder, messages):
+        """Record a completed write: bump the generation and cache what was just persisted."""
+        generation = self._bump_chat_generation(chat_folder)
+        self._store_chat_cache(chat_folder, messages, generation)
+
+    def _load_chat_folder_messages(self, chat_folder, copy_messages=True):
+        key = self._chat_cache_key(chat_folder)
+        with self._chat_cache_lock:
+            generation = self._chat_generations.get(key, 0)
+            entry = self._chat_cache.get(key)
+            if entry is not None and entry["generation"] == generation and entry["stamp"] == self._chat_cache_stamp(chat_folder):
+                self._chat_cache.move_to_end(key)
+                messages = entry["messages"]
+                return self._copy_chat_messages(messages) if copy_messages else messages
+
+        messages = self._read_chat_folder_messages(chat_folder)
+        self._store_chat_cache(chat_folder, messages, generation)
+        return self._copy_chat_messages(messages) if copy_messages else messages
+
+    def invalidate_chat_cache(self, chat_id=None, bot_name=None, chat_folder=None):
+        """Drop cached messages for a chat (or every chat) after its IAM files were changed externally."""
+        if chat_folder is None and chat_id:
+            chat_folder = self._get_chat_folder(chat_id, bot_name)
+        if chat_folder is not None:
+            self._bump_chat_generation(chat_folder)
+            self._drop_chat_messages(Path(chat_folder).parent.name, Path(chat_folder).name)
+            return
+        if chat_id is None:
+            self._drop_chat_messages()
+            with self._chat_cache_lock:
+                self._chat_cache.clear()
+                for key in list(self._chat_generations.keys()):
+                    self._chat_generations[key] += 1
+
+    def read_chat_messages(self, chat_id=None, bot_name=None, chat_folder=None):
+        """Return a chat's stored messages without switching the current chat.
+
+        Rows carry role, content (selected variant), timestamp, order and file_name, plus
+        variants/selected_variant_index for assistant messages. Served from the message cache.
+        """
+        if chat_folder is None:
+            chat_folder = self._get_chat_folder(chat_id, bot_name)
+        if not chat_folder or not Path(chat_folder).is_dir():
+            return []
+
+        rows = []
+        for position, message in enumerate(self._load_chat_folder_messages(chat_folder, copy_messages=False)):
+            role = str(message.get("role", "")).strip().lower()
+            if role not in ("user", "assistant"):
+                continue
+            try:
+                order = int(message.get("__order", position))
+            except Exception:
+                order = position
+            row = {
+                "role": role,
+                "content": str(message.get("content") or ""),
+                "timestamp": str(message.get("timestamp") or ""),
+                "order": order,
+                "file_name": str(message.get("__iam_file") or "")
+            }
+            variants = message.get("variants")
+            if role == "assistant" and isinstance(variants, list) and variants:
+                row["variants"] = [dict(variant) for variant in variants if isinstance(variant, dict)]
+                row["selected_variant_index"] = message.get("selected_variant_index")
+            rows.append(row)
+        return rows
+
+    def _loaded_message_from_payload(self, payload, file_name, fallback_order):
+        if not isinstance(payload, dict) or "role" not in payload or "content" not in payload:
+            return None
+
+        timestamp = payload.get("timestamp") or self._now_iso()
+        order = payload.get("order")
+        try:
+            order = int(order)
+        except Exception:
+            order = fallback_order
+
+        loaded_message = {
+            "role": str(payload.get("role", "")).strip().lower(),
+            "content": payload.get("content", ""),
+            "timestamp": timestamp,
+            "__order": order,
+            "__iam_file": file_name
+        }
+        if loaded_message.get("role") == "assistant":
+            loaded_message["variants"] = payload.get("variants")
+            loaded_message["selected_variant_index"] = payload.get("selected_variant_index")
+            self._normalize_assistant_variants(loaded_message)
+        return loaded_message
 
-        self._touch_chat_meta(chat_folder, include_opened=True)
-        
-        print(f"[ChatManager] Loaded chat '{chat_id}' with {len(messages)} messages")
-        return self._public_chat_messages(messages)
-            
     def _get_chat_folder(self, chat_id, bot_name=None):
-        """Get the chat folder path from chat metadata or scan results"""
-        chats_list = self._load_chats_list()
-        for chat in chats_list:
-            if chat["id"] == chat_id:
-                if bot_name and chat.get("bot") != bot_name:
-                    continue
-                stored_folder = str(chat.get("chat_folder", "") or "").strip()
-                if stored_folder:
-                    candidate = Path(stored_folder)
-                    if candidate.exists() and candidate.is_dir():
-                        return candidate
+        """Get the chat folder path from the chat index, probing the bot folder as a fallback"""
+        if not chat_id:
+            return None
+
+        chat = self._find_chat_index_entry(chat_id, bot_name)
+        if chat:
+            stored_folder = str(chat.get("chat_folder", "") or "").strip()
+            if stored_folder:
+                candidate = Path(stored_folder)
+                if candidate.exists() and candidate.is_dir():
+                    return candidate
 
         if bot_name:
             candidate = self.bots_folder / bot_name / chat_id
             if candidate.exists():
                 return candidate
 
-        for chat in self._scan_all_chats():
-            if chat["id"] == chat_id:
+        if chat:
+            # Indexed folder vanished outside the app; resync and retry once.
+            self._refresh_chat_index(deep=True)
+            chat = self._find_chat_index_entry(chat_id, bot_name, refresh=False)
+            if chat and Path(chat.get("chat_folder", "")).is_dir():
                 return Path(chat.get("chat_folder", ""))
 
         return None
@@ -756,21 +1342,11 @@ class ChatManager:
                     message["__iam_file"] = filename
 
                 kept_names.add(filename)
+                message["__order"] = idx
 
                 iam_file = iam_folder / filename
                 with open(iam_file, 'w', encoding='utf-8') as f:
-                    payload = {
-                        "role": role,
-                        "content": message.get("content", ""),
-                        "timestamp": timestamp,
-                        "order": idx
-                    }
-                    if role == "assistant":
-                        variants = message.get("variants")
-                        if isinstance(variants, list) and variants:
-                            payload["variants"] = variants
-                            payload["selected_variant_index"] = int(message.get("selected_variant_index", len(variants) - 1))
-                    json.dump(payload, f, indent=2)
+                    json.dump(self._message_file_payload(role, message, idx), f, indent=2)
 
             # Remove stale files that are no longer part of this chat message list
             for old_name, old_file in existing_files.items():
@@ -781,6 +1357,11 @@ class ChatManager:
                 except Exception:
                     pass
 
+            # A full save supersedes anything still pending in the journal
+            self._discard_chat_journal(chat_folder)
+            self._update_chat_index_counts(chat_folder, messages)
+            self._write_through_chat_cache(chat_folder, messages)
+
             print(
                 f"[ChatManager] Saved {len(messages)} messages "
                 f"to {iam_folder}"
@@ -788,6 +1369,300 @@ class ChatManager:
         except Exception as e:
             print(f"[ChatManager] Error saving messages: {e}")
             
+    def _message_file_payload(self, role, message, order):
+        payload = {
+            "role": role,
+            "content": message.get("content", ""),
+            "timestamp": message.get("timestamp"),
+            "order": order
+        }
+        if role == "assistant":
+            variants = message.get("variants")
+            if isinstance(variants, list) and variants:
+                payload["variants"] = variants
+                payload["selected_variant_index"] = int(message.get("selected_variant_index", len(variants) - 1))
+        return payload
+
+    # Message journal
+    # In "journal" storage mode add/edit/variant writes append one "put" record per touched
+    # message to chat_journal.jsonl next to chat_meta.json instead of rewriting every IAM file.
+    # Records are replayed on load and folded back into IAM/message_*.txt by compaction.
+
+    def set_storage_mode(self, mode):
+        normalized = str(mode or "").strip().lower()
+        if normalized not in self.STORAGE_MODES:
+            normalized = self.STORAGE_MODES[0]
+        self.storage_mode = normalized
+        return normalized
+
+    def _journal_file(self, chat_folder):
+        return Path(chat_folder) / self.JOURNAL_FILE
+
+    def _read_chat_journal(self, chat_folder):
+        """Return journal "put" records for a chat in append order."""
+        if not chat_folder:
+            return []
+        journal_file = self._journal_file(chat_folder)
+        if not journal_file.exists():
+            return []
+
+        records = []
+        try:
+            with open(journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except Exception:
+                        # A torn trailing line from an interrupted append
+                        continue
+                    if (
+                        isinstance(record, dict)
+                        and record.get("op") == "put"
+                        and str(record.get("file") or "").strip()
+                        and isinstance(record.get("message"), dict)
+                    ):
+                        records.append(record)
+        except Exception as e:
+            print(f"[ChatManager] Error reading chat journal {journal_file}: {e}")
+        return records
+
+    def _append_chat_journal(self, chat_folder, records):
+        journal_file = self._journal_file(chat_folder)
+        state_key = str(journal_file)
+        with self._journal_lock:
+            state = self._journal_state.get(state_key)
+            if state is None:
+                state = {
+                    "records": len(self._read_chat_journal(chat_folder)),
+                    "unsynced": 0,
+                    "last_sync": time.monotonic(),
+                    "timer": None
+                }
+                self._journal_state[state_key] = state
+
+            with open(journal_file, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                state["records"] += len(records)
+                state["unsynced"] += len(records)
+                now = time.monotonic()
+                if (
+                    state["unsynced"] >= self.JOURNAL_FSYNC_BATCH
+                    or now - state["last_sync"] >= self.JOURNAL_FSYNC_INTERVAL_SECONDS
+                ):
+                    os.fsync(f.fileno())
+                    state["unsynced"] = 0
+                    state["last_sync"] = now
+                elif state.get("timer") is None:
+                    # Without a follow-up append nothing would sync the tail; do it once the interval passes.
+                    timer = threading.Timer(self.JOURNAL_FSYNC_INTERVAL_SECONDS, self._sync_chat_journal, args=(journal_file,))
+                    timer.daemon = True
+                    state["timer"] = timer
+                    timer.start()
+
+            if state["records"] >= self.JOURNAL_COMPACT_THRESHOLD:
+                self._compact_chat_journal_folder(chat_folder)
+
+    def _sync_chat_journal(self, journal_file):
+        with self._journal_lock:
+            state = self._journal_state.get(str(journal_file))
+            if state is None:
+                return
+            timer = state.get("timer")
+            if timer is not None:
+                timer.cancel()
+                state["timer"] = None
+            if state["unsynced"] <= 0:
+                return
+            try:
+                with open(journal_file, 'a', encoding='utf-8') as f:
+                    os.fsync(f.fileno())
+            except Exception as e:
+                print(f"[ChatManager] Error syncing chat journal {journal_file}: {e}")
+                return
+            state["unsynced"] = 0
+            state["last_sync"] = time.monotonic()
+
+    def _sync_chat_journals(self):
+        with self._journal_lock:
+            journal_files = list(self._journal_state.keys())
+        for journal_file in journal_files:
+            self._sync_chat_journal(Path(journal_file))
+
+    def _discard_chat_journal(self, chat_folder):
+        journal_file = self._journal_file(chat_folder)
+        with self._journal_lock:
+            state = self._journal_state.pop(str(journal_file), None)
+            if state is not None and state.get("timer") is not None:
+                state["timer"].cancel()
+            try:
+                if journal_file.exists():
+                    journal_file.unlink()
+            except Exception as e:
+                print(f"[ChatManager] Error removing chat journal {journal_file}: {e}")
+
+    def _compact_chat_journal_folder(self, chat_folder):
+        with self._journal_lock:
+            records = self._read_chat_journal(chat_folder)
+            if not records:
+                self._discard_chat_journal(chat_folder)
+                return 0
+
+            latest_by_file = {}
+            for record in records:
+                latest_by_file[Path(record["file"]).name] = record["message"]
+
+            iam_folder = Path(chat_folder) / "IAM"
+            iam_folder.mkdir(exist_ok=True)
+            try:
+                for file_name, payload in latest_by_file.items():
+                    with open(iam_folder / file_name, 'w', encoding='utf-8') as f:
+                        json.dump(payload, f, indent=2)
+            except Exception as e:
+                print(f"[ChatManager] Error compacting chat journal for {chat_folder}: {e}")
+                return 0
+
+            self._discard_chat_journal(chat_folder)
+
+        self._update_chat_index_counts(chat_folder)
+        self._bump_chat_generation(chat_folder)
+        print(
+            f"[ChatManager] Compacted {len(records)} journal records "
+            f"into {len(latest_by_file)} files in {iam_folder}"
+        )
+        return len(latest_by_file)
+
+    def compact_chat_journal(self, chat_id=None, bot_name=None):
+        """Fold pending journal records of a chat into its IAM/message_*.txt files."""
+        chat_id = chat_id or self.current_chat_id
+        bot_name = bot_name or self.current_bot_name
+        chat_folder = self._get_chat_folder(chat_id, bot_name)
+        if not chat_folder or not self._journal_file(chat_folder).exists():
+            return 0
+        return self._compact_chat_journal_folder(chat_folder)
+
+    def apply_iam_rewrites(self, chat_id, bot_name, rewrites):
+        """Rewrite stored IAM message files in place, all or nothing; used by modules such as Auto Summary.
+
+        Each rewrite is {"file", "expected_content", "payload"}. Pending journal records are folded
+        in first, then every file must still hold `expected_content`, otherwise nothing is written
+        and False is returned. Runs under the chat's lock, and drops the chat's live message list
+        afterwards so a later save starts from the rewritten files.
+        """
+        rewrites = [rewrite for rewrite in (rewrites or []) if rewrite.get("file")]
+        if not rewrites:
+            return True
+
+        key = self._chat_key(chat_id, bot_name)
+        with self._chat_lock(key):
+            chat_folder = self._get_chat_folder(chat_id, bot_name)
+            if not chat_folder:
+                return False
+            with self._journal_lock:
+                # Edits made while the caller was computing may still sit in the journal
+                self._compact_chat_journal_folder(chat_folder)
+                for rewrite in rewrites:
+                    try:
+                        current = json.loads(Path(rewrite["file"]).read_text(encoding="utf-8"))
+                    except Exception:
+                        return False
+                    if not isinstance(current, dict) or str(current.get("content") or "") != rewrite.get("expected_content"):
+                        return False
+
+                staged = []
+                try:
+                    for rewrite in rewrites:
+                        target = Path(rewrite["file"])
+                        temp_file = target.with_name(f"{target.name}.tmp")
+                        temp_file.write_text(json.dumps(rewrite.get("payload") or {}, indent=2), encoding="utf-8")
+                        staged.append((temp_file, target))
+                except Exception as e:
+                    print(f"[ChatManager] Error staging IAM rewrite: {e}")
+                    for temp_file, _target in staged:
+                        try:
+                            temp_file.unlink()
+                        except Exception:
+                            pass
+                    return False
+
+                for temp_file, target in staged:
+                    os.replace(temp_file, target)
+
+            self._bump_chat_generation(chat_folder)
+            with self._chat_states_lock:
+                self._chat_messages_by_key.pop(key, None)
+        return True
+
+    def _journal_ready(self, messages, indexes):
+        """Journaling needs every untouched message mapped to its file at its current position."""
+        for idx, message in enumerate(messages or []):
+            if not isinstance(message, dict):
+                return False
+            if idx in indexes and not message.get("__iam_file"):
+                continue
+            if not message.get("__iam_file"):
+                return False
+            try:
+                if int(message.get("__order")) != idx:
+                    return False
+            except Exception:
+                return False
+        return True
+
+    def _journal_chat_messages(self, chat_id, bot_name, indexes, messages):
+        """Persist `messages[indexes]` through the journal, or fall back to a full save; caller holds the chat's lock."""
+        indexes = set(indexes or [])
+        if self.storage_mode != "journal" or not self._journal_ready(messages, indexes):
+            self._save_chat_messages(chat_id, messages, bot_name)
+            return
+
+        chat_folder = self._get_chat_folder(chat_id, bot_name)
+        if not chat_folder or not chat_folder.exists():
+            print(f"[ChatManager] Chat folder for '{chat_id}' not found")
+            return
+
+        reserved_names = {message.get("__iam_file") for message in messages if message.get("__iam_file")}
+        records = []
+        for idx in sorted(indexes):
+            if idx < 0 or idx >= len(messages):
+                continue
+            message = messages[idx]
+            role = str(message.get("role", "")).strip().lower()
+            if role not in ("user", "assistant"):
+                continue
+            if role == "assistant":
+                self._normalize_assistant_variants(message)
+
+            message["timestamp"] = message.get("timestamp") or self._now_iso()
+            file_name = Path(str(message.get("__iam_file") or "")).name
+            if not file_name:
+                file_name = self._next_message_filename(None, message["timestamp"], reserved_names)
+                message["__iam_file"] = file_name
+                reserved_names.add(file_name)
+            message["__order"] = idx
+            records.append({
+                "op": "put",
+                "file": file_name,
+                "message": self._message_file_payload(role, message, idx)
+            })
+
+        if not records:
+            return
+
+        try:
+            self._append_chat_journal(chat_folder, records)
+        except Exception as e:
+            print(f"[ChatManager] Error appending to chat journal, falling back to full save: {e}")
+            self._save_chat_messages(chat_id, messages, bot_name)
+            return
+
+        self._update_chat_index_counts(chat_folder, messages)
+        self._write_through_chat_cache(chat_folder, messages)
+
     def add_message(self, role, content, chat_id=None, bot_name=None):
         """Add a message to the current or specified chat"""
         if chat_id is None:
@@ -811,12 +1686,14 @@ class ChatManager:
             }]
             message["selected_variant_index"] = 0
         
-        # Load chat if not current
-        if chat_id != self.current_chat_id:
-            self.load_chat(chat_id, bot_name)
-            
-        self.current_chat_messages.append(message)
-        self._save_chat_messages(chat_id, self.current_chat_messages, bot_name)
+        key = self._chat_key(chat_id, bot_name)
+        with self._chat_lock(key):
+            messages = self._chat_messages_for_key(key)
+            if messages is None:
+                print(f"[ChatManager] Chat '{chat_id}' not found")
+                return False
+            messages.append(message)
+            self._journal_chat_messages(chat_id, bot_name, [len(messages) - 1], messages)
         
         chat_folder = self._get_chat_folder(chat_id, bot_name)
         self._touch_chat_meta(chat_folder)
@@ -828,23 +1705,26 @@ class ChatManager:
         if not chat_id or not bot_name:
             return None
 
-        messages = self.load_chat(chat_id, bot_name)
-        if messages is None:
+        if self.load_chat(chat_id, bot_name) is None:
             return None
 
-        if any((msg or {}).get("role") == "user" for msg in messages):
-            return None
+        key = self._chat_key(chat_id, bot_name)
+        with self._chat_lock(key):
+            messages = self._chat_messages_for_key(key) or []
+            if any((msg or {}).get("role") == "user" for msg in messages):
+                return None
 
-        iam_messages = self._load_bot_iam_messages(bot_name, persona_name, iam_set)
+            iam_messages = self._load_bot_iam_messages(bot_name, persona_name, iam_set)
+            self._store_chat_messages(key, iam_messages)
+            self._save_chat_messages(chat_id, iam_messages, bot_name)
+            public_messages = self._public_chat_messages(iam_messages)
         self.current_chat_id = chat_id
         self.current_bot_name = bot_name
-        self.current_chat_messages = iam_messages
-        self._save_chat_messages(chat_id, iam_messages, bot_name)
 
         chat_folder = self._get_chat_folder(chat_id, bot_name)
         self._touch_chat_meta(chat_folder, persona_name=(persona_name or "User"))
 
-        return self._public_chat_messages(iam_messages)
+        return public_messages
 
     def edit_message(self, chat_id, bot_name, message_index, content):
         if not chat_id or not bot_name:
@@ -860,40 +1740,42 @@ class ChatManager:
         if not new_content.strip():
             return None
 
-        if chat_id != self.current_chat_id or bot_name != self.current_bot_name:
-            messages = self.load_chat(chat_id, bot_name)
+        key = self._chat_key(chat_id, bot_name)
+        with self._chat_lock(key):
+            messages = self._chat_messages_for_key(key)
             if messages is None:
                 return None
 
-        if index < 0 or index >= len(self.current_chat_messages):
-            return None
+            if index < 0 or index >= len(messages):
+                return None
 
-        message = self.current_chat_messages[index] or {}
-        role = message.get("role")
-        if role not in ("user", "assistant"):
-            return None
+            message = messages[index] or {}
+            role = message.get("role")
+            if role not in ("user", "assistant"):
+                return None
 
-        self.current_chat_messages[index]["content"] = new_content
-        if role == "assistant":
-            self._normalize_assistant_variants(self.current_chat_messages[index])
-            variants = self.current_chat_messages[index].get("variants") or []
-            selected_idx = self.current_chat_messages[index].get("selected_variant_index", len(variants) - 1 if variants else 0)
-            try:
-                selected_idx = int(selected_idx)
-            except Exception:
-                selected_idx = len(variants) - 1 if variants else 0
-            if variants:
-                selected_idx = max(0, min(selected_idx, len(variants) - 1))
-                variants[selected_idx]["content"] = new_content
-                variants[selected_idx]["timestamp"] = self.current_chat_messages[index].get("timestamp") or self._now_iso()
-                self.current_chat_messages[index]["variants"] = variants
-                self.current_chat_messages[index]["selected_variant_index"] = selected_idx
-        self._save_chat_messages(chat_id, self.current_chat_messages, bot_name)
+            messages[index]["content"] = new_content
+            if role == "assistant":
+                self._normalize_assistant_variants(messages[index])
+                variants = messages[index].get("variants") or []
+                selected_idx = messages[index].get("selected_variant_index", len(variants) - 1 if variants else 0)
+                try:
+                    selected_idx = int(selected_idx)
+                except Exception:
+                    selected_idx = len(variants) - 1 if variants else 0
+                if variants:
+                    selected_idx = max(0, min(selected_idx, len(variants) - 1))
+                    variants[selected_idx]["content"] = new_content
+                    variants[selected_idx]["timestamp"] = messages[index].get("timestamp") or self._now_iso()
+                    messages[index]["variants"] = variants
+                    messages[index]["selected_variant_index"] = selected_idx
+            self._journal_chat_messages(chat_id, bot_name, [index], messages)
+            public_messages = self._public_chat_messages(messages)
 
         chat_folder = self._get_chat_folder(chat_id, bot_name)
         self._touch_chat_meta(chat_folder)
 
-        return self._public_chat_messages(self.current_chat_messages)
+        return public_messages
 
     def delete_message(self, chat_id, bot_name, message_index):
         if not chat_id or not bot_name:
@@ -904,21 +1786,23 @@ class ChatManager:
         except Exception:
             return None
 
-        if chat_id != self.current_chat_id or bot_name != self.current_bot_name:
-            messages = self.load_chat(chat_id, bot_name)
+        key = self._chat_key(chat_id, bot_name)
+        with self._chat_lock(key):
+            messages = self._chat_messages_for_key(key)
             if messages is None:
                 return None
 
-        if index < 0 or index >= len(self.current_chat_messages):
-            return None
+            if index < 0 or index >= len(messages):
+                return None
 
-        del self.current_chat_messages[index]
-        self._save_chat_messages(chat_id, self.current_chat_messages, bot_name)
+            del messages[index]
+            self._save_chat_messages(chat_id, messages, bot_name)
+            public_messages = self._public_chat_messages(messages)
 
         chat_folder = self._get_chat_folder(chat_id, bot_name)
         self._touch_chat_meta(chat_folder)
 
-        return self._public_chat_messages(self.current_chat_messages)
+        return public_messages
 
     def insert_message(self, chat_id, bot_name, message_index, role, content):
         if not chat_id or not bot_name:
@@ -937,34 +1821,36 @@ class ChatManager:
         if not message_content:
             return None
 
-        if chat_id != self.current_chat_id or bot_name != self.current_bot_name:
-            messages = self.load_chat(chat_id, bot_name)
+        key = self._chat_key(chat_id, bot_name)
+        with self._chat_lock(key):
+            messages = self._chat_messages_for_key(key)
             if messages is None:
                 return None
 
-        if index < 0:
-            index = 0
-        if index > len(self.current_chat_messages):
-            index = len(self.current_chat_messages)
+            if index < 0:
+                index = 0
+            if index > len(messages):
+                index = len(messages)
 
-        self.current_chat_messages.insert(index, {
-            "role": message_role,
-            "content": message_content,
-            "timestamp": self._now_iso()
-        })
-        if message_role == "assistant":
-            inserted = self.current_chat_messages[index]
-            inserted["variants"] = [{
-                "content": inserted["content"],
-                "timestamp": inserted["timestamp"]
-            }]
-            inserted["selected_variant_index"] = 0
-        self._save_chat_messages(chat_id, self.current_chat_messages, bot_name)
+            messages.insert(index, {
+                "role": message_role,
+                "content": message_content,
+                "timestamp": self._now_iso()
+            })
+            if message_role == "assistant":
+                inserted = messages[index]
+                inserted["variants"] = [{
+                    "content": inserted["content"],
+                    "timestamp": inserted["timestamp"]
+                }]
+                inserted["selected_variant_index"] = 0
+            self._save_chat_messages(chat_id, messages, bot_name)
+            public_messages = self._public_chat_messages(messages)
 
         chat_folder = self._get_chat_folder(chat_id, bot_name)
         self._touch_chat_meta(chat_folder)
 
-        return self._public_chat_messages(self.current_chat_messages)
+        return public_messages
 
     def add_assistant_variant(self, chat_id, bot_name, message_index, content):
         if not chat_id or not bot_name:
@@ -979,36 +1865,38 @@ class ChatManager:
         if not variant_content.strip():
             return None
 
-        if chat_id != self.current_chat_id or bot_name != self.current_bot_name:
-            messages = self.load_chat(chat_id, bot_name)
+        key = self._chat_key(chat_id, bot_name)
+        with self._chat_lock(key):
+            messages = self._chat_messages_for_key(key)
             if messages is None:
                 return None
 
-        if index < 0 or index >= len(self.current_chat_messages):
-            return None
-
-        target = self.current_chat_messages[index] or {}
-        if str(target.get("role", "")).strip().lower() != "assistant":
-            return None
+            if index < 0 or index >= len(messages):
+                return None
 
-        self._normalize_assistant_variants(target)
-        variants = target.get("variants") or []
-        now_iso = self._now_iso()
-        variants.append({
-            "content": variant_content,
-            "timestamp": now_iso
-        })
-        variants, selected_idx = self._trim_assistant_variants(variants, len(variants) - 1)
-        target["variants"] = variants
-        target["selected_variant_index"] = selected_idx
-        target["content"] = str((variants[selected_idx] or {}).get("content", variant_content))
-        target["timestamp"] = now_iso
+            target = messages[index] or {}
+            if str(target.get("role", "")).strip().lower() != "assistant":
+                return None
 
-        self._save_chat_messages(chat_id, self.current_chat_messages, bot_name)
+            self._normalize_assistant_variants(target)
+            variants = target.get("variants") or []
+            now_iso = self._now_iso()
+            variants.append({
+                "content": variant_content,
+                "timestamp": now_iso
+            })
+            variants, selected_idx = self._trim_assistant_variants(variants, len(variants) - 1)
+            target["variants"] = variants
+            target["selected_variant_index"] = selected_idx
+            target["content"] = str((variants[selected_idx] or {}).get("content", variant_content))
+            target["timestamp"] = now_iso
+
+            self._journal_chat_messages(chat_id, bot_name, [index], messages)
+            public_messages = self._public_chat_messages(messages)
         chat_folder = self._get_chat_folder(chat_id, bot_name)
         self._touch_chat_meta(chat_folder)
 
-        return self._public_chat_messages(self.current_chat_messages)
+        return public_messages
 
     def select_assistant_variant(self, chat_id, bot_name, message_index, variant_index):
         if not chat_id or not bot_name:
@@ -1020,40 +1908,42 @@ class ChatManager:
         except Exception:
             return None
 
-        if chat_id != self.current_chat_id or bot_name != self.current_bot_name:
-            messages = self.load_chat(chat_id, bot_name)
+        key = self._chat_key(chat_id, bot_name)
+        with self._chat_lock(key):
+            messages = self._chat_messages_for_key(key)
             if messages is None:
                 return None
 
-        if index < 0 or index >= len(self.current_chat_messages):
-            return None
+            if index < 0 or index >= len(messages):
+                return None
 
-        target = self.current_chat_messages[index] or {}
-        if str(target.get("role", "")).strip().lower() != "assistant":
-            return None
+            target = messages[index] or {}
+            if str(target.get("role", "")).strip().lower() != "assistant":
+                return None
 
-        self._normalize_assistant_variants(target)
-        variants = target.get("variants") or []
-        if not variants:
-            return None
+            self._normalize_assistant_variants(target)
+            variants = target.get("variants") or []
+            if not variants:
+                return None
 
-        selected_variant = max(0, min(requested_variant, len(variants) - 1))
-        target["selected_variant_index"] = selected_variant
-        target["content"] = str((variants[selected_variant] or {}).get("content", ""))
+            selected_variant = max(0, min(requested_variant, len(variants) - 1))
+            target["selected_variant_index"] = selected_variant
+            target["content"] = str((variants[selected_variant] or {}).get("content", ""))
 
-        self._save_chat_messages(chat_id, self.current_chat_messages, bot_name)
+            self._save_chat_messages(chat_id, messages, bot_name)
+            public_messages = self._public_chat_messages(messages)
         chat_folder = self._get_chat_folder(chat_id, bot_name)
         self._touch_chat_meta(chat_folder)
 
-        return self._public_chat_messages(self.current_chat_messages)
+        return public_messages
         
     def get_all_chats(self):
         """Get a list of all chats"""
-        return self._scan_all_chats()
+        return self._indexed_chats(deep=True)
         
     def get_last_chat_for_bot(self, bot_name):
         """Get the most recent chat for a specific bot"""
-        bot_chats = self._scan_bot_chats(bot_name)
+        bot_chats = self._indexed_chats(bot_name=bot_name)
         if not bot_chats:
             return None
             
@@ -1095,9 +1985,15 @@ class ChatManager:
             except Exception as e:
                 print(f"[ChatManager] Error deleting chat folder: {e}")
 
+        if chat_folder and not chat_folder.exists():
+            with self._journal_lock:
+                self._journal_state.pop(str(self._journal_file(chat_folder)), None)
+            self._bump_chat_generation(chat_folder)
+            self._remove_chat_index_entries(chat_folder.parent.name, chat_folder.name)
+
+        self._drop_chat_messages(chat_folder.parent.name if chat_folder else None, chat_id)
         if self.current_chat_id == chat_id:
             self.current_chat_id = None
-            self.current_chat_messages = []
             self.current_bot_name = None
             
         print(f"[ChatManager] Deleted chat '{chat_id}'")
@@ -1108,13 +2004,14 @@ class ChatManager:
         if not bot_name:
             return False
 
-        bot_chats = self._scan_bot_chats(bot_name)
+        bot_chats = self._indexed_chats(bot_name=bot_name)
         removed_chat_ids = [chat.get("id") for chat in bot_chats if chat.get("id")]
         changed = bool(removed_chat_ids)
+        self._remove_chat_index_entries(bot_name)
 
+        self._drop_chat_messages(bot_name)
         if self.current_bot_name == bot_name:
             self.current_bot_name = None
             self.current_chat_id = None
-            self.current_chat_messages = []
 
         return changed
@@ -1,19 +1,125 @@
 import json
 import re
+import threading
 import uuid
 from datetime import datetime
 from pathlib import Path
 
+from dataset_retrieval import BM25Index
+from dataset_store import DatasetStore, get_dataset_store
+
+
+class DatasetKeywordMatcher:
+	"""Aho-Corasick automaton over every dynamic entry keyword of one dataset.
+
+	Entries are addressed by slot (their position in the order-sorted entry list), so
+	one pass over a user turn yields every entry whose keywords occur in it.
+	"""
+
+	def __init__(self, entry_keywords):
+		self.entry_keywords = [list(keywords or []) for keywords in (entry_keywords or [])]
+		self._goto = [{}]
+		self._fail = [0]
+		self._output = [()]
+		self._keyword_slots = {}
+		for slot, keywords in enumerate(self.entry_keywords):
+			for keyword in keywords:
+				token = str(keyword or "").lower()
+				if not token:
+					continue
+				self._keyword_slots.setdefault(token, set()).add(slot)
+		for token in self._keyword_slots:
+			self._insert(token)
+		self._link()
+
+	def _insert(self, token):
+		state = 0
+		for char in token:
+			next_state = self._goto[state].get(char)
+			if next_state is None:
+				next_state = len(self._goto)
+				self._goto[state][char] = next_state
+				self._goto.append({})
+				self._fail.append(0)
+				self._output.append(())
+			state = next_state
+		self._output[state] = self._output[state] + (token,)
+
+	def _link(self):
+		queue = list(self._goto[0].values())
+		head = 0
+		while head < len(queue):
+			state = queue[head]
+			head += 1
+			for char, next_state in self._goto[state].items():
+				queue.append(next_state)
+				fallback = self._fail[state]
+				while fallback and char not in self._goto[fallback]:
+					fallback = self._fail[fallback]
+				target = self._goto[fallback].get(char, 0)
+				self._fail[next_state] = target if target != next_state else 0
+				self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+	def is_empty(self):
+		return not self._keyword_slots
+
+	def scan(self, text):
+		"""Return the set of keywords that occur in text (already lowercased)."""
+		found = set()
+		if not text or not self._keyword_slots:
+			return found
+		goto = self._goto
+		fail = self._fail
+		output = self._output
+		state = 0
+		for char in text:
+			while state and char not in goto[state]:
+				state = fail[state]
+			state = goto[state].get(char, 0)
+			if output[state]:
+				found.update(output[state])
+		return found
+
+	def match_slots(self, text):
+		"""Return {slot: matched keywords in the entry's own keyword order} for one turn."""
+		found = self.scan(text)
+		if not found:
+			return {}
+		slots = set()
+		for token in found:
+			slots.update(self._keyword_slots.get(token, ()))
+		matches = {}
+		for slot in slots:
+			matched = [keyword for keyword in self.entry_keywords[slot] if str(keyword).lower() in found]
+			if matched:
+				matches[slot] = matched
+		return matches
+
 
 class DatasetManager:
 	"""Manage global datasets used for prompt-time context injection."""
 
+	ENTRY_MODES = ("static", "dynamic", "retrieval", "inactive")
+	RETRIEVAL_TOP_K = 4
+	RETRIEVAL_QUERY_TURNS = 3
+	RETRIEVAL_TURN_DECAY = 0.6
+	RETRIEVAL_INDEX_FOLDER = "Index"
+
 	def __init__(self, datasets_folder="../Datasets"):
 		self.datasets_folder = (Path(__file__).parent / datasets_folder).resolve()
+		self._keyword_matchers = {}
+		self._dataset_plans = {}
+		self._dataset_plan_lock = threading.Lock()
+		self._retrieval_indexes = {}
+		self._retrieval_lock = threading.Lock()
+		self._retrieval_save_timers = {}
+		self._store = get_dataset_store(self._datasets_file(), normalizer=self._normalize_payload)
 		self._migrate_legacy_bot_scoped_datasets()
 
 	def _migrate_legacy_bot_scoped_datasets(self):
 		global_path = self._datasets_file()
+		if (self.datasets_folder / DatasetStore.MANIFEST_FILE).is_file():
+			return
 		try:
 			if global_path.exists() and global_path.is_file():
 				existing = json.loads(global_path.read_text(encoding="utf-8"))
@@ -63,6 +169,7 @@ class DatasetManager:
 			global_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
 		except Exception:
 			return
+		self._store.invalidate()
 
 	def _iso_now(self):
 		return datetime.utcnow().isoformat() + "Z"
@@ -77,32 +184,6 @@ class DatasetManager:
 	def _empty_payload(self):
 		return {"datasets": []}
 
-	def _read_payload(self, bot_name=None):
-		path = self._datasets_file()
-		if not path.exists() or not path.is_file():
-			return self._empty_payload()
-		try:
-			payload = json.loads(path.read_text(encoding="utf-8"))
-		except Exception:
-			return self._empty_payload()
-		if not isinstance(payload, dict):
-			return self._empty_payload()
-		datasets = payload.get("datasets")
-		if not isinstance(datasets, list):
-			datasets = []
-		return {"datasets": datasets}
-
-	def _write_payload(self, bot_name=None, payload=None):
-		path = self._datasets_file()
-		safe_payload = payload if isinstance(payload, dict) else self._empty_payload()
-		if not isinstance(safe_payload.get("datasets"), list):
-			safe_payload["datasets"] = []
-		try:
-			path.write_text(json.dumps(safe_payload, indent=2, ensure_ascii=False), encoding="utf-8")
-			return True
-		except Exception:
-			return False
-
 	def _normalize_keywords(self, raw_keywords):
 		if isinstance(raw_keywords, list):
 			items = raw_keywords
@@ -122,7 +203,7 @@ class DatasetManager:
 	def _normalize_entry(self, row, order_index=0):
 		row = row if isinstance(row, dict) else {}
 		mode = self._safe_text(row.get("mode") or "static").lower()
-		if mode not in {"static", "dynamic", "inactive"}:
+		if mode not in self.ENTRY_MODES:
 			mode = "static"
 		entry_id = self._safe_text(row.get("id")) or f"entry_{uuid.uuid4().hex}"
 		entry_name = self._safe_text(row.get("name"))
@@ -194,8 +275,8 @@ class DatasetManager:
 		return {"datasets": normalized}
 
 	def _load_normalized_payload(self, bot_name=None):
-		payload = self._read_payload(bot_name=bot_name)
-		return self._normalize_payload(payload)
+		# Shared store snapshot: treat it as read-only, edits go through _commit.
+		return self._store.snapshot()
 
 	def _find_dataset(self, payload, dataset_id):
 		dataset_id = self._safe_text(dataset_id)
@@ -221,9 +302,65 @@ class DatasetManager:
 				return entry
 		return None
 
-	def _save_normalized_payload(self, bot_name=None, payload=None):
-		safe_payload = self._normalize_payload(payload)
-		return self._write_payload(bot_name=bot_name, payload=safe_payload)
+	def _working_dataset(self, datasets, dataset_id):
+		"""Swap a copy of one dataset into the working list so it can be edited in place."""
+		dataset_id = self._safe_text(dataset_id)
+		for index, row in enumerate(datasets):
+			if self._safe_text(row.get("id")) != dataset_id:
+				continue
+			dataset = dict(row)
+			dataset["entries"] = list(row.get("entries") or [])
+			datasets[index] = dataset
+			return dataset
+		return None
+
+	def _working_entry(self, dataset, entry_id):
+		entry_id = self._safe_text(entry_id)
+		entries = dataset.get("entries")
+		for index, row in enumerate(entries):
+			if self._safe_text(row.get("id")) != entry_id:
+				continue
+			entry = dict(row)
+			entries[index] = entry
+			return entry
+		return None
+
+	def _resequence(self, rows):
+		# Rows are shared with older snapshots, so only the ones whose order moved are copied.
+		for index, row in enumerate(rows):
+			if row.get("order") != index:
+				row = dict(row)
+				row["order"] = index
+				rows[index] = row
+
+	def _commit(self, bot_name, edit, failure_message):
+		"""Apply edit(datasets) to a copy-on-write working list and publish it to the store.
+
+		edit returns None on success or an error response to abort without changes.
+		"""
+		def mutator(current):
+			datasets = list(current.get("datasets") or [])
+			error = edit(datasets)
+			if error is not None:
+				return error, None
+			self._resequence(datasets)
+			return None, {"datasets": datasets}
+
+		try:
+			error = self._store.update(mutator)
+		except Exception as e:
+			print(f"[DatasetManager] {failure_message} {e}")
+			return {"success": False, "message": failure_message}
+		if error is not None:
+			return error
+		return self.list_datasets(bot_name)
+
+	def set_storage_mode(self, mode):
+		"""Pick the "single" datasets.json or the "sharded" per-dataset layout, migrating on change."""
+		return self._store.set_layout(mode)
+
+	def flush(self):
+		return self._store.flush()
 
 	def list_datasets(self, bot_name=None):
 		payload = self._load_normalized_payload(bot_name)
@@ -231,178 +368,323 @@ class DatasetManager:
 		return {
 			"success": True,
 			"scope": "global",
-			"datasets": datasets,
+			"datasets": list(datasets),
 		}
 
 	def create_dataset(self, bot_name, name, description=""):
-		payload = self._load_normalized_payload(bot_name)
-		datasets = payload.get("datasets")
-		now = self._iso_now()
-		new_dataset = {
-			"id": f"dataset_{uuid.uuid4().hex}",
-			"name": self._safe_text(name) or "Untitled Dataset",
-			"description": self._safe_text(description),
-			"order": len(datasets),
-			"created_at": now,
-			"updated_at": now,
-			"entries": [],
-		}
-		datasets.append(new_dataset)
-		if not self._save_normalized_payload(bot_name, payload):
-			return {"success": False, "message": "Failed to save dataset."}
-		return self.list_datasets(bot_name)
+		def edit(datasets):
+			now = self._iso_now()
+			datasets.append({
+				"id": f"dataset_{uuid.uuid4().hex}",
+				"name": self._safe_text(name) or "Untitled Dataset",
+				"description": self._safe_text(description),
+				"order": len(datasets),
+				"created_at": now,
+				"updated_at": now,
+				"entries": [],
+			})
+
+		return self._commit(bot_name, edit, "Failed to save dataset.")
 
 	def update_dataset(self, bot_name, dataset_id, name=None, description=None):
-		payload = self._load_normalized_payload(bot_name)
-		dataset = self._find_dataset(payload, dataset_id)
-		if dataset is None:
-			return {"success": False, "message": "Dataset not found."}
-		if name is not None:
-			dataset["name"] = self._safe_text(name) or dataset.get("name") or "Untitled Dataset"
-		if description is not None:
-			dataset["description"] = self._safe_text(description)
-		dataset["updated_at"] = self._iso_now()
-		if not self._save_normalized_payload(bot_name, payload):
-			return {"success": False, "message": "Failed to save dataset."}
-		return self.list_datasets(bot_name)
+		def edit(datasets):
+			dataset = self._working_dataset(datasets, dataset_id)
+			if dataset is None:
+				return {"success": False, "message": "Dataset not found."}
+			if name is not None:
+				dataset["name"] = self._safe_text(name) or dataset.get("name") or "Untitled Dataset"
+			if description is not None:
+				dataset["description"] = self._safe_text(description)
+			dataset["updated_at"] = self._iso_now()
+
+		return self._commit(bot_name, edit, "Failed to save dataset.")
 
 	def delete_dataset(self, bot_name, dataset_id):
-		payload = self._load_normalized_payload(bot_name)
-		datasets = payload.get("datasets")
-		before = len(datasets)
-		datasets[:] = [row for row in datasets if self._safe_text(row.get("id")) != self._safe_text(dataset_id)]
-		if len(datasets) == before:
-			return {"success": False, "message": "Dataset not found."}
-		if not self._save_normalized_payload(bot_name, payload):
-			return {"success": False, "message": "Failed to save dataset."}
-		return self.list_datasets(bot_name)
+		def edit(datasets):
+			before = len(datasets)
+			datasets[:] = [row for row in datasets if self._safe_text(row.get("id")) != self._safe_text(dataset_id)]
+			if len(datasets) == before:
+				return {"success": False, "message": "Dataset not found."}
 
-	def create_entry(self, bot_name, dataset_id, entry_payload):
-		payload = self._load_normalized_payload(bot_name)
-		dataset = self._find_dataset(payload, dataset_id)
-		if dataset is None:
-			return {"success": False, "message": "Dataset not found."}
+		result = self._commit(bot_name, edit, "Failed to save dataset.")
+		if result.get("success"):
+			self._drop_retrieval_index(dataset_id)
+		return result
 
+	def create_entry(self, bot_name, dataset_id, entry_payload):
 		entry_payload = entry_payload if isinstance(entry_payload, dict) else {}
-		now = self._iso_now()
-		entry = {
-			"id": f"entry_{uuid.uuid4().hex}",
-			"name": self._safe_text(entry_payload.get("name")),
-			"context": self._safe_text(entry_payload.get("context")),
-			"collapsed": bool(entry_payload.get("collapsed", False)),
-			"mode": self._safe_text(entry_payload.get("mode") or "static").lower(),
-			"keywords": self._normalize_keywords(entry_payload.get("keywords")),
-			"prompt_enabled": bool(entry_payload.get("prompt_enabled", True)),
-			"order": len(dataset.get("entries") or []),
-			"created_at": now,
-			"updated_at": now,
-		}
-		if entry["mode"] not in {"static", "dynamic", "inactive"}:
-			entry["mode"] = "static"
-		entry["prompt_enabled"] = entry["mode"] != "inactive"
-
-		dataset.setdefault("entries", []).append(entry)
-		dataset["updated_at"] = now
-		if not self._save_normalized_payload(bot_name, payload):
-			return {"success": False, "message": "Failed to save entry."}
-		return self.list_datasets(bot_name)
 
-	def update_entry(self, bot_name, dataset_id, entry_id, entry_payload):
-		payload = self._load_normalized_payload(bot_name)
-		dataset = self._find_dataset(payload, dataset_id)
-		if dataset is None:
-			return {"success": False, "message": "Dataset not found."}
-		entry = self._find_entry(dataset, entry_id)
-		if entry is None:
-			return {"success": False, "message": "Entry not found."}
+		def edit(datasets):
+			dataset = self._working_dataset(datasets, dataset_id)
+			if dataset is None:
+				return {"success": False, "message": "Dataset not found."}
+
+			now = self._iso_now()
+			entry = {
+				"id": f"entry_{uuid.uuid4().hex}",
+				"name": self._safe_text(entry_payload.get("name")),
+				"context": self._safe_text(entry_payload.get("context")),
+				"collapsed": bool(entry_payload.get("collapsed", False)),
+				"mode": self._safe_text(entry_payload.get("mode") or "static").lower(),
+				"keywords": self._normalize_keywords(entry_payload.get("keywords")),
+				"prompt_enabled": bool(entry_payload.get("prompt_enabled", True)),
+				"order": len(dataset["entries"]),
+				"created_at": now,
+				"updated_at": now,
+			}
+			if entry["mode"] not in self.ENTRY_MODES:
+				entry["mode"] = "static"
+			entry["prompt_enabled"] = entry["mode"] != "inactive"
 
-		entry_payload = entry_payload if isinstance(entry_payload, dict) else {}
-		if "context" in entry_payload:
-			entry["context"] = self._safe_text(entry_payload.get("context"))
-		if "name" in entry_payload:
-			entry["name"] = self._safe_text(entry_payload.get("name"))
-		if "collapsed" in entry_payload:
-			entry["collapsed"] = bool(entry_payload.get("collapsed"))
-		if "mode" in entry_payload:
-			mode = self._safe_text(entry_payload.get("mode") or "static").lower()
-			entry["mode"] = mode if mode in {"static", "dynamic", "inactive"} else "static"
-		if "keywords" in entry_payload:
-			entry["keywords"] = self._normalize_keywords(entry_payload.get("keywords"))
-		if "prompt_enabled" in entry_payload:
-			# Legacy compatibility with old checkbox payloads.
-			entry["mode"] = "inactive" if not bool(entry_payload.get("prompt_enabled")) else (entry.get("mode") or "static")
-
-		entry["prompt_enabled"] = self._safe_text(entry.get("mode") or "static").lower() != "inactive"
-
-		entry["updated_at"] = self._iso_now()
-		dataset["updated_at"] = self._iso_now()
-		if not self._save_normalized_payload(bot_name, payload):
-			return {"success": False, "message": "Failed to save entry."}
-		return self.list_datasets(bot_name)
+			dataset["entries"].append(self._normalize_entry(entry, order_index=entry["order"]))
+			dataset["updated_at"] = now
 
-	def delete_entry(self, bot_name, dataset_id, entry_id):
-		payload = self._load_normalized_payload(bot_name)
-		dataset = self._find_dataset(payload, dataset_id)
-		if dataset is None:
-			return {"success": False, "message": "Dataset not found."}
+		return self._commit(bot_name, edit, "Failed to save entry.")
 
-		entries = dataset.get("entries") if isinstance(dataset.get("entries"), list) else []
-		before = len(entries)
-		entries[:] = [row for row in entries if self._safe_text(row.get("id")) != self._safe_text(entry_id)]
-		if len(entries) == before:
-			return {"success": False, "message": "Entry not found."}
+	def update_entry(self, bot_name, dataset_id, entry_id, entry_payload):
+		entry_payload = entry_payload if isinstance(entry_payload, dict) else {}
 
-		for index, row in enumerate(entries):
-			row["order"] = index
-		dataset["updated_at"] = self._iso_now()
-		if not self._save_normalized_payload(bot_name, payload):
-			return {"success": False, "message": "Failed to save entry changes."}
-		return self.list_datasets(bot_name)
+		def edit(datasets):
+			dataset = self._working_dataset(datasets, dataset_id)
+			if dataset is None:
+				return {"success": False, "message": "Dataset not found."}
+			entry = self._working_entry(dataset, entry_id)
+			if entry is None:
+				return {"success": False, "message": "Entry not found."}
+
+			if "context" in entry_payload:
+				entry["context"] = self._safe_text(entry_payload.get("context"))
+			if "name" in entry_payload:
+				entry["name"] = self._safe_text(entry_payload.get("name"))
+			if "collapsed" in entry_payload:
+				entry["collapsed"] = bool(entry_payload.get("collapsed"))
+			if "mode" in entry_payload:
+				mode = self._safe_text(entry_payload.get("mode") or "static").lower()
+				entry["mode"] = mode if mode in self.ENTRY_MODES else "static"
+			if "keywords" in entry_payload:
+				entry["keywords"] = self._normalize_keywords(entry_payload.get("keywords"))
+			if "prompt_enabled" in entry_payload:
+				# Legacy compatibility with old checkbox payloads.
+				entry["mode"] = "inactive" if not bool(entry_payload.get("prompt_enabled")) else (entry.get("mode") or "static")
+
+			entry["prompt_enabled"] = self._safe_text(entry.get("mode") or "static").lower() != "inactive"
+
+			entry["updated_at"] = self._iso_now()
+			dataset["updated_at"] = self._iso_now()
+
+		return self._commit(bot_name, edit, "Failed to save entry.")
 
-	def reorder_entries(self, bot_name, dataset_id, ordered_entry_ids):
-		payload = self._load_normalized_payload(bot_name)
-		dataset = self._find_dataset(payload, dataset_id)
-		if dataset is None:
-			return {"success": False, "message": "Dataset not found."}
-
-		entries = dataset.get("entries") if isinstance(dataset.get("entries"), list) else []
-		id_order = [self._safe_text(item) for item in (ordered_entry_ids or []) if self._safe_text(item)]
-		by_id = {self._safe_text(item.get("id")): item for item in entries}
-		reordered = []
-		seen = set()
+	def delete_entry(self, bot_name, dataset_id, entry_id):
+		def edit(datasets):
+			dataset = self._working_dataset(datasets, dataset_id)
+			if dataset is None:
+				return {"success": False, "message": "Dataset not found."}
 
-		for entry_id in id_order:
-			row = by_id.get(entry_id)
-			if row is None or entry_id in seen:
-				continue
-			reordered.append(row)
-			seen.add(entry_id)
+			entries = dataset["entries"]
+			before = len(entries)
+			entries[:] = [row for row in entries if self._safe_text(row.get("id")) != self._safe_text(entry_id)]
+			if len(entries) == before:
+				return {"success": False, "message": "Entry not found."}
 
-		for row in entries:
-			row_id = self._safe_text(row.get("id"))
-			if row_id in seen:
-				continue
-			reordered.append(row)
-			seen.add(row_id)
+			self._resequence(entries)
+			dataset["updated_at"] = self._iso_now()
 
-		for index, row in enumerate(reordered):
-			row["order"] = index
+		return self._commit(bot_name, edit, "Failed to save entry changes.")
 
-		dataset["entries"] = reordered
-		dataset["updated_at"] = self._iso_now()
-		if not self._save_normalized_payload(bot_name, payload):
-			return {"success": False, "message": "Failed to save entry order."}
-		return self.list_datasets(bot_name)
+	def reorder_entries(self, bot_name, dataset_id, ordered_entry_ids):
+		def edit(datasets):
+			dataset = self._working_dataset(datasets, dataset_id)
+			if dataset is None:
+				return {"success": False, "message": "Dataset not found."}
+
+			entries = dataset["entries"]
+			id_order = [self._safe_text(item) for item in (ordered_entry_ids or []) if self._safe_text(item)]
+			by_id = {self._safe_text(item.get("id")): item for item in entries}
+			reordered = []
+			seen = set()
+
+			for entry_id in id_order:
+				row = by_id.get(entry_id)
+				if row is None or entry_id in seen:
+					continue
+				reordered.append(row)
+				seen.add(entry_id)
+
+			for row in entries:
+				row_id = self._safe_text(row.get("id"))
+				if row_id in seen:
+					continue
+				reordered.append(row)
+				seen.add(row_id)
+
+			self._resequence(reordered)
+			dataset["entries"] = reordered
+			dataset["updated_at"] = self._iso_now()
+
+		return self._commit(bot_name, edit, "Failed to save entry order.")
+
+	def _entry_keyword_list(self, entry):
+		mode = self._safe_text((entry or {}).get("mode") or "static").lower()
+		if mode != "dynamic" or not bool((entry or {}).get("prompt_enabled", True)):
+			return []
+		keywords = entry.get("keywords") if isinstance(entry.get("keywords"), list) else []
+		return [self._safe_text(keyword) for keyword in keywords if self._safe_text(keyword)]
+
+	def _get_keyword_matcher(self, dataset_id, entries):
+		# A keyword matches wherever it occurs as a substring of the lowercased turn; the old
+		# word-boundary regex for 3+ char keywords was always followed by a substring check,
+		# so the automaton reproduces that behaviour exactly.
+		entry_keywords = [self._entry_keyword_list(entry) for entry in entries]
+		signature = tuple(
+			(self._safe_text(entry.get("id")), tuple(keywords))
+			for entry, keywords in zip(entries, entry_keywords)
+		)
+		cached = self._keyword_matchers.get(dataset_id)
+		if cached is not None and cached[0] == signature:
+			return cached[1]
+		matcher = DatasetKeywordMatcher(entry_keywords)
+		self._keyword_matchers[dataset_id] = (signature, matcher)
+		return matcher
+
+	def _get_dataset_plan(self, dataset):
+		"""Per-dataset resolution plan: sorted entries, eligible modes, keyword matcher.
+
+		Store snapshots are replaced rather than edited, so an unchanged dataset is the same
+		object and a turn only pays for the entries that actually get injected.
+		"""
+		dataset_id = self._safe_text((dataset or {}).get("id"))
+		with self._dataset_plan_lock:
+			cached = self._dataset_plans.get(dataset_id)
+			if cached is not None and cached["dataset"] is dataset:
+				return cached
 
-	def _keyword_matches(self, keyword, context_text):
-		safe_keyword = self._safe_text(keyword).lower()
-		if not safe_keyword:
-			return False
-		if len(safe_keyword) >= 3:
-			pattern = rf"\b{re.escape(safe_keyword)}\b"
-			if re.search(pattern, context_text):
-				return True
-		return safe_keyword in context_text
+			entries = dataset.get("entries") if isinstance(dataset.get("entries"), list) else []
+			entries = sorted(entries, key=lambda row: int(row.get("order", 0)))
+			modes = []
+			static_slots = []
+			retrieval_slots = {}
+			for slot, entry in enumerate(entries):
+				mode = self._safe_text(entry.get("mode") or "static").lower()
+				if mode not in self.ENTRY_MODES:
+					mode = "static"
+				if mode == "inactive" or not bool(entry.get("prompt_enabled", True)) or not self._safe_text(entry.get("context")):
+					mode = None
+				modes.append(mode)
+				if mode == "static":
+					static_slots.append(slot)
+				elif mode == "retrieval":
+					retrieval_slots[self._safe_text(entry.get("id"))] = slot
+
+			plan = {
+				"dataset": dataset,
+				"entries": entries,
+				"modes": modes,
+				"static_slots": static_slots,
+				"retrieval_slots": retrieval_slots,
+				"matcher": self._get_keyword_matcher(dataset_id, entries),
+			}
+			self._dataset_plans[dataset_id] = plan
+			return plan
+
+	def _retrieval_index_file(self, dataset_id):
+		safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", self._safe_text(dataset_id))[:120] or "dataset"
+		return self.datasets_folder / self.RETRIEVAL_INDEX_FOLDER / f"{safe_name}.bm25.json"
+
+	def _entry_retrieval_stamp(self, entry):
+		# updated_at moves on every edit through this manager; the lengths catch hand edits that forget it.
+		return "|".join((
+			self._safe_text(entry.get("updated_at")),
+			str(len(self._safe_text(entry.get("name")))),
+			str(len(self._safe_text(entry.get("context")))),
+			",".join(entry.get("keywords") or []),
+		))
+
+	def _entry_retrieval_text(self, entry):
+		keywords = " ".join(self._safe_text(keyword) for keyword in (entry.get("keywords") or []))
+		return "\n".join((self._safe_text(entry.get("name")), keywords, self._safe_text(entry.get("context"))))
+
+	def _get_retrieval_index(self, plan):
+		"""Index for a dataset's retrieval entries, synced only when its plan was rebuilt.
+
+		Callers must hold _retrieval_lock.
+		"""
+		dataset = plan["dataset"]
+		dataset_id = self._safe_text(dataset.get("id"))
+		cached = self._retrieval_indexes.get(dataset_id)
+		if cached is not None and cached[0] is dataset:
+			return cached[1]
+
+		index = cached[1] if cached is not None else BM25Index.load(self._retrieval_index_file(dataset_id))
+		entries = plan["entries"]
+		documents = [
+			(entry_id, self._entry_retrieval_stamp(entries[slot]), lambda entry=entries[slot]: self._entry_retrieval_text(entry))
+			for entry_id, slot in plan["retrieval_slots"].items()
+		]
+		changed = index.sync(documents)
+		if changed:
+			print(f"[DatasetManager] Retrieval index for {dataset_id} updated ({changed} entries changed, {len(index.docs)} indexed)")
+			self._schedule_retrieval_save(dataset_id, index)
+		self._retrieval_indexes[dataset_id] = (dataset, index)
+		return index
+
+	def _schedule_retrieval_save(self, dataset_id, index):
+		# Persisting rewrites the whole index, so it happens off the generation path and coalesces edits.
+		timer = self._retrieval_save_timers.pop(dataset_id, None)
+		if timer is not None:
+			timer.cancel()
+
+		def _save():
+			with self._retrieval_lock:
+				if self._retrieval_save_timers.get(dataset_id) is timer_ref[0]:
+					self._retrieval_save_timers.pop(dataset_id, None)
+				payload = index.snapshot()
+			index.save(payload)
+
+		timer_ref = [threading.Timer(1.0, _save)]
+		timer_ref[0].daemon = True
+		self._retrieval_save_timers[dataset_id] = timer_ref[0]
+		timer_ref[0].start()
+
+	def _drop_retrieval_index(self, dataset_id):
+		with self._retrieval_lock:
+			self._retrieval_indexes.pop(self._safe_text(dataset_id), None)
+			timer = self._retrieval_save_timers.pop(self._safe_text(dataset_id), None)
+			if timer is not None:
+				timer.cancel()
+		try:
+			index_file = self._retrieval_index_file(dataset_id)
+			if index_file.exists():
+				index_file.unlink()
+		except Exception as e:
+			print(f"[DatasetManager] Could not remove retrieval index for {dataset_id}: {e}")
+
+	def _retrieval_query_terms(self, user_turn_texts):
+		"""Weight terms from the latest user turns, newest strongest."""
+		weights = {}
+		weight = 1.0
+		for turn_text in reversed(user_turn_texts[-self.RETRIEVAL_QUERY_TURNS:]):
+			for term in BM25Index.tokenize(turn_text):
+				if weights.get(term, 0.0) < weight:
+					weights[term] = weight
+			weight *= self.RETRIEVAL_TURN_DECAY
+		return weights
+
+	def _resolve_retrieval_hits(self, plan, user_turn_texts, top_k):
+		"""Return {slot: hit} for the top_k retrieval entries relevant to the recent user turns."""
+		if not plan["retrieval_slots"]:
+			return {}
+		query_terms = self._retrieval_query_terms(user_turn_texts)
+		if not query_terms:
+			return {}
+		with self._retrieval_lock:
+			index = self._get_retrieval_index(plan)
+			results = index.search(query_terms, top_k=top_k)
+		hits = {}
+		for rank, (doc_id, score, terms) in enumerate(results):
+			slot = plan["retrieval_slots"].get(doc_id)
+			if slot is not None:
+				hits[slot] = {"rank": rank, "score": score, "terms": terms}
+		return hits
 
 	def _normalize_injection_persistence(self, value):
 		try:
@@ -430,142 +712,119 @@ class DatasetManager:
 
 		return turns
 
-	def _resolve_dynamic_entry_state(self, keywords, latest_user_text, user_turn_texts, persistence_turns):
-		keyword_list = [self._safe_text(keyword) for keyword in (keywords or []) if self._safe_text(keyword)]
-		if not keyword_list:
-			return {
-				"include": False,
-				"matched_keywords": [],
-				"trigger_reason": "",
-				"turns_since_trigger": None,
-				"turns_remaining": None,
-			}
+	def _resolve_dynamic_states(self, matcher, latest_user_text, user_turn_texts, persistence_turns):
+		"""Return {slot: state} for every dynamic entry that should be injected this turn."""
+		states = {}
+		if matcher is None or matcher.is_empty():
+			return states
 
-		direct_matches = [
-			keyword
-			for keyword in keyword_list
-			if self._keyword_matches(keyword, latest_user_text)
-		]
-		if direct_matches:
-			return {
-				"include": True,
-				"matched_keywords": direct_matches,
+		for slot, matched in matcher.match_slots(latest_user_text).items():
+			states[slot] = {
+				"matched_keywords": matched,
 				"trigger_reason": "mode:dynamic keyword_match",
 				"turns_since_trigger": 0,
 				"turns_remaining": persistence_turns,
 			}
 
-		if persistence_turns <= 0:
-			return {
-				"include": False,
-				"matched_keywords": [],
-				"trigger_reason": "",
-				"turns_since_trigger": None,
-				"turns_remaining": None,
-			}
-
-		if len(user_turn_texts) <= 1:
-			return {
-				"include": False,
-				"matched_keywords": [],
-				"trigger_reason": "",
-				"turns_since_trigger": None,
-				"turns_remaining": None,
-			}
-
-		for reverse_index, turn_text in enumerate(reversed(user_turn_texts[:-1]), start=1):
-			matched = [
-				keyword
-				for keyword in keyword_list
-				if self._keyword_matches(keyword, turn_text)
-			]
-			if not matched:
-				continue
-			if reverse_index <= persistence_turns:
-				return {
-					"include": True,
+		if persistence_turns <= 0 or len(user_turn_texts) <= 1:
+			return states
+
+		# Only the most recent prior match of an entry counts, and anything older than the
+		# persistence window cannot revive it, so turns past the window are never scanned.
+		seen = set(states)
+		prior_turns = user_turn_texts[:-1]
+		for reverse_index, turn_text in enumerate(reversed(prior_turns), start=1):
+			if reverse_index > persistence_turns:
+				break
+			for slot, matched in matcher.match_slots(turn_text).items():
+				if slot in seen:
+					continue
+				seen.add(slot)
+				states[slot] = {
 					"matched_keywords": matched,
 					"trigger_reason": "mode:dynamic persistence_window",
 					"turns_since_trigger": reverse_index,
 					"turns_remaining": max(0, persistence_turns - reverse_index),
 				}
-			break
+		return states
 
-		return {
-			"include": False,
-			"matched_keywords": [],
-			"trigger_reason": "",
-			"turns_since_trigger": None,
-			"turns_remaining": None,
-		}
-
-	def resolve_injections(self, bot_name, latest_user_message, history_messages=None, dataset_id=None, injection_persistence=None):
-		payload = self._load_normalized_payload(bot_name)
-		datasets = payload.get("datasets") if isinstance(payload.get("datasets"), list) else []
+	def resolve_injections(self, bot_name, latest_user_message, history_messages=None, dataset_id=None, injection_persistence=None, retrieval_top_k=None):
 		target_dataset_id = self._safe_text(dataset_id)
 		if target_dataset_id:
-			datasets = [
-				row for row in datasets
-				if self._safe_text((row or {}).get("id")) == target_dataset_id
-			]
+			dataset = self._store.get_dataset(target_dataset_id)
+			datasets = [dataset] if dataset is not None else []
+		else:
+			payload = self._load_normalized_payload(bot_name)
+			datasets = payload.get("datasets") if isinstance(payload.get("datasets"), list) else []
 		history_messages = history_messages if isinstance(history_messages, list) else []
 		latest_user_text = self._safe_text(latest_user_message).lower()
 		persistence_turns = self._normalize_injection_persistence(injection_persistence)
 		user_turn_texts = [item.lower() for item in self._build_user_turn_texts(latest_user_message, history_messages)]
+		try:
+			top_k = max(0, int(retrieval_top_k)) if retrieval_top_k is not None else self.RETRIEVAL_TOP_K
+		except Exception:
+			top_k = self.RETRIEVAL_TOP_K
 
 		resolved = []
 		for dataset in datasets:
 			dataset_name = self._safe_text(dataset.get("name") or "Dataset")
-			entries = dataset.get("entries") if isinstance(dataset.get("entries"), list) else []
-			entries = sorted(entries, key=lambda row: int(row.get("order", 0)))
-			for entry in entries:
-				mode = self._safe_text(entry.get("mode") or "static").lower()
-				if mode not in {"static", "dynamic", "inactive"}:
-					mode = "static"
-				if mode == "inactive":
-					continue
-				if not bool(entry.get("prompt_enabled", True)):
+			plan = self._get_dataset_plan(dataset)
+			entries = plan["entries"]
+			dynamic_states = self._resolve_dynamic_states(
+				matcher=plan["matcher"],
+				latest_user_text=latest_user_text,
+				user_turn_texts=user_turn_texts,
+				persistence_turns=persistence_turns,
+			)
+			retrieval_hits = self._resolve_retrieval_hits(plan, user_turn_texts, top_k)
+			candidate_slots = set(plan["static_slots"])
+			candidate_slots.update(dynamic_states)
+			candidate_slots.update(retrieval_hits)
+			for slot in sorted(candidate_slots):
+				entry = entries[slot]
+				mode = plan["modes"][slot]
+				if mode is None:
 					continue
 
 				matched_keywords = []
 				trigger_reason = "mode:static"
 				turns_since_trigger = None
 				turns_remaining = None
+				retrieval = None
 
 				if mode == "dynamic":
-					keywords = entry.get("keywords") if isinstance(entry.get("keywords"), list) else []
-					entry_state = self._resolve_dynamic_entry_state(
-						keywords=keywords,
-						latest_user_text=latest_user_text,
-						user_turn_texts=user_turn_texts,
-						persistence_turns=persistence_turns,
-					)
-					if not entry_state.get("include"):
+					entry_state = dynamic_states.get(slot)
+					if not entry_state:
 						continue
 					matched_keywords = entry_state.get("matched_keywords") or []
 					trigger_reason = self._safe_text(entry_state.get("trigger_reason")) or "mode:dynamic keyword_match"
 					turns_since_trigger = entry_state.get("turns_since_trigger")
 					turns_remaining = entry_state.get("turns_remaining")
+				elif mode == "retrieval":
+					retrieval = retrieval_hits.get(slot)
+					if not retrieval:
+						continue
+					matched_keywords = list(retrieval["terms"][:8])
+					trigger_reason = "mode:retrieval bm25"
 
 				context_value = self._safe_text(entry.get("context"))
-				if not context_value:
-					continue
-
-				resolved.append(
-					{
-						"dataset_id": self._safe_text(dataset.get("id")),
-						"dataset_name": dataset_name,
-						"entry_id": self._safe_text(entry.get("id")),
-						"entry_name": self._safe_text(entry.get("name")),
-						"mode": mode,
-						"trigger_reason": trigger_reason,
-						"matched_keywords": matched_keywords,
-						"turns_since_trigger": turns_since_trigger,
-						"turns_remaining": turns_remaining,
-						"injection_persistence": persistence_turns,
-						"context": context_value,
-						"order": int(entry.get("order", 0)),
-					}
-				)
+				row = {
+					"dataset_id": self._safe_text(dataset.get("id")),
+					"dataset_name": dataset_name,
+					"entry_id": self._safe_text(entry.get("id")),
+					"entry_name": self._safe_text(entry.get("name")),
+					"mode": mode,
+					"trigger_reason": trigger_reason,
+					"matched_keywords": matched_keywords,
+					"turns_since_trigger": turns_since_trigger,
+					"turns_remaining": turns_remaining,
+					"injection_persistence": persistence_turns,
+					"context": context_value,
+					"order": int(entry.get("order", 0)),
+				}
+				if retrieval is not None:
+					row["retrieval_rank"] = retrieval["rank"]
+					row["retrieval_score"] = round(retrieval["score"], 4)
+				resolved.append(row)
 
 		return resolved
@@ -0,0 +1,174 @@
+import heapq
+import json
+import math
+import os
+import re
+from pathlib import Path
+
+
+class BM25Index:
+	"""Okapi BM25 over the retrieval-mode entries of one dataset.
+
+	Per-entry term counts are persisted so a restart does not re-tokenize the corpus, and
+	`sync` only re-tokenizes entries whose stamp changed. Postings live in memory.
+	"""
+
+	VERSION = 1
+	K1 = 1.2
+	B = 0.75
+	# Terms found in more than this share of entries carry almost no signal and cost a full postings walk.
+	MAX_DOCUMENT_FREQUENCY = 0.5
+	MAX_QUERY_TERMS = 24
+	TOKEN_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+	STOPWORDS = frozenset((
+		"a", "about", "after", "again", "all", "also", "am", "an", "and", "any", "are", "as", "at",
+		"be", "because", "been", "before", "being", "but", "by", "can", "could", "did", "do", "does",
+		"doing", "for", "from", "had", "has", "have", "having", "he", "her", "here", "hers", "him",
+		"his", "how", "i", "if", "in", "into", "is", "it", "its", "just", "me", "more", "my", "no",
+		"not", "now", "of", "on", "or", "our", "out", "she", "so", "some", "than", "that", "the",
+		"their", "them", "then", "there", "these", "they", "this", "those", "to", "too", "up", "us",
+		"very", "was", "we", "were", "what", "when", "where", "which", "who", "why", "will", "with",
+		"would", "you", "your",
+	))
+
+	def __init__(self, path=None):
+		self.path = Path(path) if path else None
+		self.docs = {}
+		self.postings = {}
+		self.total_length = 0
+		self._norms = None
+
+	@classmethod
+	def tokenize(cls, text):
+		tokens = []
+		for token in cls.TOKEN_PATTERN.findall(str(text or "").lower()):
+			if len(token) < 2 or token in cls.STOPWORDS:
+				continue
+			# Cheap plural folding so "dragons" finds "dragon"; anything smarter needs a real stemmer.
+			if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+				token = token[:-1]
+			tokens.append(token)
+		return tokens
+
+	@classmethod
+	def load(cls, path):
+		index = cls(path)
+		if index.path is None or not index.path.is_file():
+			return index
+		try:
+			payload = json.loads(index.path.read_text(encoding="utf-8"))
+		except Exception as e:
+			print(f"[BM25Index] Rebuilding unreadable index {index.path.name}: {e}")
+			return index
+		if not isinstance(payload, dict) or payload.get("version") != cls.VERSION or not isinstance(payload.get("docs"), dict):
+			return index
+		for doc_id, doc in payload["docs"].items():
+			if not isinstance(doc, dict) or not isinstance(doc.get("tf"), dict):
+				continue
+			index._insert(str(doc_id), str(doc.get("stamp") or ""), {str(term): int(count) for term, count in doc["tf"].items()})
+		return index
+
+	def snapshot(self):
+		"""Serializable copy of the index; term maps are replaced, never edited, so sharing them is safe."""
+		return {
+			"version": self.VERSION,
+			"docs": {doc_id: {"stamp": doc["stamp"], "tf": doc["tf"]} for doc_id, doc in self.docs.items()},
+		}
+
+	def save(self, payload=None):
+		if self.path is None:
+			return True
+		payload = payload if payload is not None else self.snapshot()
+		try:
+			self.path.parent.mkdir(parents=True, exist_ok=True)
+			temp_file = self.path.with_name(f"{self.path.name}.tmp")
+			temp_file.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+			os.replace(temp_file, self.path)
+		except Exception as e:
+			print(f"[BM25Index] Error saving {self.path.name}: {e}")
+			return False
+		return True
+
+	def _insert(self, doc_id, stamp, tf):
+		length = sum(tf.values())
+		self.docs[doc_id] = {"stamp": stamp, "tf": tf, "len": length}
+		self.total_length += length
+		for term, count in tf.items():
+			self.postings.setdefault(term, {})[doc_id] = count
+		self._norms = None
+
+	def remove(self, doc_id):
+		doc = self.docs.pop(doc_id, None)
+		if doc is None:
+			return
+		self.total_length -= doc["len"]
+		for term in doc["tf"]:
+			posting = self.postings.get(term)
+			if posting is None:
+				continue
+			posting.pop(doc_id, None)
+			if not posting:
+				del self.postings[term]
+		self._norms = None
+
+	def add(self, doc_id, stamp, text):
+		self.remove(doc_id)
+		tf = {}
+		for token in self.tokenize(text):
+			tf[token] = tf.get(token, 0) + 1
+		self._insert(doc_id, stamp, tf)
+
+	def sync(self, documents):
+		"""Bring the index in line with [(doc_id, stamp, text_fn)]; returns how many docs changed."""
+		changed = 0
+		wanted = set()
+		for doc_id, stamp, text_fn in documents:
+			wanted.add(doc_id)
+			doc = self.docs.get(doc_id)
+			if doc is not None and doc["stamp"] == stamp:
+				continue
+			self.add(doc_id, stamp, text_fn())
+			changed += 1
+		for doc_id in [doc_id for doc_id in self.docs if doc_id not in wanted]:
+			self.remove(doc_id)
+			changed += 1
+		return changed
+
+	def _doc_norms(self):
+		if self._norms is None:
+			count = len(self.docs)
+			average = (self.total_length / count) if count else 0.0
+			self._norms = {
+				doc_id: self.K1 * (1.0 - self.B + self.B * (doc["len"] / average if average else 0.0))
+				for doc_id, doc in self.docs.items()
+			}
+		return self._norms
+
+	def search(self, weighted_terms, top_k=4):
+		"""Return [(doc_id, score, matched_terms)] for {term: weight}, best first."""
+		count = len(self.docs)
+		if not count or not weighted_terms or top_k <= 0:
+			return []
+
+		max_df = max(1, int(count * self.MAX_DOCUMENT_FREQUENCY))
+		terms = []
+		for term, weight in weighted_terms.items():
+			posting = self.postings.get(term)
+			if not posting or (count > 4 and len(posting) > max_df):
+				continue
+			df = len(posting)
+			idf = math.log(1.0 + (count - df + 0.5) / (df + 0.5))
+			terms.append((idf * weight, term, posting))
+		terms = heapq.nlargest(self.MAX_QUERY_TERMS, terms, key=lambda row: row[0])
+
+		norms = self._doc_norms()
+		scores = {}
+		matched = {}
+		factor = self.K1 + 1.0
+		for term_weight, term, posting in terms:
+			for doc_id, tf in posting.items():
+				scores[doc_id] = scores.get(doc_id, 0.0) + term_weight * tf * factor / (tf + norms[doc_id])
+				matched.setdefault(doc_id, []).append(term)
+
+		best = heapq.nlargest(top_k, scores.items(), key=lambda row: row[1])
+		return [(doc_id, score, matched[doc_id]) for doc_id, score in best if score > 0]
@@ -0,0 +1,556 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+
+class DatasetStore:
+	"""Process-wide in-memory copy of the global datasets.
+
+	The payload is loaded once, revalidated against the on-disk stamp at most once per
+	REVALIDATE_SECONDS and replaced copy-on-write by `update`, so readers can keep using
+	a snapshot without locking. Changes reach disk through a debounced atomic write.
+
+	Two disk layouts are supported:
+	- "single": everything in datasets.json (the original format).
+	- "sharded": manifest.json holds dataset order, each dataset has a base file under
+	  Shards/ plus an append-only log of entry patches, so an entry edit appends one line
+	  instead of rewriting the corpus. Logs are folded into the base once they outgrow it.
+	"""
+
+	REVALIDATE_SECONDS = 1.0
+	WRITE_DEBOUNCE_SECONDS = 0.75
+	WRITE_MAX_DELAY_SECONDS = 5.0
+	LAYOUTS = ("single", "sharded")
+	MANIFEST_FILE = "manifest.json"
+	MANIFEST_VERSION = 1
+	SHARDS_FOLDER = "Shards"
+	SHARD_LOG_COMPACT_BYTES = 256 * 1024
+
+	def __init__(self, path, normalizer=None):
+		self.path = Path(path)
+		self.folder = self.path.parent
+		self.layout = self.LAYOUTS[0]
+		self._normalizer = normalizer
+		self._lock = threading.RLock()
+		self._write_lock = threading.Lock()
+		self._payload = None
+		self._persisted = None
+		self._index = {}
+		self._stamp = None
+		self._checked_at = 0.0
+		self._revision = 0
+		self._dirty = False
+		self._dirty_since = 0.0
+		# Set while flush() writes unlocked; the files on disk are half-rewritten and must not be reloaded.
+		self._flushing = False
+		self._flush_timer = None
+		self._shard_files = {}
+		self._shard_sizes = {}
+		self._shard_seq = {}
+
+	def set_normalizer(self, normalizer):
+		with self._lock:
+			if normalizer is None or normalizer == self._normalizer:
+				return
+			self._normalizer = normalizer
+			if not self._dirty and not self._flushing:
+				# Anything loaded before the dataset manager attached was only structurally checked.
+				self._payload = None
+
+	# ---- disk layout ----
+
+	def _manifest_file(self):
+		return self.folder / self.MANIFEST_FILE
+
+	def _shards_folder(self):
+		return self.folder / self.SHARDS_FOLDER
+
+	def _disk_layout(self):
+		return "sharded" if self._manifest_file().is_file() else "single"
+
+	def _path_stamp(self, path):
+		try:
+			stat = path.stat()
+			return (stat.st_mtime_ns, stat.st_size)
+		except Exception:
+			return None
+
+	def _file_stamp(self):
+		if self._disk_layout() != "sharded":
+			return self._path_stamp(self.path)
+		shard_stamps = []
+		try:
+			with os.scandir(self._shards_folder()) as entries:
+				for entry in entries:
+					stat = entry.stat()
+					shard_stamps.append((entry.name, stat.st_mtime_ns, stat.st_size))
+		except Exception:
+			pass
+		return (self._path_stamp(self._manifest_file()), tuple(sorted(shard_stamps)))
+
+	def _read_json(self, path):
+		try:
+			return json.loads(path.read_text(encoding="utf-8"))
+		except Exception as e:
+			print(f"[DatasetStore] Could not read {path.name}: {e}")
+			return None
+
+	def _read_file(self):
+		if self._disk_layout() == "sharded":
+			return self._read_sharded()
+		if not self.path.exists() or not self.path.is_file():
+			return {"datasets": []}
+		payload = self._read_json(self.path)
+		if not isinstance(payload, dict) or not isinstance(payload.get("datasets"), list):
+			return {"datasets": []}
+		return {"datasets": payload.get("datasets")}
+
+	def _read_manifest(self):
+		manifest = self._read_json(self._manifest_file())
+		if not isinstance(manifest, dict) or not isinstance(manifest.get("datasets"), list):
+			return []
+		rows = []
+		for row in manifest.get("datasets"):
+			if not isinstance(row, dict):
+				continue
+			dataset_id = str(row.get("id") or "").strip()
+			file_name = str(row.get("file") or "").strip()
+			if dataset_id and file_name:
+				rows.append((dataset_id, file_name))
+		return rows
+
+	def _read_sharded(self):
+		shards = self._shards_folder()
+		datasets = []
+		self._shard_files = {}
+		self._shard_sizes = {}
+		self._shard_seq = {}
+		for dataset_id, file_name in self._read_manifest():
+			base = self._read_json(shards / f"{file_name}.json")
+			if not isinstance(base, dict) or not isinstance(base.get("dataset"), dict):
+				continue
+			dataset = base["dataset"]
+			try:
+				base_seq = int(base.get("log_seq") or 0)
+			except Exception:
+				base_seq = 0
+			log_bytes, seq = self._replay_shard_log(dataset, shards / f"{file_name}.log", base_seq)
+			dataset["id"] = dataset_id
+			datasets.append(dataset)
+			self._shard_files[dataset_id] = file_name
+			self._shard_sizes[dataset_id] = ((self._path_stamp(shards / f"{file_name}.json") or (0, 0))[1], log_bytes)
+			self._shard_seq[dataset_id] = seq
+		return {"datasets": datasets}
+
+	def _replay_shard_log(self, dataset, log_file, base_seq):
+		entries = {}
+		for index, entry in enumerate(dataset.get("entries") or []):
+			if isinstance(entry, dict):
+				entries[str(entry.get("id") or f"__row_{index}")] = entry
+		log_bytes = 0
+		seq = base_seq
+		if log_file.is_file():
+			try:
+				with open(log_file, "r", encoding="utf-8") as f:
+					for line in f:
+						log_bytes += len(line.encode("utf-8"))
+						line = line.strip()
+						if not line:
+							continue
+						try:
+							record = json.loads(line)
+						except Exception:
+							# A torn final line from an interrupted append; everything before it stands.
+							continue
+						try:
+							record_seq = int(record.get("seq") or 0)
+						except Exception:
+							continue
+						# Records at or below the base's seq were folded in before a compaction was interrupted.
+						if record_seq <= base_seq:
+							continue
+						seq = max(seq, record_seq)
+						self._apply_shard_record(dataset, entries, record)
+			except Exception as e:
+				print(f"[DatasetStore] Could not replay {log_file.name}: {e}")
+		ordered = list(entries.values())
+		for index, entry in enumerate(ordered):
+			entry["order"] = index
+		dataset["entries"] = ordered
+		return log_bytes, seq
+
+	def _apply_shard_record(self, dataset, entries, record):
+		if not isinstance(record, dict):
+			return
+		op = record.get("op")
+		if op == "put" and isinstance(record.get("entry"), dict):
+			entry = record["entry"]
+			entries[str(entry.get("id") or "")] = entry
+		elif op == "delete":
+			entries.pop(str(record.get("id") or ""), None)
+		elif op == "order" and isinstance(record.get("ids"), list):
+			reordered = {}
+			for entry_id in record["ids"]:
+				entry_id = str(entry_id or "")
+				if entry_id in entries and entry_id not in reordered:
+					reordered[entry_id] = entries[entry_id]
+			for entry_id, entry in entries.items():
+				reordered.setdefault(entry_id, entry)
+			entries.clear()
+			entries.update(reordered)
+		elif op == "meta" and isinstance(record.get("fields"), dict):
+			for key, value in record["fields"].items():
+				if key not in {"id", "entries"}:
+					dataset[key] = value
+
+	def _write_atomic(self, path, text):
+		path.parent.mkdir(parents=True, exist_ok=True)
+		temp_file = path.with_name(f"{path.name}.tmp")
+		temp_file.write_text(text, encoding="utf-8")
+		os.replace(temp_file, path)
+
+	def _write_single(self, payload):
+		self._write_atomic(self.path, json.dumps(payload, indent=2, ensure_ascii=False))
+
+	def _shard_file_name(self, dataset_id, taken):
+		base = re.sub(r"[^A-Za-z0-9_-]+", "_", dataset_id)[:80] or "dataset"
+		name = base
+		suffix = 2
+		while name in taken:
+			name = f"{base}_{suffix}"
+			suffix += 1
+		return name
+
+	def _write_shard_base(self, dataset):
+		dataset_id = str(dataset.get("id") or "").strip()
+		file_name = self._shard_files[dataset_id]
+		shards = self._shards_folder()
+		base = {"version": self.MANIFEST_VERSION, "log_seq": self._shard_seq.get(dataset_id, 0), "dataset": dataset}
+		text = json.dumps(base, indent=2, ensure_ascii=False)
+		self._write_atomic(shards / f"{file_name}.json", text)
+		log_file = shards / f"{file_name}.log"
+		if log_file.exists():
+			log_file.unlink()
+		self._shard_sizes[dataset_id] = (len(text.encode("utf-8")), 0)
+
+	def _entry_changed(self, old, new):
+		# "order" is positional in the log, so a row that only moved is not rewritten.
+		keys = (set(old) | set(new)) - {"order"}
+		return any(old.get(key) != new.get(key) for key in keys)
+
+	def _shard_patch_records(self, old, new):
+		records = []
+		meta = {
+			key: value for key, value in new.items()
+			if key not in {"id", "entries"} and old.get(key) != value
+		}
+		if meta:
+			records.append({"op": "meta", "fields": meta})
+
+		old_entries = old.get("entries") or []
+		new_entries = new.get("entries") or []
+		if old_entries is new_entries:
+			return records
+		old_by_id = {str(entry.get("id") or ""): entry for entry in old_entries}
+		new_ids = []
+		for entry in new_entries:
+			entry_id = str(entry.get("id") or "")
+			new_ids.append(entry_id)
+			previous = old_by_id.get(entry_id)
+			if previous is entry:
+				continue
+			if previous is None or self._entry_changed(previous, entry):
+				records.append({"op": "put", "entry": entry})
+
+		new_id_set = set(new_ids)
+		for entry_id in old_by_id:
+			if entry_id not in new_id_set:
+				records.append({"op": "delete", "id": entry_id})
+
+		# Replay keeps survivors in place and appends new ids, so only a real reorder needs a record.
+		expected = [entry_id for entry_id in old_by_id if entry_id in new_id_set]
+		expected.extend(entry_id for entry_id in new_ids if entry_id not in old_by_id)
+		if expected != new_ids:
+			records.append({"op": "order", "ids": new_ids})
+		return records
+
+	def _append_shard_log(self, dataset_id, records):
+		file_name = self._shard_files[dataset_id]
+		log_file = self._shards_folder() / f"{file_name}.log"
+		seq = self._shard_seq.get(dataset_id, 0)
+		lines = []
+		for record in records:
+			seq += 1
+			lines.append(json.dumps(dict(record, seq=seq), ensure_ascii=False) + "\n")
+		text = "".join(lines)
+		with open(log_file, "a", encoding="utf-8") as f:
+			f.write(text)
+			f.flush()
+			os.fsync(f.fileno())
+		self._shard_seq[dataset_id] = seq
+		base_bytes, log_bytes = self._shard_sizes.get(dataset_id, (0, 0))
+		log_bytes += len(text.encode("utf-8"))
+		self._shard_sizes[dataset_id] = (base_bytes, log_bytes)
+		return log_bytes > max(self.SHARD_LOG_COMPACT_BYTES, base_bytes)
+
+	def _write_manifest(self, datasets):
+		manifest = {
+			"version": self.MANIFEST_VERSION,
+			"datasets": [
+				{"id": str(dataset.get("id") or "").strip(), "file": self._shard_files[str(dataset.get("id") or "").strip()]}
+				for dataset in datasets
+			],
+		}
+		self._write_atomic(self._manifest_file(), json.dumps(manifest, indent=2, ensure_ascii=False))
+
+	def _write_sharded(self, payload, previous):
+		datasets = [row for row in payload.get("datasets") or [] if isinstance(row, dict)]
+		previous_rows = (previous or {}).get("datasets") or []
+		previous_by_id = {str(row.get("id") or "").strip(): row for row in previous_rows if isinstance(row, dict)}
+		taken = set(self._shard_files.values())
+		shards = self._shards_folder()
+		shards.mkdir(parents=True, exist_ok=True)
+
+		for dataset in datasets:
+			dataset_id = str(dataset.get("id") or "").strip()
+			old = previous_by_id.get(dataset_id)
+			if old is dataset and dataset_id in self._shard_files:
+				continue
+			if dataset_id not in self._shard_files:
+				file_name = self._shard_file_name(dataset_id, taken)
+				taken.add(file_name)
+				self._shard_files[dataset_id] = file_name
+				self._write_shard_base(dataset)
+				continue
+			if old is None:
+				self._write_shard_base(dataset)
+				continue
+			records = self._shard_patch_records(old, dataset)
+			if records and self._append_shard_log(dataset_id, records):
+				self._write_shard_base(dataset)
+
+		current_ids = [str(row.get("id") or "").strip() for row in datasets]
+		previous_ids = [str(row.get("id") or "").strip() for row in previous_rows if isinstance(row, dict)]
+		if previous is None or current_ids != previous_ids or not self._manifest_file().is_file():
+			self._write_manifest(datasets)
+
+		# Shards are dropped only after the manifest stops naming them.
+		current_id_set = set(current_ids)
+		for dataset_id in [key for key in self._shard_files if key not in current_id_set]:
+			file_name = self._shard_files.pop(dataset_id)
+			self._shard_sizes.pop(dataset_id, None)
+			self._shard_seq.pop(dataset_id, None)
+			for suffix in (".json", ".log"):
+				stale = shards / f"{file_name}{suffix}"
+				if stale.exists():
+					stale.unlink()
+
+	def _write_payload(self, payload, previous):
+		if self.layout == "sharded":
+			self._write_sharded(payload, previous)
+		else:
+			self._write_single(payload)
+
+	def _retire(self, path):
+		if path.exists():
+			os.replace(path, path.with_name(f"{path.name}.bak"))
+
+	def set_layout(self, layout):
+		"""Switch the disk layout, migrating whatever is on disk into it."""
+		layout = str(layout or "").strip().lower()
+		if layout not in self.LAYOUTS:
+			layout = self.LAYOUTS[0]
+		with self._write_lock:
+			with self._lock:
+				self.layout = layout
+				disk_layout = self._disk_layout()
+				if disk_layout == layout:
+					return layout
+
+				# Unwritten edits are newer than the disk, otherwise reload from the old layout.
+				payload = self._ensure_loaded(force=not self._dirty)
+				try:
+					if layout == "sharded":
+						self._shard_files = {}
+						self._shard_sizes = {}
+						self._shard_seq = {}
+						self._write_sharded(payload, None)
+						self._retire(self.path)
+					else:
+						self._write_single(payload)
+						self._retire(self._manifest_file())
+						shards = self._shards_folder()
+						if shards.is_dir():
+							for stale in shards.iterdir():
+								if stale.suffix in {".json", ".log"}:
+									stale.unlink()
+						self._shard_files = {}
+						self._shard_sizes = {}
+						self._shard_seq = {}
+				except Exception as e:
+					print(f"[DatasetStore] Could not migrate datasets to {layout} layout: {e}")
+					return self._disk_layout()
+
+				print(f"[DatasetStore] Migrated datasets from {disk_layout} to {layout} layout")
+				self._persisted = payload
+				self._dirty = False
+				self._stamp = self._file_stamp()
+				self._checked_at = time.monotonic()
+				return layout
+
+	# ---- in-memory payload ----
+
+	def _normalize(self, payload):
+		if callable(self._normalizer):
+			try:
+				return self._normalizer(payload)
+			except Exception as e:
+				print(f"[DatasetStore] Normalization failed: {e}")
+		return {"datasets": [row for row in payload.get("datasets") or [] if isinstance(row, dict)]}
+
+	def _install(self, payload):
+		self._payload = payload
+		self._index = {
+			str(row.get("id") or "").strip(): row
+			for row in payload.get("datasets") or []
+			if isinstance(row, dict)
+		}
+		self._revision += 1
+
+	def _ensure_loaded(self, force=False):
+		with self._lock:
+			now = time.monotonic()
+			if self._payload is not None and not force:
+				if self._dirty or self._flushing or now - self._checked_at < self.REVALIDATE_SECONDS:
+					return self._payload
+				self._checked_at = now
+				if self._file_stamp() == self._stamp:
+					return self._payload
+
+			# Stamp before reading so a write racing the read is picked up next time.
+			stamp = self._file_stamp()
+			self._install(self._normalize(self._read_file()))
+			self._persisted = self._payload
+			self._stamp = stamp
+			self._checked_at = now
+			return self._payload
+
+	def invalidate(self):
+		"""Drop the in-memory copy unless it holds unwritten changes."""
+		with self._lock:
+			if not self._dirty and not self._flushing:
+				self._payload = None
+
+	def snapshot(self):
+		"""Current normalized payload. Shared and read-only: never mutate it."""
+		return self._ensure_loaded()
+
+	def revision(self):
+		with self._lock:
+			self._ensure_loaded()
+			return self._revision
+
+	def get_dataset(self, dataset_id):
+		with self._lock:
+			self._ensure_loaded()
+			return self._index.get(str(dataset_id or "").strip())
+
+	def update(self, mutator):
+		"""Apply mutator(payload) -> (result, new_payload) and schedule a write.
+
+		The mutator must build new_payload without touching the current one; return
+		None as new_payload to leave the store unchanged.
+		"""
+		with self._lock:
+			current = self._ensure_loaded()
+			result, new_payload = mutator(current)
+			if new_payload is None:
+				return result
+			self._install(new_payload)
+			if not self._dirty:
+				self._dirty = True
+				self._dirty_since = time.monotonic()
+			self._schedule_flush()
+			return result
+
+	def _schedule_flush(self, delay=None):
+		if self._flush_timer is not None:
+			self._flush_timer.cancel()
+			self._flush_timer = None
+		if delay is None:
+			# Trailing debounce, capped so a steady stream of edits still reaches disk.
+			waited = time.monotonic() - self._dirty_since
+			delay = min(self.WRITE_DEBOUNCE_SECONDS, max(0.0, self.WRITE_MAX_DELAY_SECONDS - waited))
+		timer = threading.Timer(delay, self.flush)
+		timer.daemon = True
+		self._flush_timer = timer
+		timer.start()
+
+	def flush(self):
+		"""Write pending changes now. Returns False if they are still pending."""
+		with self._write_lock:
+			with self._lock:
+				if self._flush_timer is not None:
+					self._flush_timer.cancel()
+					self._flush_timer = None
+				if not self._dirty:
+					return True
+				# Payloads are replaced, never mutated, so this one can be serialized unlocked.
+				payload = self._payload
+				previous = self._persisted
+				self._dirty = False
+				self._flushing = True
+
+			try:
+				self._write_payload(payload, previous)
+			except Exception as e:
+				print(f"[DatasetStore] Error saving datasets, will retry: {e}")
+				with self._lock:
+					self._flushing = False
+					if not self._dirty:
+						self._dirty = True
+						self._dirty_since = time.monotonic()
+					self._schedule_flush(delay=self.WRITE_MAX_DELAY_SECONDS)
+				return False
+
+			with self._lock:
+				self._flushing = False
+				# No reload can run during the write, so this is exactly what the next sharded write diffs against.
+				self._persisted = payload
+				if not self._dirty:
+					if self._payload is not payload:
+						self._install(payload)
+					self._stamp = self._file_stamp()
+					self._checked_at = time.monotonic()
+			return True
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_dataset_store(path, normalizer=None):
+	"""Return the shared store for a datasets file, creating it on first use."""
+	key = str(Path(path).resolve())
+	with _stores_lock:
+		store = _stores.get(key)
+		if store is None:
+			store = DatasetStore(key, normalizer=normalizer)
+			_stores[key] = store
+	if normalizer is not None:
+		store.set_normalizer(normalizer)
+	return store
+
+
+def flush_dataset_stores():
+	with _stores_lock:
+		stores = list(_stores.values())
+	for store in stores:
+		store.flush()
+
+
+atexit.register(flush_dataset_stores)
@@ -0,0 +1,105 @@
+import threading
+import time
+import uuid
+
+
+class GenerationToken:
+    """Cancel token for one in-flight generation."""
+
+    def __init__(self, generation_id, chat_id=None, bot_name=None, kind="message"):
+        self.generation_id = generation_id
+        self.chat_id = str(chat_id or "").strip()
+        self.bot_name = str(bot_name or "").strip()
+        self.kind = str(kind or "message").strip() or "message"
+        self.started_at = time.time()
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def to_dict(self):
+        return {
+            "generation_id": self.generation_id,
+            "chat_id": self.chat_id,
+            "bot_name": self.bot_name,
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "elapsed_seconds": round(max(0.0, time.time() - self.started_at), 3),
+            "cancelled": self.is_cancelled(),
+        }
+
+
+class GenerationRegistry:
+    """Tracks in-flight generations so a stop request only cancels the one it targets."""
+
+    def __init__(self, debug_logger=None):
+        self.debug_logger = debug_logger
+        self._lock = threading.Lock()
+        self._generations = {}
+
+    def _debug(self, event, **details):
+        if callable(self.debug_logger):
+            try:
+                self.debug_logger(f"generation.{event}", **details)
+            except Exception:
+                pass
+
+    def _normalize_id(self, generation_id):
+        return str(generation_id or "").strip()[:128]
+
+    def begin(self, generation_id=None, chat_id=None, bot_name=None, kind="message"):
+        generation_id = self._normalize_id(generation_id) or uuid.uuid4().hex
+        token = GenerationToken(generation_id, chat_id=chat_id, bot_name=bot_name, kind=kind)
+        with self._lock:
+            previous = self._generations.get(generation_id)
+            self._generations[generation_id] = token
+        if previous is not None:
+            # A reused id means the client started over; the stale run must not keep going.
+            previous.cancel()
+        self._debug("begin", generation_id=generation_id, chat_id=token.chat_id, bot_name=token.bot_name, kind=token.kind)
+        return token
+
+    def finish(self, token):
+        if token is None:
+            return
+        with self._lock:
+            if self._generations.get(token.generation_id) is token:
+                self._generations.pop(token.generation_id, None)
+        self._debug(
+            "finish",
+            generation_id=token.generation_id,
+            cancelled=token.is_cancelled(),
+            elapsed_seconds=round(max(0.0, time.time() - token.started_at), 3)
+        )
+
+    def cancel(self, generation_id=None, chat_id=None, bot_name=None):
+        """Cancel by generation id, else every generation of a chat, else everything in flight."""
+        generation_id = self._normalize_id(generation_id)
+        chat_id = str(chat_id or "").strip()
+        bot_name = str(bot_name or "").strip()
+        with self._lock:
+            if generation_id:
+                targets = [self._generations[generation_id]] if generation_id in self._generations else []
+            elif chat_id:
+                targets = [
+                    token for token in self._generations.values()
+                    if token.chat_id == chat_id and (not bot_name or not token.bot_name or token.bot_name == bot_name)
+                ]
+            else:
+                targets = list(self._generations.values())
+
+        for token in targets:
+            token.cancel()
+
+        cancelled_ids = [token.generation_id for token in targets]
+        self._debug("cancel", generation_id=generation_id, chat_id=chat_id, cancelled=cancelled_ids)
+        return cancelled_ids
+
+    def list_active(self):
+        with self._lock:
+            tokens = list(self._generations.values())
+        tokens.sort(key=lambda token: token.started_at)
+        return [token.to_dict() for token in tokens]
@@ -180,6 +180,11 @@ def _build_handler(callbacks):
 				self._send_json(themes)
 				return
 
+			if request_path == "/api/generations":
+				result = callbacks["on_generation_list"]() if callbacks.get("on_generation_list") else {}
+				self._send_json(result or {"success": True, "generations": []})
+				return
+
 			if request_path == "/api/modules":
 				result = callbacks["on_modules_list"]() if callbacks.get("on_modules_list") else []
 				self._send_json(result or [])
@@ -245,9 +250,10 @@ def _build_handler(callbacks):
 					bot_name = data.get('bot_name')
 					persona_id = data.get('persona_id')
 					persona_name = data.get('persona_name')
+					generation_id = data.get('generation_id')
 					
 					if callbacks.get('on_message'):
-						response = callbacks['on_message'](message, save_response, chat_id, bot_name, persona_id, persona_name)
+						response = callbacks['on_message'](message, save_response, chat_id, bot_name, persona_id, persona_name, generation_id)
 						if not save_response:
 							# Only return response payload if this is a user message
 							if isinstance(response, dict):
@@ -279,6 +285,7 @@ def _build_handler(callbacks):
 					bot_name = data.get('bot_name')
 					persona_id = data.get('persona_id')
 					persona_name = data.get('persona_name')
+					generation_id = data.get('generation_id')
 
 					if not callbacks.get('on_message_stream'):
 						self.send_response(HTTPStatus.NOT_IMPLEMENTED)
@@ -295,7 +302,7 @@ def _build_handler(callbacks):
 					self.send_header('Connection', 'keep-alive')
 					self.end_headers()
 
-					event_iter = callbacks['on_message_stream'](message, chat_id, bot_name, persona_id, persona_name)
+					event_iter = callbacks['on_message_stream'](message, chat_id, bot_name, persona_id, persona_name, generation_id)
 					for event in event_iter or []:
 						payload = event if isinstance(event, dict) else {"type": "chunk", "text": str(event or "")}
 						line = (json.dumps(payload, ensure_ascii=False) + "\n").encode('utf-8')
@@ -520,7 +527,8 @@ def _build_handler(callbacks):
 								data.get('message_index'),
 								data.get('client_message_count'),
 								data.get('persona_id'),
-								data.get('persona_name')
+								data.get('persona_name'),
+								data.get('generation_id')
 							)
 							payload = result or {"success": False}
 						elif action == 'select_variant' and callbacks.get('on_chat_select_variant'):
@@ -539,7 +547,8 @@ def _build_handler(callbacks):
 								data.get('message_index'),
 								data.get('client_message_count'),
 								data.get('persona_id'),
-								data.get('persona_name')
+								data.get('persona_name'),
+								data.get('generation_id')
 							)
 							payload = result or {"success": False}
 						else:
@@ -826,6 +835,7 @@ def start_gui_server(on_message=None, on_message_stream=None, on_chat_action_str
 			'on_message_stream': on_message_stream,
 			'on_chat_action_stream': on_chat_action_stream,
 			'on_stop_generation': on_stop_generation,
+			'on_generation_list': None,
 			'on_debug_event': on_debug_event,
 			'on_bot_list': on_bot_list,
 			'on_bot_select': on_bot_select,
@@ -19,6 +19,7 @@ from main_page_manager import MainPageManager
 from help_me_manager import HelpMeManager
 from dataset_manager import DatasetManager
 from prompt_pipeline import PromptPipeline
+from generation_registry import GenerationRegistry
 from module_extension_manager import ModuleExtensionManager
 
 # Hey, you. You’re finally awake. You were trying to cross the paywall, right? 
@@ -56,6 +57,7 @@ class Application:
         self.chat_manager = ChatManager()
         self.chats_manager = ChatsManager(self.chat_manager)
         self.settings_manager = SettingsManager()
+        self.chat_manager.set_storage_mode(self.settings_manager.get("chat_storage_mode", "journal"))
         self.persona_manager = PersonaManager()
         self.persona_creation_manager = PersonaCreationManager()
         self.debug_manager = DebugManager(self.settings_manager, self._original_print)
@@ -63,6 +65,7 @@ class Application:
         self.main_page_manager = MainPageManager()
         self.help_me_manager = HelpMeManager()
         self.dataset_manager = DatasetManager()
+        self.dataset_manager.set_storage_mode(self.settings_manager.get("dataset_storage_mode", "single"))
         self.console.set_output_hook(self.debug_manager.on_console_output)
         
         # Track current active bot and persona
@@ -80,7 +83,7 @@ class Application:
             Path(__file__).parent.parent / "Modules",
             debug_logger=self.debug_manager.log_event
         )
-        self._generation_cancel_event = threading.Event()
+        self.generation_registry = GenerationRegistry(debug_logger=self.debug_manager.log_event)
         self._module_action_read_cache = {}
         self._module_action_read_cache_lock = threading.Lock()
         self._module_action_read_ttl_seconds = 0.35
@@ -127,6 +130,8 @@ class Application:
 
     def _shutdown(self):
         self._stop_gui()
+        self.dataset_manager.flush()
+        self.chat_manager.flush()
         self.console.close()
 
     def _on_console_command(self, command):
@@ -157,10 +162,23 @@ class Application:
         # Load extensions BEFORE GUI startup so they can register callbacks
         self._load_extensions()
 
-        def _on_stop_generation(_payload=None):
-            self._generation_cancel_event.set()
-            self.debug_manager.log_event("message.cancel_requested")
-            return {"success": True}
+        def _on_stop_generation(payload=None):
+            body = payload if isinstance(payload, dict) else {}
+            cancelled = self.generation_registry.cancel(
+                generation_id=body.get("generation_id"),
+                chat_id=body.get("chat_id"),
+                bot_name=body.get("bot_name")
+            )
+            self.debug_manager.log_event(
+                "message.cancel_requested",
+                generation_id=body.get("generation_id"),
+                chat_id=body.get("chat_id"),
+                cancelled=cancelled
+            )
+            return {"success": True, "cancelled": cancelled}
+
+        def _on_generation_list():
+            return {"success": True, "generations": self.generation_registry.list_active()}
 
         def _resolve_persona_name_for_chat(chat_id, requested_persona_name=None):
             chosen = (requested_persona_name or "").strip()
@@ -176,7 +194,21 @@ class Application:
                 chosen = "User"
             return chosen
 
-        def _on_message(message, save_response=False, chat_id=None, bot_name=None, persona_id=None, persona_name=None):
+        def _on_message(message, save_response=False, chat_id=None, bot_name=None, persona_id=None, persona_name=None, generation_id=None):
+            if save_response:
+                return _run_message(None, message, save_response, chat_id, bot_name, persona_id, persona_name)
+            generation = self.generation_registry.begin(
+                generation_id,
+                chat_id=chat_id or self.chat_manager.current_chat_id,
+                bot_name=bot_name or self.current_bot_name,
+                kind="message"
+            )
+            try:
+                return _run_message(generation, message, save_response, chat_id, bot_name, persona_id, persona_name)
+            finally:
+                self.generation_registry.finish(generation)
+
+        def _run_message(generation, message, save_response=False, chat_id=None, bot_name=None, persona_id=None, persona_name=None):
             print(f"[GUI] Message: {message} (save_response={save_response})")
             self.debug_manager.log_event(
                 "message.received",
@@ -192,13 +224,13 @@ class Application:
                 # This is a bot response, save it directly
                 if chat_id and bot_name:
                     self.chat_manager.add_message("assistant", message, chat_id, bot_name)
+                    self.prompt_pipeline.notify_reply_saved(bot_name, chat_id)
                 
                 self.debug_manager.log_event("message.saved_assistant", chat_id=chat_id, bot_name=bot_name)
                 return {
                     "success": True,
                 }
             else:
-                self._generation_cancel_event.clear()
                 # This is a user message
                 active_chat_id = chat_id or self.chat_manager.current_chat_id
                 active_bot_name = bot_name or self.current_bot_name
@@ -225,9 +257,9 @@ class Application:
                     chat_id=active_chat_id,
                     persona_id=persona_id,
                     persona_name=resolved_persona_name,
-                    cancel_check=self._generation_cancel_event.is_set
+                    cancel_check=generation.is_cancelled
                 )
-                if self._generation_cancel_event.is_set():
+                if generation.is_cancelled():
                     self.debug_manager.log_event("message.cancelled", chat_id=active_chat_id, bot_name=active_bot_name)
                     return {
                         "response": "",
@@ -245,7 +277,19 @@ class Application:
 
             return {"response": ""}
 
-        def _on_message_stream(message, chat_id=None, bot_name=None, persona_id=None, persona_name=None):
+        def _on_message_stream(message, chat_id=None, bot_name=None, persona_id=None, persona_name=None, generation_id=None):
+            generation = self.generation_registry.begin(
+                generation_id,
+                chat_id=chat_id or self.chat_manager.current_chat_id,
+                bot_name=bot_name or self.current_bot_name,
+                kind="message_stream"
+            )
+            try:
+                yield from _run_message_stream(generation, message, chat_id, bot_name, persona_id, persona_name)
+            finally:
+                self.generation_registry.finish(generation)
+
+        def _run_message_stream(generation, message, chat_id=None, bot_name=None, persona_id=None, persona_name=None):
             print(f"[GUI] Message stream: {message}")
             self.debug_manager.log_event(
                 "message.stream_received",
@@ -256,7 +300,6 @@ class Application:
                 message_length=len(str(message or ""))
             )
 
-            self._generation_cancel_event.clear()
             active_chat_id = chat_id or self.chat_manager.current_chat_id
             active_bot_name = bot_name or self.current_bot_name
             if active_chat_id and active_bot_name:
@@ -285,9 +328,9 @@ class Application:
                     chat_id=active_chat_id,
                     persona_id=persona_id,
                     persona_name=resolved_persona_name,
-                    cancel_check=self._generation_cancel_event.is_set
+                    cancel_check=generation.is_cancelled
                 ):
-                    if self._generation_cancel_event.is_set():
+                    if generation.is_cancelled():
                         self.debug_manager.log_event("message.stream_cancelled", chat_id=active_chat_id, bot_name=active_bot_name)
                         yield {"type": "cancelled"}
                         return
@@ -355,6 +398,7 @@ class Application:
                 "active_iam_set": payload.get("active_iam_set"),
                 "active_dataset_id": payload.get("active_dataset_id"),
                 "dataset_injection_persistence": payload.get("dataset_injection_persistence"),
+                "dataset_injection_token_budget": payload.get("dataset_injection_token_budget"),
                 "example_messages": payload.get("example_messages"),
                 "example_injection_threshold": payload.get("example_injection_threshold"),
             }
@@ -664,8 +708,14 @@ class Application:
                 "messages": result,
             }
 
-        def _on_chat_regenerate_message(chat_id, bot_name, message_index, client_message_count=None, persona_id=None, persona_name=None):
-            self._generation_cancel_event.clear()
+        def _on_chat_regenerate_message(chat_id, bot_name, message_index, client_message_count=None, persona_id=None, persona_name=None, generation_id=None):
+            generation = self.generation_registry.begin(generation_id, chat_id=chat_id, bot_name=bot_name, kind="regenerate_message")
+            try:
+                return _run_chat_regenerate_message(generation, chat_id, bot_name, message_index, client_message_count, persona_id, persona_name)
+            finally:
+                self.generation_registry.finish(generation)
+
+        def _run_chat_regenerate_message(generation, chat_id, bot_name, message_index, client_message_count=None, persona_id=None, persona_name=None):
             module_progress_events = []
 
             def _module_progress_callback(event):
@@ -728,7 +778,7 @@ class Application:
                 persona_id=persona_id,
                 persona_name=resolved_persona,
                 latest_user_message=user_prompt,
-                cancel_check=self._generation_cancel_event.is_set,
+                cancel_check=generation.is_cancelled,
                 module_progress_callback=_module_progress_callback,
             )
 
@@ -743,7 +793,7 @@ class Application:
                 reply_length=len(str(reply or ""))
             )
 
-            if self._generation_cancel_event.is_set():
+            if generation.is_cancelled():
                 _debug_chat_action(
                     "regenerate.cancelled",
                     chat_id=chat_id,
@@ -776,6 +826,7 @@ class Application:
             if result is None:
                 _debug_chat_action("regenerate.persist_failed", chat_id=chat_id, bot_name=bot_name, resolved_index=index)
                 return {"success": False, "message": "Failed to save regenerated message"}
+            self.prompt_pipeline.notify_reply_saved(bot_name, chat_id)
             self.chat_manager.current_chat_id = chat_id
             self.current_bot_name = bot_name
             _debug_chat_action(
@@ -837,8 +888,14 @@ class Application:
                 "messages": result,
             }
 
-        def _on_chat_continue_message(chat_id, bot_name, message_index, client_message_count=None, persona_id=None, persona_name=None):
-            self._generation_cancel_event.clear()
+        def _on_chat_continue_message(chat_id, bot_name, message_index, client_message_count=None, persona_id=None, persona_name=None, generation_id=None):
+            generation = self.generation_registry.begin(generation_id, chat_id=chat_id, bot_name=bot_name, kind="continue_message")
+            try:
+                return _run_chat_continue_message(generation, chat_id, bot_name, message_index, client_message_count, persona_id, persona_name)
+            finally:
+                self.generation_registry.finish(generation)
+
+        def _run_chat_continue_message(generation, chat_id, bot_name, message_index, client_message_count=None, persona_id=None, persona_name=None):
             module_progress_events = []
 
             def _module_progress_callback(event):
@@ -883,11 +940,11 @@ class Application:
                 persona_id=persona_id,
                 persona_name=resolved_persona,
                 latest_user_message=continue_prompt,
-                cancel_check=self._generation_cancel_event.is_set,
+                cancel_check=generation.is_cancelled,
                 module_progress_callback=_module_progress_callback,
             )
 
-            if self._generation_cancel_event.is_set():
+            if generation.is_cancelled():
                 _debug_chat_action(
                     "continue.cancelled",
                     chat_id=chat_id,
@@ -919,6 +976,7 @@ class Application:
             if result is None:
                 _debug_chat_action("continue.persist_failed", chat_id=chat_id, bot_name=bot_name, resolved_index=index)
                 return {"success": False, "message": "Failed to save continued message"}
+            self.prompt_pipeline.notify_reply_saved(bot_name, chat_id)
             self.chat_manager.current_chat_id = chat_id
             self.current_bot_name = bot_name
             _debug_chat_action(
@@ -937,6 +995,18 @@ class Application:
 
         def _on_chat_action_stream(payload):
             body = payload if isinstance(payload, dict) else {}
+            generation = self.generation_registry.begin(
+                body.get("generation_id"),
+                chat_id=body.get("chat_id"),
+                bot_name=body.get("bot_name"),
+                kind=str(body.get("action") or "chat_action").strip().lower() or "chat_action"
+            )
+            try:
+                yield from _run_chat_action_stream(generation, body)
+            finally:
+                self.generation_registry.finish(generation)
+
+        def _run_chat_action_stream(generation, body):
             action = str(body.get("action") or "").strip().lower()
             chat_id = body.get("chat_id")
             bot_name = body.get("bot_name")
@@ -952,7 +1022,6 @@ class Application:
             action_timeout_seconds = 65.0
             action_started_at = time.monotonic()
 
-            self._generation_cancel_event.clear()
             module_progress_events = []
 
             def _module_progress_callback(event):
@@ -1012,14 +1081,14 @@ class Application:
                     persona_id=persona_id,
                     persona_name=resolved_persona,
                     latest_user_message=user_prompt,
-                    cancel_check=self._generation_cancel_event.is_set,
+                    cancel_check=generation.is_cancelled,
                     module_progress_callback=_module_progress_callback,
                 ):
                     if (time.monotonic() - action_started_at) >= action_timeout_seconds:
                         yield {"type": "error", "error": "Chat action timed out. Please try regenerate again."}
                         return
 
-                    if self._generation_cancel_event.is_set():
+                    if generation.is_cancelled():
                         yield {
                             "type": "cancelled",
                             "messages": messages,
@@ -1050,7 +1119,7 @@ class Application:
                 yield {"type": "error", "error": str(exc)}
                 return
 
-            if self._generation_cancel_event.is_set():
+            if generation.is_cancelled():
                 yield {
                     "type": "cancelled",
                     "messages": messages,
@@ -1075,6 +1144,7 @@ class Application:
             if result_messages is None:
                 yield {"type": "error", "error": "Failed to save chat action result."}
                 return
+            self.prompt_pipeline.notify_reply_saved(bot_name, chat_id)
 
             self.chat_manager.current_chat_id = chat_id
             self.current_bot_name = bot_name
@@ -1127,6 +1197,8 @@ class Application:
             
         def _on_persona_create(name, description, cover_art):
             persona = self.persona_creation_manager.create_persona(name, description, cover_art)
+            # Created through a different manager, so tell the persona side its folder changed.
+            self.persona_manager.bump_revision()
             print(f"[GUI] Persona created: {name}")
             return persona
             
@@ -1206,14 +1278,31 @@ class Application:
             print("[GUI] Settings requested")
             return settings
             
+        def _api_endpoint_key():
+            return (
+                str(self.settings_manager.get("api_provider", "") or "").strip().lower(),
+                str(self.settings_manager.get("api_base_url", "") or "").strip(),
+            )
+
         def _on_settings_update(settings_dict):
+            previous_endpoint = _api_endpoint_key()
             success = self.settings_manager.update_multiple(settings_dict)
+            if success:
+                self.chat_manager.set_storage_mode(self.settings_manager.get("chat_storage_mode", "journal"))
+                self.dataset_manager.set_storage_mode(self.settings_manager.get("dataset_storage_mode", "single"))
+                if _api_endpoint_key() != previous_endpoint:
+                    # Idle keep-alive sockets to the old host would otherwise stay open until the server drops them.
+                    self.prompt_pipeline.close_http_connections()
+                self.prompt_pipeline.refresh_token_counter()
             print(f"[GUI] Settings update: {'successful' if success else 'failed'}")
             return success
         
         def _on_settings_reset():
             """Reset all settings to defaults"""
+            previous_endpoint = _api_endpoint_key()
             success = self.settings_manager.reset_to_defaults()
+            if success and _api_endpoint_key() != previous_endpoint:
+                self.prompt_pipeline.close_http_connections()
             print(f"[GUI] Settings reset to defaults: {'successful' if success else 'failed'}")
             return self.settings_manager.get_all() if success else None
 
@@ -1336,7 +1425,7 @@ class Application:
                 'settings_manager': self.settings_manager,
                 'prompt_pipeline': self.prompt_pipeline,
                 'debug_logger': self.debug_manager.log_event,
-                'generation_cancel_event': self._generation_cancel_event,
+                'generation_registry': self.generation_registry,
             }
 
             outcome = self.module_extension_manager.execute_module_action(
@@ -1432,6 +1521,7 @@ class Application:
             'on_message': _on_message,
             'on_message_stream': _on_message_stream,
             'on_stop_generation': _on_stop_generation,
+            'on_generation_list': _on_generation_list,
             'on_debug_event': _on_debug_event,
             'on_bot_list': _on_bot_list,
             'on_bot_select': _on_bot_select,
@@ -1486,6 +1576,8 @@ class Application:
                 callback()
             except Exception as e:
                 print(f"[MainApp] Extension shutdown callback failed: {e}")
+
+        self.prompt_pipeline.close_http_connections()
         
         if self._gui_server is None:
             return
@@ -2,8 +2,10 @@
 
 import base64
 import json
+import os
 import re
 import shutil
+import threading
 from pathlib import Path
 from datetime import datetime
 
@@ -17,6 +19,38 @@ class PersonaManager:
         """Initialize the persona manager with the path to the Personas folder"""
         self.personas_folder = Path(__file__).parent / personas_folder
         self.current_persona = None
+        self._revision = 0
+        self._revision_lock = threading.Lock()
+        self._file_stamps = {}
+
+    def bump_revision(self):
+        with self._revision_lock:
+            self._revision += 1
+
+    def get_revision(self, persona_id=None):
+        """Counter bumped on every persona write or delete; prompt caches key on it.
+
+        With a persona_id the persona's files are stamped too (mtime and size), so edits made
+        outside the app bump the counter the next time that persona is asked about.
+        """
+        stamp = self._persona_files_stamp(persona_id) if persona_id else None
+        with self._revision_lock:
+            if persona_id:
+                key = str(persona_id)
+                if key in self._file_stamps and self._file_stamps[key] != stamp:
+                    self._revision += 1
+                self._file_stamps[key] = stamp
+            return self._revision
+
+    def _persona_files_stamp(self, persona_id):
+        try:
+            with os.scandir(self._persona_dir(persona_id)) as entries:
+                return tuple(sorted(
+                    (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                    for entry in entries if entry.is_file()
+                ))
+        except Exception:
+            return None
 
     def _log_error(self, message):
         print(f"[PersonaManager] {message}")
@@ -178,6 +212,7 @@ class PersonaManager:
         }
         persona_dir.mkdir(parents=True, exist_ok=True)
         self._write_json_payload(persona_dir / self.PERSONA_FILE_NAME, payload, "Error saving persona")
+        self.bump_revision()
 
     def get_all_personas(self):
         """Get all available personas"""
@@ -231,6 +266,7 @@ class PersonaManager:
 
         try:
             shutil.rmtree(persona_dir)
+            self.bump_revision()
             print(f"[PersonaManager] Deleted persona '{persona_id}'")
             return True
         except Exception as e:
@@ -10,6 +10,7 @@ class SettingsManager:
         self.settings_folder = Path(__file__).parent / settings_folder
         self.settings_file = self.settings_folder / "settings.txt"
         self.settings = {}
+        self.revision = 0
         self.default_settings = {
             # Style Settings
             "theme": "default",
@@ -26,6 +27,12 @@ class SettingsManager:
             
             # Generation Settings
             "max_context_messages": 10,
+            # "tokens" packs history to the prompt budget instead of the last max_context_messages.
+            "history_window_mode": "messages",
+            "history_summary_slot": True,
+            "prompt_prefix_cache": False,
+            # Local tokenizer.json of the loaded model; empty uses a cached tiktoken encoding or len/4.
+            "tokenizer_file": "",
             "temperature": 0.8,
             "max_tokens": 10000,
             "max_response_length": 400,
@@ -47,6 +54,8 @@ class SettingsManager:
             
             # Other Settings
             "auto_save_chats": True,
+            "chat_storage_mode": "journal",
+            "dataset_storage_mode": "single",
             "default_bot": "Nova",
             "gui_port": WEB_PORT,
             "auto_load_last_chat": False,
@@ -64,6 +73,7 @@ class SettingsManager:
         
     def load_settings(self):
         """Load settings from file or create default settings"""
+        self.revision += 1
         if not self.settings_file.exists():
             self.settings = self.default_settings.copy()
             self.save_settings()
@@ -107,6 +117,7 @@ class SettingsManager:
             
     def save_settings(self):
         """Save settings to file"""
+        self.revision += 1
         self._ensure_settings_folder()
         try:
             with open(self.settings_file, 'w', encoding='utf-8') as f:
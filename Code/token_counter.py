@@ -0,0 +1,180 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class TokenCounter:
+    """Counts prompt tokens with a local BPE tokenizer when one is available, else the len/4 heuristic.
+
+    Tokenizers are only ever read from disk, never downloaded: either the local model's own
+    tokenizer.json (`tokenizer_file`, needs the `tokenizers` package) or a tiktoken encoding
+    that is already in its cache directory. Loading is deferred to the first count.
+    Counts are cached by content hash, so re-measuring the same history every turn is a dict lookup.
+    """
+
+    DEFAULT_ENCODING = "cl100k_base"
+    CACHE_MAX_ENTRIES = 8192
+    # Chat templates wrap every message in a few role/separator tokens.
+    MESSAGE_OVERHEAD_TOKENS = 4
+    # tiktoken caches each encoding under the SHA-1 of its download URL.
+    TIKTOKEN_BLOBS = {
+        "cl100k_base": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+        "o200k_base": "https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken",
+    }
+
+    def __init__(self, encoding_name=None, cache_max_entries=None, tokenizer_file=None):
+        self.encoding_name = str(encoding_name or self.DEFAULT_ENCODING).strip() or self.DEFAULT_ENCODING
+        self.tokenizer_file = str(tokenizer_file or "").strip()
+        self.cache_max_entries = max(16, int(cache_max_entries or self.CACHE_MAX_ENTRIES))
+        self._encode = None
+        self._encoder_name = "heuristic"
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def name(self):
+        self._ensure_loaded()
+        return self._encoder_name
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return self._encode
+        with self._load_lock:
+            if not self._loaded:
+                self._encode, self._encoder_name = self._load_encoder()
+                self._loaded = True
+        return self._encode
+
+    def _load_encoder(self):
+        if self.tokenizer_file:
+            encoder = self._load_tokenizer_file(self.tokenizer_file)
+            if encoder is not None:
+                return encoder, f"tokenizer:{Path(self.tokenizer_file).name}"
+        encoder = self._load_cached_tiktoken(self.encoding_name)
+        if encoder is not None:
+            return encoder, f"tiktoken:{self.encoding_name}"
+        return None, "heuristic"
+
+    def _load_tokenizer_file(self, tokenizer_file):
+        path = Path(tokenizer_file).expanduser()
+        if not path.is_file():
+            print(f"[TokenCounter] Tokenizer file '{tokenizer_file}' not found, using fallback")
+            return None
+        try:
+            from tokenizers import Tokenizer
+        except Exception:
+            print("[TokenCounter] The 'tokenizers' package is needed to read tokenizer files, using fallback")
+            return None
+        try:
+            tokenizer = Tokenizer.from_file(str(path))
+        except Exception as e:
+            print(f"[TokenCounter] Tokenizer file '{path.name}' unreadable, using fallback: {e}")
+            return None
+        return lambda raw: len(tokenizer.encode(raw, add_special_tokens=False).ids)
+
+    def _tiktoken_cache_file(self, encoding_name):
+        blob = self.TIKTOKEN_BLOBS.get(encoding_name)
+        if not blob:
+            return None
+        if "TIKTOKEN_CACHE_DIR" in os.environ:
+            cache_dir = os.environ["TIKTOKEN_CACHE_DIR"]
+        elif "DATA_GYM_CACHE_DIR" in os.environ:
+            cache_dir = os.environ["DATA_GYM_CACHE_DIR"]
+        else:
+            cache_dir = os.path.join(tempfile.gettempdir(), "data-gym-cache")
+        if not cache_dir:
+            # An empty cache dir disables tiktoken's cache, so every load would hit the network.
+            return None
+        return Path(cache_dir) / hashlib.sha1(blob.encode()).hexdigest()
+
+    def _load_cached_tiktoken(self, encoding_name):
+        cache_file = self._tiktoken_cache_file(encoding_name)
+        if cache_file is None or not cache_file.is_file():
+            return None
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            print(f"[TokenCounter] BPE encoding '{encoding_name}' unavailable, using heuristic: {e}")
+            return None
+        return lambda raw: len(encoding.encode(raw, disallowed_special=()))
+
+    def _measure(self, raw):
+        encode = self._ensure_loaded()
+        if encode is not None:
+            try:
+                return max(1, encode(raw))
+            except Exception:
+                pass
+        return max(1, int(round(len(raw) / 4)))
+
+    def count(self, text):
+        raw = str(text or "")
+        if not raw.strip():
+            return 0
+        key = hashlib.blake2b(raw.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+        tokens = self._measure(raw)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = tokens
+            if len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def count_message(self, message):
+        if not isinstance(message, dict):
+            return self.count(message)
+        content = message.get("content")
+        if isinstance(content, list):
+            tokens = sum(self.count(part.get("text") if isinstance(part, dict) else part) for part in content)
+        else:
+            tokens = self.count(content)
+        return tokens + self.MESSAGE_OVERHEAD_TOKENS
+
+    def count_messages(self, messages):
+        return sum(self.count_message(message) for message in (messages or []))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "counter": self._encoder_name if self._loaded else "not loaded",
+                "cached": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_shared_counter = None
+
+
+def set_shared_counter(count_fn):
+    """Called by PromptPipeline so module engines measure text with the same counter it uses."""
+    global _shared_counter
+    _shared_counter = count_fn if callable(count_fn) else None
+
+
+def estimate_tokens(text):
+    """Token estimate for module engines: the pipeline's counter when one is published, else len/4."""
+    raw = str(text or "")
+    if not raw.strip():
+        return 0
+    counter = _shared_counter
+    if counter is not None:
+        try:
+            return int(counter(raw))
+        except Exception:
+            pass
+    return max(1, int(round(len(raw) / 4)))
@@ -11,6 +11,8 @@ Auto Summary Module (Internal)
 - Messages tagged as Core Memory are never summarized.
 - Summary transformations preserve chronological ordering and source lineage.
 """.strip()
+MODULE_CONCURRENCY = "iam_writer"
+MODULE_DEPENDS_ON = ()
 
 
 _ENGINE_MODULE = None
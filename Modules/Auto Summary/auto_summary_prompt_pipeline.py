@@ -1,9 +1,14 @@
 import json
+import os
 import re
 import threading
+import time
+import zlib
 from datetime import datetime
 from pathlib import Path
 
+from token_counter import estimate_tokens as _estimate_tokens
+
 CORE_MARKER = "[[AUTO_SUMMARY_CORE]]"
 HIDDEN_MARKER = "[[AUTO_SUMMARY_HIDDEN]]"
 PHASE1_MARKER = "[[AUTO_SUMMARY_PHASE1]]"
@@ -12,12 +17,222 @@ PHASE3_MARKER = "[[AUTO_SUMMARY_PHASE3]]"
 
 _LOCK = threading.RLock()
 _CHAT_LOCKS = {}
+# Per-chat compaction queue: at most one pending job per chat (newer turns replace older ones)
+_JOB_LOCK = threading.Lock()
+_PENDING_JOBS = {}
+_ACTIVE_WORKERS = set()
+_META_DEFAULTS = {
+    "phase": 0,
+    "summarized_phase1": False,
+    "summarized_phase2": False,
+    "protected_core": False,
+    "hidden_from_chat": False,
+    "merged_out": False,
+}
+# Summary tree row kinds each phase may consume
+PHASE1_KINDS = ("p0",)
+PHASE2_KINDS = ("p1",)
+PHASE3_KINDS = ("p1", "p2")
+_JOB_CONTEXT_KEYS = ("debug_logger", "bot_name", "chat_id", "bot_manager", "chat_manager", "settings_manager", "prompt_pipeline")
 _RUNTIME_STORE = {
     "metadata": {},
     "status": {},
     "diagnostics": {},
+    "trees": {},
 }
 
+STATE_FOLDER = "Summary"
+STATE_FILE = "auto_summary_state.json"
+STATE_LOG_FILE = "auto_summary_state.log"
+STATE_VERSION = 1
+# The journal is folded back into the state file once it grows past either limit.
+STATE_LOG_COMPACT_BYTES = 128 * 1024
+STATE_LOG_COMPACT_RECORDS = 200
+TREE_FILE = "summary_tree.json"
+
+
+class _CowItems(dict):
+    """Metadata items shared with the stored snapshot; `writable` copies an item before its first change."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._owned = set()
+
+    def writable(self, key):
+        if key not in self._owned:
+            item = self.get(key)
+            self[key] = dict(item) if isinstance(item, dict) else {}
+            self._owned.add(key)
+        return self[key]
+
+
+class _SummaryTree:
+    """Chronological index over a chat's IAM entries.
+
+    Rows are grouped into fixed-size leaves and leaves into fixed-fanout parents. Every node caches
+    its token totals and how many rows of each kind it holds, so usage is read off the root and the
+    oldest candidate of a kind is found by walking down a single branch.
+    """
+
+    VERSION = 2
+    LEAF_SIZE = 16
+    FANOUT = 8
+
+    def __init__(self):
+        self.rows = []
+        self.levels = [[]]
+        self.index = {}
+        self.meta_revision = None
+        self.dirty = False
+
+    @classmethod
+    def from_payload(cls, payload):
+        tree = cls()
+        if not isinstance(payload, dict) or payload.get("version") != cls.VERSION:
+            return tree
+        if payload.get("leaf_size") != cls.LEAF_SIZE or payload.get("fanout") != cls.FANOUT:
+            return tree
+        rows = []
+        for raw in payload.get("rows") or []:
+            if not isinstance(raw, list) or len(raw) != 5:
+                return cls()
+            rows.append({"file": str(raw[0]), "tokens": int(raw[1]), "digest": str(raw[2]), "phase": int(raw[3]), "kind": str(raw[4])})
+        levels = payload.get("levels")
+        tree.rows = rows
+        tree.index = {row["file"]: position for position, row in enumerate(rows)}
+        tree.meta_revision = payload.get("meta_revision")
+        if isinstance(levels, list) and levels and isinstance(levels[0], list) and len(levels[0]) == cls._leaf_count(len(rows)):
+            tree.levels = levels
+        else:
+            tree.rebuild(rows)
+        return tree
+
+    def snapshot(self):
+        return {
+            "version": self.VERSION,
+            "leaf_size": self.LEAF_SIZE,
+            "fanout": self.FANOUT,
+            "meta_revision": self.meta_revision,
+            "rows": [[row["file"], row["tokens"], row["digest"], row["phase"], row["kind"]] for row in self.rows],
+            "levels": self.levels,
+        }
+
+    @classmethod
+    def _leaf_count(cls, row_count):
+        return (row_count + cls.LEAF_SIZE - 1) // cls.LEAF_SIZE
+
+    @staticmethod
+    def _merge(nodes):
+        tokens = 0
+        phase0 = 0
+        counts = {}
+        for node in nodes:
+            tokens += node["tokens"]
+            phase0 += node["phase0"]
+            for kind, count in node["counts"].items():
+                counts[kind] = counts.get(kind, 0) + count
+        return {"tokens": tokens, "phase0": phase0, "counts": counts}
+
+    def _leaf(self, leaf_index):
+        start = leaf_index * self.LEAF_SIZE
+        return self._merge(
+            {"tokens": row["tokens"], "phase0": row["tokens"] if row["phase"] == 0 else 0, "counts": {row["kind"]: 1}}
+            for row in self.rows[start:start + self.LEAF_SIZE]
+        )
+
+    def rebuild(self, rows):
+        self.rows = list(rows)
+        self.index = {row["file"]: position for position, row in enumerate(self.rows)}
+        level = [self._leaf(leaf_index) for leaf_index in range(self._leaf_count(len(self.rows)))]
+        self.levels = [level]
+        while len(level) > 1:
+            level = [self._merge(level[start:start + self.FANOUT]) for start in range(0, len(level), self.FANOUT)]
+            self.levels.append(level)
+        self.dirty = True
+
+    def _refresh_path(self, row_position):
+        node_index = row_position // self.LEAF_SIZE
+        for depth, nodes in enumerate(self.levels):
+            if depth == 0:
+                node = self._leaf(node_index)
+            else:
+                node_index //= self.FANOUT
+                children = self.levels[depth - 1]
+                node = self._merge(children[node_index * self.FANOUT:(node_index + 1) * self.FANOUT])
+            if node_index < len(nodes):
+                nodes[node_index] = node
+            else:
+                nodes.append(node)
+        if len(self.levels[-1]) > 1:
+            self.levels.append([self._merge(self.levels[-1])])
+        self.dirty = True
+
+    def put(self, row):
+        position = self.index.get(row["file"])
+        if position is None:
+            position = len(self.rows)
+            self.rows.append(row)
+            self.index[row["file"]] = position
+        else:
+            self.rows[position] = row
+        self._refresh_path(position)
+
+    def root(self):
+        top = self.levels[-1]
+        return top[0] if top else {"tokens": 0, "phase0": 0, "counts": {}}
+
+    def count(self, kinds):
+        counts = self.root()["counts"]
+        return sum(counts.get(kind, 0) for kind in kinds)
+
+    def kinds(self):
+        return [kind for kind, count in self.root()["counts"].items() if count > 0]
+
+    def first(self, kinds, limit):
+        """Positions of the oldest `limit` rows of the given kinds; subtrees without one are skipped."""
+        found = []
+        if not self.rows or limit <= 0:
+            return found
+
+        def walk(depth, node_index):
+            counts = self.levels[depth][node_index]["counts"]
+            if not any(counts.get(kind) for kind in kinds):
+                return
+            if depth == 0:
+                start = node_index * self.LEAF_SIZE
+                for offset, row in enumerate(self.rows[start:start + self.LEAF_SIZE]):
+                    if row["kind"] in kinds:
+                        found.append(start + offset)
+                        if len(found) >= limit:
+                            return
+                return
+            child_count = len(self.levels[depth - 1])
+            for child_index in range(node_index * self.FANOUT, min((node_index + 1) * self.FANOUT, child_count)):
+                walk(depth - 1, child_index)
+                if len(found) >= limit:
+                    return
+
+        walk(len(self.levels) - 1, 0)
+        return found
+
+    def usage(self, max_tokens):
+        root = self.root()
+        max_val = max(1, int(max_tokens or 1))
+        return {
+            "usage": root["tokens"] / max_val,
+            "unmodified_usage": root["phase0"] / max_val,
+            "total_tokens": root["tokens"],
+            "phase0_tokens": root["phase0"],
+        }
+
+    def describe(self):
+        return {
+            "rows": len(self.rows),
+            "leaves": len(self.levels[0]),
+            "depth": len(self.levels),
+            "kinds": dict(self.root()["counts"]),
+        }
+
 
 def _get_chat_lock(bot_name, chat_id):
     key = f"{bot_name}::{chat_id}"
@@ -47,44 +262,203 @@ def _diagnostic_key(bot_name, chat_id):
     return _runtime_key(bot_name, chat_id)
 
 
-def _clone_payload(payload, fallback):
+def _state_paths(chat_folder):
+    if not chat_folder:
+        return None, None
+    folder = Path(chat_folder) / STATE_FOLDER
+    return folder / STATE_FILE, folder / STATE_LOG_FILE
+
+
+def _empty_snapshot():
+    return {"revision": 0, "items": {}, "state": {}, "log_records": 0, "chat_folder": None}
+
+
+def _read_state_files(chat_folder):
+    """Base state file plus every journal record newer than it; a torn last line is ignored."""
+    snapshot = _empty_snapshot()
+    snapshot["chat_folder"] = str(chat_folder)
+    state_file, log_file = _state_paths(chat_folder)
     try:
-        return json.loads(json.dumps(payload))
-    except Exception:
-        return json.loads(json.dumps(fallback))
+        if state_file.is_file():
+            payload = json.loads(state_file.read_text(encoding="utf-8"))
+            if isinstance(payload, dict) and payload.get("version") == STATE_VERSION:
+                snapshot["revision"] = _parse_int(payload.get("revision"), 0)
+                snapshot["items"] = payload.get("items") if isinstance(payload.get("items"), dict) else {}
+                snapshot["state"] = payload.get("state") if isinstance(payload.get("state"), dict) else {}
+    except Exception as e:
+        print(f"[AutoSummary] Ignoring unreadable state file for {chat_folder}: {e}")
+
+    if log_file.is_file():
+        try:
+            lines = log_file.read_text(encoding="utf-8").splitlines()
+        except Exception:
+            lines = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except Exception:
+                continue
+            if not isinstance(record, dict) or _parse_int(record.get("revision"), 0) <= snapshot["revision"]:
+                continue
+            for key, item in (record.get("items") or {}).items():
+                if isinstance(item, dict):
+                    snapshot["items"][key] = item
+                else:
+                    snapshot["items"].pop(key, None)
+            if isinstance(record.get("state"), dict):
+                snapshot["state"] = record["state"]
+            snapshot["revision"] = _parse_int(record.get("revision"), snapshot["revision"])
+            snapshot["log_records"] += 1
+    return snapshot
+
+
+def _write_state_file(chat_folder, snapshot):
+    state_file, log_file = _state_paths(chat_folder)
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "version": STATE_VERSION,
+        "revision": snapshot["revision"],
+        "updated_at": datetime.now().isoformat(),
+        "items": snapshot["items"],
+        "state": snapshot["state"],
+    }
+    temp_file = state_file.with_name(state_file.name + ".tmp")
+    temp_file.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    os.replace(temp_file, state_file)
+    # Records at or below the new base revision are skipped on load, so a crash here is harmless.
+    try:
+        log_file.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _append_state_log(chat_folder, record):
+    _, log_file = _state_paths(chat_folder)
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_file, "a", encoding="utf-8") as handle:
+        handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+    return log_file.stat().st_size
 
 
-def _load_metadata(bot_name, chat_id):
+def _load_metadata(bot_name, chat_id, chat_folder=None):
+    """Working copy of the chat's metadata; items stay shared with the snapshot until written."""
     key = _metadata_key(bot_name, chat_id)
     with _LOCK:
-        payload = _RUNTIME_STORE["metadata"].get(key)
-    if not isinstance(payload, dict):
-        return {"items": {}, "state": {}}
-    data = _clone_payload(payload, {"items": {}, "state": {}})
-    data.setdefault("items", {})
-    data.setdefault("state", {})
-    return data
+        snapshot = _RUNTIME_STORE["metadata"].get(key)
+    if snapshot is None and chat_folder:
+        snapshot = _read_state_files(chat_folder)
+        with _LOCK:
+            snapshot = _RUNTIME_STORE["metadata"].setdefault(key, snapshot)
+    if snapshot is None:
+        return {"items": _CowItems(), "state": {}}
+    return {"items": _CowItems(snapshot["items"]), "state": dict(snapshot["state"])}
+
+
+def _save_metadata(bot_name, chat_id, payload, chat_folder=None):
+    """Publish a new snapshot and persist only the items that changed since the previous one."""
+    key = _metadata_key(bot_name, chat_id)
+    items = dict(payload.get("items") or {})
+    state = dict(payload.get("state") or {})
+    with _LOCK:
+        previous = _RUNTIME_STORE["metadata"].get(key) or _empty_snapshot()
+        # Unchanged items are the very objects the snapshot already holds, so identity is enough.
+        changed = {name: item for name, item in items.items() if previous["items"].get(name) is not item}
+        changed.update({name: None for name in previous["items"] if name not in items})
+        state_changed = state != previous["state"]
+        snapshot = {
+            "revision": previous["revision"] + (1 if changed or state_changed else 0),
+            "items": items,
+            "state": state,
+            "log_records": previous.get("log_records", 0),
+            "chat_folder": str(chat_folder) if chat_folder else previous.get("chat_folder"),
+        }
+        _RUNTIME_STORE["metadata"][key] = snapshot
 
+    folder = snapshot["chat_folder"]
+    if not folder or not (changed or state_changed):
+        return snapshot["revision"]
+    try:
+        if not Path(folder).is_dir():
+            return snapshot["revision"]
+        state_file, _ = _state_paths(folder)
+        if snapshot["log_records"] >= STATE_LOG_COMPACT_RECORDS or not state_file.is_file():
+            _write_state_file(folder, snapshot)
+            snapshot["log_records"] = 0
+            return snapshot["revision"]
+        record = {"revision": snapshot["revision"], "items": changed}
+        if state_changed:
+            record["state"] = state
+        log_size = _append_state_log(folder, record)
+        snapshot["log_records"] += 1
+        if log_size >= STATE_LOG_COMPACT_BYTES:
+            _write_state_file(folder, snapshot)
+            snapshot["log_records"] = 0
+    except Exception as e:
+        print(f"[AutoSummary] Error saving state for {bot_name}/{chat_id}: {e}")
+    return snapshot["revision"]
+
+
+def _metadata_revision(bot_name, chat_id):
+    with _LOCK:
+        snapshot = _RUNTIME_STORE["metadata"].get(_metadata_key(bot_name, chat_id))
+    return snapshot["revision"] if snapshot else 0
 
-def _save_metadata(bot_name, chat_id, payload):
-    key = _metadata_key(bot_name, chat_id)
-    data = _clone_payload(payload, {"items": {}, "state": {}})
+
+def _take_tree(bot_name, chat_id, chat_folder):
+    """Hand the chat's tree to the running job; it goes back into the store only via `_store_tree`.
+
+    A run that aborts halfway never returns its half-edited tree, so the next run reloads the
+    last saved one. A tree saved against other metadata than the current one is discarded.
+    """
+    key = _runtime_key(bot_name, chat_id)
     with _LOCK:
-        _RUNTIME_STORE["metadata"][key] = data
+        tree = _RUNTIME_STORE["trees"].pop(key, None)
+    if tree is None:
+        tree = _SummaryTree()
+        tree_file = Path(chat_folder) / STATE_FOLDER / TREE_FILE
+        if tree_file.is_file():
+            try:
+                tree = _SummaryTree.from_payload(json.loads(tree_file.read_text(encoding="utf-8")))
+            except Exception as e:
+                print(f"[AutoSummary] Rebuilding unreadable summary tree for {bot_name}/{chat_id}: {e}")
+    if tree.meta_revision != _metadata_revision(bot_name, chat_id):
+        tree = _SummaryTree()
+    return tree
+
+
+def _store_tree(bot_name, chat_id, tree, chat_folder, meta_revision):
+    if tree.meta_revision != meta_revision:
+        tree.meta_revision = meta_revision
+        tree.dirty = True
+    if tree.dirty:
+        try:
+            tree_file = Path(chat_folder) / STATE_FOLDER / TREE_FILE
+            tree_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = tree_file.with_name(tree_file.name + ".tmp")
+            temp_file.write_text(json.dumps(tree.snapshot(), separators=(",", ":")), encoding="utf-8")
+            os.replace(temp_file, tree_file)
+            tree.dirty = False
+        except Exception as e:
+            print(f"[AutoSummary] Error saving summary tree for {bot_name}/{chat_id}: {e}")
+    with _LOCK:
+        _RUNTIME_STORE["trees"][_runtime_key(bot_name, chat_id)] = tree
 
 
 def _save_status(bot_name, chat_id, data):
     key = _status_key(bot_name, chat_id)
-    payload = _clone_payload(data, {"phase3_active": False, "message": "", "updated_at": ""})
+    payload = {"phase3_active": False, "message": "", "updated_at": ""}
+    payload.update(data if isinstance(data, dict) else {})
     with _LOCK:
         _RUNTIME_STORE["status"][key] = payload
 
 
 def _save_diagnostics(bot_name, chat_id, data):
     key = _diagnostic_key(bot_name, chat_id)
-    payload = _clone_payload(data, {})
+    # Callers build a fresh dict each run and never touch it again.
     with _LOCK:
-        _RUNTIME_STORE["diagnostics"][key] = payload
+        _RUNTIME_STORE["diagnostics"][key] = data if isinstance(data, dict) else {}
 
 
 def get_runtime_status_by_safe_names(safe_bot_name, safe_chat_id):
@@ -94,20 +468,13 @@ def get_runtime_status_by_safe_names(safe_bot_name, safe_chat_id):
         payload = _RUNTIME_STORE["status"].get(key)
     if not isinstance(payload, dict):
         return dict(fallback)
-    data = _clone_payload(payload, fallback)
+    data = dict(payload)
     data.setdefault("phase3_active", False)
     data.setdefault("message", "")
     data.setdefault("updated_at", "")
     return data
 
 
-def _estimate_tokens(text):
-    raw = str(text or "")
-    if not raw.strip():
-        return 0
-    return max(1, int(round(len(raw) / 4)))
-
-
 def _parse_bool(value, default=False):
     if isinstance(value, bool):
         return value
@@ -267,45 +634,63 @@ def _load_bot_module_settings(context, bot_name):
     return {}
 
 
-def _load_iam_entries(chat_folder):
+def _load_iam_entries(context, chat_folder):
     iam_folder = Path(chat_folder) / "IAM"
     iam_folder.mkdir(parents=True, exist_ok=True)
     entries = []
 
-    for iam_file in sorted(iam_folder.glob("*.txt")):
-        try:
-            payload = json.loads(iam_file.read_text(encoding="utf-8"))
-        except Exception:
-            continue
-        if not isinstance(payload, dict):
-            continue
+    messages = context.get("history_snapshot")
+    if messages is None:
+        messages = context["chat_manager"].read_chat_messages(chat_folder=chat_folder)
 
-        role = str(payload.get("role") or "").strip().lower()
-        if role not in {"user", "assistant"}:
+    for message in messages:
+        file_name = str(message.get("file_name") or "")
+        if not file_name:
             continue
 
-        content = str(payload.get("content") or "")
         entries.append({
-            "file": iam_file,
-            "file_name": iam_file.name,
-            "role": role,
-            "content": content,
-            "timestamp": payload.get("timestamp") or datetime.now().isoformat(),
-            "order": _parse_int(payload.get("order"), 0),
+            "file": iam_folder / file_name,
+            "file_name": file_name,
+            "role": message.get("role"),
+            "content": str(message.get("content") or ""),
+            "timestamp": message.get("timestamp") or datetime.now().isoformat(),
+            "order": _parse_int(message.get("order"), 0),
+            "loaded_content": str(message.get("content") or ""),
         })
 
     entries.sort(key=lambda item: (item.get("order", 0), item.get("file_name", "")))
     return entries
 
 
-def _write_entry(entry):
-    payload = {
+def _entry_payload(entry):
+    return {
         "role": entry.get("role") or "assistant",
         "content": entry.get("content") or "",
         "timestamp": entry.get("timestamp") or datetime.now().isoformat(),
         "order": int(entry.get("order") or 0),
     }
-    Path(entry["file"]).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+
+def _apply_entries(chat_manager, chat_id, bot_name, entries):
+    """Write every rewritten IAM entry or none of them.
+
+    Returns False when one of the files no longer holds the text the run started from, i.e. the
+    chat was edited while the summary was being computed; the next run starts over from disk.
+    """
+    changed = [entry for entry in entries if entry.get("content") != entry.get("loaded_content")]
+    if not changed:
+        return True
+
+    rewrites = [
+        {"file": entry["file"], "expected_content": entry.get("loaded_content"), "payload": _entry_payload(entry)}
+        for entry in changed
+    ]
+    # ChatManager checks and writes under the chat's own lock and drops its in-memory copy of the chat.
+    if not chat_manager.apply_iam_rewrites(chat_id, bot_name, rewrites):
+        return False
+    for entry in changed:
+        entry["loaded_content"] = entry.get("content")
+    return True
 
 
 def _strip_marker_prefixes(text):
@@ -417,44 +802,37 @@ def _llm_summarize_group(context, summary_settings, entries):
     return out
 
 
-def _context_usage(entries, max_tokens):
-    total = 0
-    phase0 = 0
-    for item in entries:
-        tokens = _estimate_tokens(item.get("content") or "")
-        total += tokens
-        if int(item.get("phase", 0)) == 0:
-            phase0 += tokens
-    max_val = max(1, int(max_tokens or 1))
-    return {
-        "usage": total / max_val,
-        "unmodified_usage": phase0 / max_val,
-        "total_tokens": total,
-        "phase0_tokens": phase0,
-    }
+def _refresh_meta_entry(items, entry, defaults=None):
+    """Create or update one entry's metadata; returns it without copying when nothing changed."""
+    defaults = defaults or _META_DEFAULTS
+    key = entry["file_name"]
+    content = entry.get("content") or ""
+    existing = items.get(key) if isinstance(items.get(key), dict) else None
+    token_count = _estimate_tokens(content)
+    protected = CORE_MARKER in str(content)
+    if existing is not None and existing.get("token_count") == token_count and (existing.get("protected_core") or not protected) and all(name in existing for name in defaults):
+        return existing
+
+    existing = items.writable(key)
+    for name, value in defaults.items():
+        existing.setdefault(name, value)
+    existing.setdefault("iam_id", key)
+    existing.setdefault("source_iam_ids", [])
+    existing.setdefault("created_at", datetime.now().isoformat())
+    if protected:
+        existing["protected_core"] = True
+    existing["updated_at"] = datetime.now().isoformat()
+    existing["token_count"] = token_count
+    return existing
 
 
 def _refresh_meta_for_entries(meta_payload, entries):
-    items = meta_payload.setdefault("items", {})
+    items = meta_payload.get("items")
+    if not isinstance(items, _CowItems):
+        items = _CowItems(items or {})
+        meta_payload["items"] = items
     for entry in entries:
-        key = entry["file_name"]
-        existing = items.get(key) if isinstance(items.get(key), dict) else {}
-        existing.setdefault("iam_id", key)
-        existing.setdefault("phase", 0)
-        existing.setdefault("summarized_phase1", False)
-        existing.setdefault("summarized_phase2", False)
-        existing.setdefault("protected_core", False)
-        existing.setdefault("hidden_from_chat", False)
-        existing.setdefault("merged_out", False)
-        existing.setdefault("source_iam_ids", [])
-        existing.setdefault("created_at", datetime.now().isoformat())
-
-        if CORE_MARKER in str(entry.get("content") or ""):
-            existing["protected_core"] = True
-
-        existing["updated_at"] = datetime.now().isoformat()
-        existing["token_count"] = _estimate_tokens(entry.get("content") or "")
-        items[key] = existing
+        _refresh_meta_entry(items, entry)
 
     known = {entry["file_name"] for entry in entries}
     for file_name in list(items.keys()):
@@ -462,61 +840,102 @@ def _refresh_meta_for_entries(meta_payload, entries):
             items.pop(file_name, None)
 
 
-def _phase1_select(entries, meta_items):
-    for entry in entries:
-        meta = meta_items.get(entry["file_name"], {})
-        if meta.get("merged_out"):
-            continue
-        if meta.get("protected_core"):
-            continue
-        if int(meta.get("phase", 0)) != 0:
-            continue
-        return entry, meta
-    return None, None
+def _content_digest(content):
+    # Length alone misses same-length edits; a CRC is cheap next to re-estimating tokens.
+    return format(zlib.crc32(str(content or "").encode("utf-8", "surrogatepass")), "08x")
 
 
-def _phase2_candidates(entries, meta_items):
-    output = []
-    for entry in entries:
-        meta = meta_items.get(entry["file_name"], {})
-        if meta.get("merged_out") or meta.get("protected_core"):
-            continue
-        if int(meta.get("phase", 0)) == 1:
-            output.append((entry, meta))
-    return output
+def _tree_row(entry, meta):
+    phase = _parse_int(meta.get("phase"), 0)
+    if meta.get("merged_out"):
+        kind = "merged"
+    elif meta.get("protected_core"):
+        kind = "core"
+    elif phase >= 3:
+        # Summaries are ranked by how many roll-ups they already absorbed
+        kind = f"s{max(1, _parse_int(meta.get('rollup_level'), 1))}"
+    else:
+        kind = f"p{phase}"
+    return {
+        "file": entry["file_name"],
+        "tokens": _parse_int(meta.get("token_count"), 0),
+        "digest": _content_digest(entry.get("content")),
+        "phase": phase,
+        "kind": kind,
+    }
 
 
-def _phase3_candidates(entries, meta_items):
-    output = []
-    for entry in entries:
-        meta = meta_items.get(entry["file_name"], {})
-        if meta.get("merged_out") or meta.get("protected_core"):
+def _sync_tree(tree, meta_payload, entries):
+    """Bring the tree in line with the chat; only new or edited entries are measured again."""
+    items = meta_payload.get("items")
+    if not isinstance(items, _CowItems):
+        items = _CowItems(items or {})
+        meta_payload["items"] = items
+
+    rows = tree.rows
+    if len(entries) < len(rows) or any(row["file"] != entry["file_name"] for row, entry in zip(rows, entries)):
+        # Messages were deleted or inserted mid-chat
+        _refresh_meta_for_entries(meta_payload, entries)
+        tree.rebuild([_tree_row(entry, items[entry["file_name"]]) for entry in entries])
+        return "rebuilt"
+
+    touched = 0
+    for position, entry in enumerate(entries):
+        if position < len(rows) and rows[position]["digest"] == _content_digest(entry.get("content")) and entry["file_name"] in items:
             continue
-        if int(meta.get("phase", 0)) in (1, 2):
-            output.append((entry, meta))
-    return output
+        tree.put(_tree_row(entry, _refresh_meta_entry(items, entry)))
+        touched += 1
+    return f"updated:{touched}"
+
+
+def _track_entry(tree, items, entry):
+    """Re-measure a rewritten entry and push the change up its branch of the tree."""
+    meta = items.writable(entry["file_name"])
+    meta["token_count"] = _estimate_tokens(entry.get("content") or "")
+    tree.put(_tree_row(entry, meta))
+
+
+def _tree_candidates(entries, meta_items, tree, kinds, limit):
+    return [(entries[position], meta_items.get(entries[position]["file_name"], {})) for position in tree.first(kinds, limit)]
+
+
+def _phase1_select(entries, meta_items, tree):
+    found = _tree_candidates(entries, meta_items, tree, PHASE1_KINDS, 1)
+    return found[0] if found else (None, None)
+
+
+def _phase2_candidates(entries, meta_items, tree, limit):
+    return _tree_candidates(entries, meta_items, tree, PHASE2_KINDS, limit)
+
 
+def _phase3_candidates(entries, meta_items, tree, limit):
+    return _tree_candidates(entries, meta_items, tree, PHASE3_KINDS, limit)
 
-def _mark_hidden_phase(entry, marker, phase_value):
-    cleaned = _strip_marker_prefixes(entry.get("content") or "")
-    entry["content"] = _ensure_prefix(cleaned, marker)
-    entry["content"] = _ensure_prefix(entry["content"], HIDDEN_MARKER)
-    entry["phase"] = phase_value
 
+def _rollup_candidates(entries, meta_items, tree, limit):
+    """Oldest summaries of the lowest roll-up level that still has two or more of them."""
+    levels = sorted(_parse_int(kind[1:], 0) for kind in tree.kinds() if kind.startswith("s"))
+    for level in levels:
+        kind = f"s{level}"
+        if tree.count((kind,)) >= 2:
+            return _tree_candidates(entries, meta_items, tree, (kind,), max(2, limit)), level
+    return [], 0
 
-def _run_phase1(entries, meta_payload, settings):
+
+def _run_phase1(entries, meta_payload, settings, tree):
     items = meta_payload["items"]
     max_passes = settings["phase1_max_passes"]
     applied = 0
 
     while applied < max_passes:
-        usage = _context_usage(entries, settings["max_tokens"])
+        usage = tree.usage(settings["max_tokens"])
         if usage["unmodified_usage"] <= settings["phase1_trigger"]:
             break
 
-        entry, meta = _phase1_select(entries, items)
+        entry, meta = _phase1_select(entries, items, tree)
         if not entry:
             break
+        meta = items.writable(entry["file_name"])
 
         compressed = _compress_light(entry.get("content") or "")
         entry["content"] = _ensure_prefix(compressed, PHASE1_MARKER)
@@ -525,38 +944,36 @@ def _run_phase1(entries, meta_payload, settings):
         meta["phase"] = 1
         meta["summarized_phase1"] = True
         meta["hidden_from_chat"] = True
-        meta["token_count"] = _estimate_tokens(entry["content"])
         meta["updated_at"] = datetime.now().isoformat()
-
-        _write_entry(entry)
+        _track_entry(tree, items, entry)
         applied += 1
 
     return applied
 
 
-def _run_phase2(entries, meta_payload, settings):
+def _run_phase2(entries, meta_payload, settings, tree):
     items = meta_payload["items"]
     applied = 0
     max_passes = settings["phase2_max_passes"]
 
     while applied < max_passes:
-        usage = _context_usage(entries, settings["max_tokens"])
-        candidates = _phase2_candidates(entries, items)
+        usage = tree.usage(settings["max_tokens"])
         if usage["usage"] <= settings["phase2_trigger"]:
             break
         if usage["usage"] <= settings["phase2_goal"]:
             break
-        if len(candidates) < (settings["phase2_iam_count"] + 1):
+        if tree.count(PHASE2_KINDS) < (settings["phase2_iam_count"] + 1):
             break
 
-        group_pairs = candidates[: settings["phase2_iam_count"]]
+        group_pairs = _phase2_candidates(entries, items, tree, settings["phase2_iam_count"])
         group = [pair[0] for pair in group_pairs]
         summary = _summarize_group_deterministic(group, "phase2")
         summary = _validate_summary(summary, group, max_chars=settings.get("llm_max_chars", 1000))
         if not summary:
             break
 
-        first_entry, first_meta = group_pairs[0]
+        first_entry = group_pairs[0][0]
+        first_meta = items.writable(first_entry["file_name"])
         first_entry["content"] = _ensure_prefix(summary, PHASE2_MARKER)
         first_entry["content"] = _ensure_prefix(first_entry["content"], HIDDEN_MARKER)
         first_meta["phase"] = 2
@@ -564,23 +981,24 @@ def _run_phase2(entries, meta_payload, settings):
         first_meta["hidden_from_chat"] = True
         first_meta["source_iam_ids"] = [item[0]["file_name"] for item in group_pairs] if settings.get("keep_lineage", True) else []
         first_meta["updated_at"] = datetime.now().isoformat()
+        _track_entry(tree, items, first_entry)
 
-        _write_entry(first_entry)
-
-        for other_entry, other_meta in group_pairs[1:]:
+        for other_entry, _ in group_pairs[1:]:
+            other_meta = items.writable(other_entry["file_name"])
             other_entry["content"] = _ensure_prefix("Merged into newer summary.", HIDDEN_MARKER)
             other_meta["phase"] = 2
             other_meta["merged_out"] = True
             other_meta["hidden_from_chat"] = True
             other_meta["updated_at"] = datetime.now().isoformat()
-            _write_entry(other_entry)
+            _track_entry(tree, items, other_entry)
 
         applied += 1
 
     return applied
 
 
-def _run_phase3(entries, meta_payload, settings, context, bot_name, chat_id):
+def _run_phase3(entries, meta_payload, settings, context, bot_name, chat_id, tree):
+    """LLM summaries of phase 1/2 groups; once none are left, equal-level summaries roll up into one."""
     items = meta_payload["items"]
     applied = 0
     max_passes = settings["phase3_max_passes"]
@@ -589,21 +1007,22 @@ def _run_phase3(entries, meta_payload, settings, context, bot_name, chat_id):
 
     try:
         while applied < max_passes:
-            usage = _context_usage(entries, settings["max_tokens"])
+            usage = tree.usage(settings["max_tokens"])
             if usage["usage"] <= settings["phase3_trigger"]:
                 break
             if usage["usage"] <= settings["phase3_goal"]:
                 break
 
-            phase2_ready = _phase2_candidates(entries, items)
-            if len(phase2_ready) >= (settings["phase2_iam_count"] + 1):
+            if tree.count(PHASE2_KINDS) >= (settings["phase2_iam_count"] + 1):
                 break
 
-            candidates = _phase3_candidates(entries, items)
-            if not candidates:
+            group_pairs = _phase3_candidates(entries, items, tree, settings["phase3_iam_count"])
+            rollup_level = 0
+            if not group_pairs:
+                group_pairs, rollup_level = _rollup_candidates(entries, items, tree, settings["phase3_iam_count"])
+            if not group_pairs:
                 break
 
-            group_pairs = candidates[: settings["phase3_iam_count"]]
             group = [pair[0] for pair in group_pairs]
 
             llm_summary = _llm_summarize_group(context, settings, group)
@@ -620,22 +1039,25 @@ def _run_phase3(entries, meta_payload, settings, context, bot_name, chat_id):
                     "updated_at": datetime.now().isoformat(),
                 })
 
-            first_entry, first_meta = group_pairs[0]
+            first_entry = group_pairs[0][0]
+            first_meta = items.writable(first_entry["file_name"])
             first_entry["content"] = _ensure_prefix(summary, PHASE3_MARKER)
             first_entry["content"] = _ensure_prefix(first_entry["content"], HIDDEN_MARKER)
             first_meta["phase"] = 3
+            first_meta["rollup_level"] = rollup_level + 1
             first_meta["hidden_from_chat"] = True
             first_meta["source_iam_ids"] = [item[0]["file_name"] for item in group_pairs] if settings.get("keep_lineage", True) else []
             first_meta["updated_at"] = datetime.now().isoformat()
-            _write_entry(first_entry)
+            _track_entry(tree, items, first_entry)
 
-            for other_entry, other_meta in group_pairs[1:]:
+            for other_entry, _ in group_pairs[1:]:
+                other_meta = items.writable(other_entry["file_name"])
                 other_entry["content"] = _ensure_prefix("Merged into phase3 summary.", HIDDEN_MARKER)
                 other_meta["phase"] = 3
                 other_meta["merged_out"] = True
                 other_meta["hidden_from_chat"] = True
                 other_meta["updated_at"] = datetime.now().isoformat()
-                _write_entry(other_entry)
+                _track_entry(tree, items, other_entry)
 
             applied += 1
             _save_status(bot_name, chat_id, {
@@ -655,7 +1077,81 @@ def _run_phase3(entries, meta_payload, settings, context, bot_name, chat_id):
     return applied
 
 
+def _background_context(context):
+    """Strip the turn-scoped parts of a module context so a job can outlive the turn."""
+    job = {key: context.get(key) for key in _JOB_CONTEXT_KEYS}
+    # The turn's history snapshot goes stale once the reply lands; the job re-reads the chat.
+    job["history_snapshot"] = None
+    return job
+
+
+def _queue_compaction(context):
+    key = _runtime_key(context.get("bot_name"), context.get("chat_id"))
+    with _JOB_LOCK:
+        previous = _PENDING_JOBS.get(key)
+        # A job still waiting from an earlier turn means that reply was never saved; do not wait again
+        ready = previous is not None
+        _PENDING_JOBS[key] = {"context": _background_context(context), "ready": ready}
+    _debug(context, "job_queued", bot_name=context.get("bot_name"), chat_id=context.get("chat_id"), ready=ready)
+    if ready:
+        _start_worker(key)
+
+
+def _on_reply_saved(bot_name, chat_id):
+    key = _runtime_key(bot_name, chat_id)
+    with _JOB_LOCK:
+        job = _PENDING_JOBS.get(key)
+        if job is None:
+            return
+        job["ready"] = True
+    _start_worker(key)
+
+
+def _start_worker(key):
+    with _JOB_LOCK:
+        if key in _ACTIVE_WORKERS:
+            return
+        _ACTIVE_WORKERS.add(key)
+    threading.Thread(target=_drain_jobs, args=(key,), name=f"auto-summary-{key}", daemon=True).start()
+
+
+def _drain_jobs(key):
+    """Per-chat worker: runs ready jobs one at a time until the chat's queue is empty."""
+    while True:
+        with _JOB_LOCK:
+            job = _PENDING_JOBS.get(key)
+            if job is None or not job["ready"]:
+                _ACTIVE_WORKERS.discard(key)
+                return
+            _PENDING_JOBS.pop(key, None)
+
+        context = job["context"]
+        started = time.monotonic()
+        try:
+            _run_compaction(context)
+        except Exception as e:
+            print(f"[AutoSummary] Background compaction failed for {key}: {e}")
+        _debug(context, "job_complete", bot_name=context.get("bot_name"), chat_id=context.get("chat_id"), elapsed_ms=int((time.monotonic() - started) * 1000))
+
+
 def _execute(context):
+    """Queue this chat's compaction to run once the turn's reply is saved.
+
+    The prompt being built reads the IAM files as they are; whatever the job rewrites is picked
+    up on the next turn. Pipelines without the reply-saved hook still run inline.
+    """
+    if not context.get("bot_name") or not context.get("chat_id") or context.get("chat_manager") is None:
+        return
+
+    prompt_pipeline = context.get("prompt_pipeline")
+    register = getattr(prompt_pipeline, "register_reply_saved_listener", None)
+    if not callable(register) or not register("auto_summary", _on_reply_saved):
+        _run_compaction(context)
+        return
+    _queue_compaction(context)
+
+
+def _run_compaction(context):
     bot_name = context.get("bot_name")
     chat_id = context.get("chat_id")
     chat_manager = context.get("chat_manager")
@@ -677,16 +1173,19 @@ def _execute(context):
         if not chat_folder:
             return
 
-        entries = _load_iam_entries(chat_folder)
+        # Phases rewrite IAM files in place, so pending journal records must land first
+        chat_manager.compact_chat_journal(chat_id, bot_name)
+        entries = _load_iam_entries(context, chat_folder)
         if not entries:
             return
 
-        meta_payload = _load_metadata(bot_name, chat_id)
-        _refresh_meta_for_entries(meta_payload, entries)
+        meta_payload = _load_metadata(bot_name, chat_id, chat_folder=chat_folder)
+        tree = _take_tree(bot_name, chat_id, chat_folder)
+        tree_sync = _sync_tree(tree, meta_payload, entries)
         state = meta_payload.setdefault("state", {})
         state["run_tick"] = _parse_int(state.get("run_tick"), 0) + 1
 
-        usage_before = _context_usage(entries, settings["max_tokens"])
+        usage_before = tree.usage(settings["max_tokens"])
         _debug(
             context,
             "run_begin",
@@ -695,6 +1194,8 @@ def _execute(context):
             usage=round(usage_before["usage"], 4),
             unmodified_usage=round(usage_before["unmodified_usage"], 4),
             total_tokens=usage_before["total_tokens"],
+            tree_sync=tree_sync,
+            tree_depth=len(tree.levels),
         )
         _debug(
             context,
@@ -711,8 +1212,8 @@ def _execute(context):
             max_tokens=settings["max_tokens"],
         )
 
-        phase2_candidates_initial = len(_phase2_candidates(entries, meta_payload.get("items", {})))
-        phase3_candidates_initial = len(_phase3_candidates(entries, meta_payload.get("items", {})))
+        phase2_candidates_initial = tree.count(PHASE2_KINDS)
+        phase3_candidates_initial = tree.count(PHASE3_KINDS)
 
         phase1_ready = _phase_gate_allowed(
             state,
@@ -738,9 +1239,9 @@ def _execute(context):
 
         phase1_count = 0
         if phase1_ready:
-            before = _context_usage(entries, settings["max_tokens"])
-            phase1_count = _run_phase1(entries, meta_payload, settings)
-            after = _context_usage(entries, settings["max_tokens"])
+            before = tree.usage(settings["max_tokens"])
+            phase1_count = _run_phase1(entries, meta_payload, settings, tree)
+            after = tree.usage(settings["max_tokens"])
             if phase1_count > 0:
                 _mark_phase_triggered(state, "phase1")
             _debug(
@@ -752,7 +1253,7 @@ def _execute(context):
             )
 
         phase2_count = 0
-        usage_mid = _context_usage(entries, settings["max_tokens"])
+        usage_mid = tree.usage(settings["max_tokens"])
         phase2_gate_ok = _phase_gate_allowed(
             state,
             "phase2",
@@ -779,9 +1280,9 @@ def _execute(context):
             )
 
         if phase2_ready:
-            before = _context_usage(entries, settings["max_tokens"])
-            phase2_count = _run_phase2(entries, meta_payload, settings)
-            after = _context_usage(entries, settings["max_tokens"])
+            before = tree.usage(settings["max_tokens"])
+            phase2_count = _run_phase2(entries, meta_payload, settings, tree)
+            after = tree.usage(settings["max_tokens"])
             if phase2_count > 0:
                 _mark_phase_triggered(state, "phase2")
             _debug(
@@ -793,7 +1294,7 @@ def _execute(context):
             )
 
         phase3_count = 0
-        usage_late = _context_usage(entries, settings["max_tokens"])
+        usage_late = tree.usage(settings["max_tokens"])
         phase3_gate_ok = _phase_gate_allowed(
             state,
             "phase3",
@@ -802,8 +1303,8 @@ def _execute(context):
             settings["hysteresis_margin"],
             settings["phase_cooldown_turns"],
         )
-        phase2_candidates_late = len(_phase2_candidates(entries, meta_payload.get("items", {})))
-        phase3_candidates_late = len(_phase3_candidates(entries, meta_payload.get("items", {})))
+        phase2_candidates_late = tree.count(PHASE2_KINDS)
+        phase3_candidates_late = tree.count(PHASE3_KINDS) or len(_rollup_candidates(entries, meta_payload["items"], tree, settings["phase3_iam_count"])[0])
         phase3_ready = phase3_gate_ok and usage_late["usage"] > settings["phase3_trigger"] and phase2_candidates_late < (settings["phase2_iam_count"] + 1) and phase3_candidates_late > 0
 
         if not phase3_ready:
@@ -824,9 +1325,9 @@ def _execute(context):
             )
 
         if phase3_ready:
-            before = _context_usage(entries, settings["max_tokens"])
-            phase3_count = _run_phase3(entries, meta_payload, settings, context, bot_name, chat_id)
-            after = _context_usage(entries, settings["max_tokens"])
+            before = tree.usage(settings["max_tokens"])
+            phase3_count = _run_phase3(entries, meta_payload, settings, context, bot_name, chat_id, tree)
+            after = tree.usage(settings["max_tokens"])
             if phase3_count > 0:
                 _mark_phase_triggered(state, "phase3")
             _debug(
@@ -844,9 +1345,14 @@ def _execute(context):
             "last_phase3_changes": phase3_count,
         })
 
-        _refresh_meta_for_entries(meta_payload, entries)
-        _save_metadata(bot_name, chat_id, meta_payload)
-        usage_final = _context_usage(entries, settings["max_tokens"])
+        if phase1_count or phase2_count or phase3_count:
+            if not _apply_entries(chat_manager, chat_id, bot_name, entries):
+                _debug(context, "run_conflict", bot_name=bot_name, chat_id=chat_id)
+                return
+
+        meta_revision = _save_metadata(bot_name, chat_id, meta_payload, chat_folder=chat_folder)
+        _store_tree(bot_name, chat_id, tree, chat_folder, meta_revision)
+        usage_final = tree.usage(settings["max_tokens"])
         diagnostics = {
             "updated_at": datetime.now().isoformat(),
             "bot_name": bot_name,
@@ -874,6 +1380,7 @@ def _execute(context):
                 "phase2_late": phase2_candidates_late,
                 "phase3_late": phase3_candidates_late,
             },
+            "summary_tree": tree.describe(),
             "phase_runs": {
                 "phase1_applied": phase1_count,
                 "phase2_applied": phase2_count,
@@ -10,6 +10,8 @@ MODULE_PROMPT = """
 Auxiliary Capability (UI)
 Context Tracker is enabled. It provides a chat-header context usage tracker in the UI.
 """
+MODULE_CONCURRENCY = "history_reader"
+MODULE_DEPENDS_ON = ()
 
 
 def process(context=None):
@@ -11,6 +11,8 @@ Empathy Module (Internal)
 - Prefer neutral interpretation when ambiguity is high.
 - Keep empathy reasoning internal and never expose it in final assistant output.
 """.strip()
+MODULE_CONCURRENCY = "history_reader"
+MODULE_DEPENDS_ON = ()
 
 _ENGINE_MODULE = None
 
@@ -5,6 +5,8 @@ import time
 from datetime import datetime
 from pathlib import Path
 
+from token_counter import estimate_tokens as _estimate_tokens
+
 _LOCK = threading.RLock()
 _PATCHED_PIPELINES = set()
 _ACTIVE_RUNS = set()
@@ -80,16 +82,6 @@ def _clamp(value, low=0.0, high=1.0):
     return max(low, min(high, number))
 
 
-def _safe_read_json(path):
-    if not path.exists() or not path.is_file():
-        return None
-    try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-        return payload if isinstance(payload, dict) else None
-    except Exception:
-        return None
-
-
 def _truncate(text, max_chars):
     raw = re.sub(r"\s+", " ", str(text or "")).strip()
     if len(raw) <= max_chars:
@@ -100,13 +92,6 @@ def _truncate(text, max_chars):
     return cut.strip()
 
 
-def _estimate_tokens(text):
-    raw = str(text or "")
-    if not raw.strip():
-        return 0
-    return max(1, int(round(len(raw) / 4)))
-
-
 def _load_bot_module_settings(context, bot_name):
     bot_manager = (context or {}).get("bot_manager")
     if not bot_manager or not bot_name:
@@ -249,68 +234,23 @@ def _sanitize_notes(notes):
     return cleaned[:4]
 
 
-def _resolve_effective_content(payload):
-    if not isinstance(payload, dict):
-        return ""
-
-    role = str(payload.get("role") or "").strip().lower()
-    if role != "assistant":
-        return str(payload.get("content") or "")
-
-    variants = payload.get("variants")
-    if not isinstance(variants, list) or not variants:
-        return str(payload.get("content") or "")
-
-    selected_index = payload.get("selected_variant_index")
-    try:
-        selected_index = int(selected_index)
-    except Exception:
-        selected_index = len(variants) - 1
-
-    selected_index = max(0, min(selected_index, len(variants) - 1))
-    selected = variants[selected_index] if selected_index < len(variants) else None
-    if isinstance(selected, dict):
-        selected_content = str(selected.get("content") or "")
-        if selected_content.strip():
-            return selected_content
-
-    return str(payload.get("content") or "")
-
-
-def _load_iam_messages(chat_folder, max_items=14):
-    iam_dir = Path(chat_folder) / "IAM"
-    if not iam_dir.exists() or not iam_dir.is_dir():
-        return []
-
+def _load_iam_messages(context, chat_folder, max_items=14):
     rows = []
-    for iam_file in sorted(iam_dir.glob("*.txt"), key=lambda item: item.name.lower()):
-        payload = _safe_read_json(iam_file)
-        if not isinstance(payload, dict):
-            continue
-
-        role = str(payload.get("role") or "").strip().lower()
-        if role not in {"user", "assistant"}:
-            continue
-
-        content = _resolve_effective_content(payload)
-        if not str(content).strip():
+    prompt_pipeline = (context or {}).get("prompt_pipeline")
+    history = prompt_pipeline.module_history_messages(context, chat_folder) if prompt_pipeline is not None else []
+    for message in history:
+        content = str(message.get("content") or "")
+        if not content.strip():
             continue
 
-        order_value = payload.get("order")
-        try:
-            order_num = int(order_value)
-        except Exception:
-            order_num = 0
-
         rows.append(
             {
-                "role": role,
-                "content": str(content),
-                "order": order_num,
+                "role": message.get("role"),
+                "content": content,
+                "order": int(message.get("order") or 0),
             }
         )
 
-    rows.sort(key=lambda item: (item.get("order", 0), item.get("role", "")))
     if len(rows) > max_items:
         rows = rows[-max_items:]
     return rows
@@ -1264,7 +1204,7 @@ def _execute(context):
         settings = _normalize_settings(_load_bot_module_settings(context, bot_name))
         persona_context = _resolve_persona_context(context)
         chat_folder = _chat_folder_from_context(context, bot_name, chat_id)
-        messages = _load_iam_messages(chat_folder, max_items=int(settings.get("messages_history_limit") or 14)) if chat_folder else []
+        messages = _load_iam_messages(context, chat_folder, max_items=int(settings.get("messages_history_limit") or 14)) if chat_folder else []
         latest_user, latest_assistant = _extract_latest_messages(messages)
 
         if not messages:
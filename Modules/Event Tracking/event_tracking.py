@@ -10,6 +10,8 @@ Event Tracking Module (Internal)
 - Conversation events are summarized into timeline entries to preserve narrative continuity.
 - Prefer recent, high-signal events (outcomes, relationship shifts, time/place changes) over noisy detail.
 """.strip()
+MODULE_CONCURRENCY = "history_reader"
+MODULE_DEPENDS_ON = ()
 
 _ENGINE_MODULE = None
 
@@ -5,6 +5,8 @@ from datetime import datetime
 from pathlib import Path
 import time
 
+from token_counter import estimate_tokens as _estimate_tokens
+
 _LOCK = threading.RLock()
 _PATCHED_PIPELINES = set()
 _ACTIVE_RUNS = set()
@@ -144,13 +146,6 @@ def _normalize_settings(raw):
 	return settings
 
 
-def _estimate_tokens(text):
-	raw = str(text or "")
-	if not raw.strip():
-		return 0
-	return max(1, int(round(len(raw) / 4)))
-
-
 def _normalize_relevance_score(value, default=0.5):
 	score = _parse_float(value, default)
 	if score > 1.0:
@@ -186,68 +181,23 @@ def _derive_priority_tags_from_text(text):
 	return tags[:3]
 
 
-def _resolve_effective_content(payload):
-	if not isinstance(payload, dict):
-		return ""
-
-	role = str(payload.get("role") or "").strip().lower()
-	if role != "assistant":
-		return str(payload.get("content") or "")
-
-	variants = payload.get("variants")
-	if not isinstance(variants, list) or not variants:
-		return str(payload.get("content") or "")
-
-	selected_index = payload.get("selected_variant_index")
-	try:
-		selected_index = int(selected_index)
-	except Exception:
-		selected_index = len(variants) - 1
-
-	selected_index = max(0, min(selected_index, len(variants) - 1))
-	selected = variants[selected_index] if selected_index < len(variants) else None
-	if isinstance(selected, dict):
-		selected_content = str(selected.get("content") or "")
-		if selected_content.strip():
-			return selected_content
-
-	return str(payload.get("content") or "")
-
-
-def _load_iam_messages(chat_folder):
-	iam_dir = Path(chat_folder) / "IAM"
-	if not iam_dir.exists() or not iam_dir.is_dir():
-		return []
-
+def _load_iam_messages(context, chat_folder):
 	rows = []
-	for iam_file in sorted(iam_dir.glob("*.txt"), key=lambda item: item.name.lower()):
-		payload = _safe_read_json(iam_file)
-		if not isinstance(payload, dict):
-			continue
-
-		role = str(payload.get("role") or "").strip().lower()
-		if role not in {"user", "assistant"}:
-			continue
-
-		content = _resolve_effective_content(payload)
-		if not str(content).strip():
+	prompt_pipeline = (context or {}).get("prompt_pipeline")
+	history = prompt_pipeline.module_history_messages(context, chat_folder) if prompt_pipeline is not None else []
+	for message in history:
+		content = str(message.get("content") or "")
+		if not content.strip():
 			continue
 
-		order_value = payload.get("order")
-		try:
-			order_num = int(order_value)
-		except Exception:
-			order_num = 0
-
 		rows.append({
-			"file": iam_file.name,
-			"role": role,
-			"content": str(content),
-			"order": order_num,
-			"timestamp": str(payload.get("timestamp") or ""),
+			"file": message.get("file_name") or "",
+			"role": message.get("role"),
+			"content": content,
+			"order": int(message.get("order") or 0),
+			"timestamp": str(message.get("timestamp") or ""),
 		})
 
-	rows.sort(key=lambda item: (item.get("order", 0), item.get("file", "")))
 	return rows
 
 
@@ -993,7 +943,7 @@ def _execute(context, force_create_partial=False):
 	try:
 		with _LOCK:
 			meta = _load_meta(events_dir)
-			messages = _load_iam_messages(events_dir.parent)
+			messages = _load_iam_messages(context, events_dir.parent)
 			message_count = len(messages)
 			auto_enabled = _parse_bool(meta.get("auto_event_creation_enabled"), True)
 			_write_status(events_dir, {
@@ -1298,7 +1248,7 @@ def _handle_action(action=None, payload=None, context=None):
 			enabled = _parse_bool(body.get("enabled"), True)
 			meta["auto_event_creation_enabled"] = enabled
 			if not enabled:
-				messages = _load_iam_messages(events_dir.parent)
+				messages = _load_iam_messages(context, events_dir.parent)
 				meta["last_processed_count"] = len(messages)
 			_save_meta(events_dir, meta)
 			payload = _status_payload(events_dir, meta, settings)
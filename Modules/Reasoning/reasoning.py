@@ -11,6 +11,8 @@ Reasoning Module (Internal)
 - Keep reasoning private and never reveal it in final assistant output.
 - Obey Definition/Core and Rules/Scenario while deciding response strategy.
 """.strip()
+MODULE_CONCURRENCY = "history_reader"
+MODULE_DEPENDS_ON = ()
 
 _ENGINE_MODULE = None
 
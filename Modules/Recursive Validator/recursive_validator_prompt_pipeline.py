@@ -1,11 +1,15 @@
 import json
 import ast
+import random
 import re
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from pathlib import Path
 
+from token_counter import estimate_tokens as _estimate_tokens
+
 _LOCK = threading.RLock()
 _LOCAL = threading.local()
 _PATCHED_PIPELINES = set()
@@ -40,6 +44,10 @@ DEFAULT_SETTINGS = {
     "minimum_candidate_chars": 28,
     "pending_context_ttl_ms": 25000,
     "stream_emit_chunk_size": 28,
+    "speculative_candidates": 1,
+    "speculative_evaluate_top": 1,
+    "speculative_temperature_spread": 0.3,
+    "optimistic_stream_enabled": False,
 }
 
 GENERIC_FILLER_PATTERNS = [
@@ -136,13 +144,6 @@ def _truncate(text, max_chars):
     return cut.strip()
 
 
-def _estimate_tokens(text):
-    raw = str(text or "")
-    if not raw.strip():
-        return 0
-    return max(1, int(round(len(raw) / 4)))
-
-
 def _safe_read_json(path):
     if not path.exists() or not path.is_file():
         return None
@@ -261,6 +262,10 @@ def _normalize_settings(raw):
     settings["minimum_candidate_chars"] = max(12, min(120, _parse_int(pick("minimum_candidate_chars"), DEFAULT_SETTINGS["minimum_candidate_chars"])))
     settings["pending_context_ttl_ms"] = max(2000, _parse_int(pick("pending_context_ttl_ms"), DEFAULT_SETTINGS["pending_context_ttl_ms"]))
     settings["stream_emit_chunk_size"] = max(8, min(120, _parse_int(pick("stream_emit_chunk_size"), DEFAULT_SETTINGS["stream_emit_chunk_size"])))
+    settings["speculative_candidates"] = max(1, min(6, _parse_int(pick("speculative_candidates"), DEFAULT_SETTINGS["speculative_candidates"])))
+    settings["speculative_evaluate_top"] = max(1, min(3, _parse_int(pick("speculative_evaluate_top"), DEFAULT_SETTINGS["speculative_evaluate_top"])))
+    settings["speculative_temperature_spread"] = max(0.0, min(1.0, _parse_float(pick("speculative_temperature_spread"), DEFAULT_SETTINGS["speculative_temperature_spread"])))
+    settings["optimistic_stream_enabled"] = _parse_bool(pick("optimistic_stream_enabled"), DEFAULT_SETTINGS["optimistic_stream_enabled"])
 
     raw_criteria = pick("criteria_json", "criteria", default=None)
     settings["criteria"] = _parse_criteria(raw_criteria)
@@ -1106,6 +1111,166 @@ def _run_evaluator(prompt_pipeline, request_fn, settings, base_payload, criteria
     return normalized
 
 
+def _speculative_candidate_count(prompt_pipeline, settings):
+    """Candidates per speculative round, capped by the pipeline's parallel request slots."""
+    requested = int(settings.get("speculative_candidates") or 1)
+    if requested < 2:
+        return 1
+    limit_fn = getattr(prompt_pipeline, "get_api_parallel_limit", None)
+    try:
+        limit = int(limit_fn()) if callable(limit_fn) else 1
+    except Exception:
+        limit = 1
+    return max(1, min(requested, limit))
+
+
+def _speculative_payloads(candidate_payload, count, settings):
+    base_temperature = _parse_float((candidate_payload or {}).get("temperature"), 0.7)
+    spread = float(settings.get("speculative_temperature_spread") or 0.0)
+    half = max(1, count // 2)
+    rng = random.Random()
+    payloads = []
+    for index in range(count):
+        # Candidate 0 keeps the configured temperature; the others fan out above and below it
+        step = (index + 1) // 2
+        offset = 0.0 if index == 0 else spread * (step / half) * (1.0 if index % 2 else -1.0)
+        variant = dict(candidate_payload or {})
+        variant["temperature"] = round(max(0.0, min(2.0, base_temperature + offset)), 3)
+        variant["seed"] = rng.randrange(1, 2 ** 31 - 1)
+        payloads.append(variant)
+    return payloads
+
+
+def _run_speculative_round(generate_fn, evaluate_fn, settings, candidate_payload, score_payload, criteria, count, token_room, generation_deadline, cancel_check, context, iteration):
+    """Generate `count` candidates at once, pre-score them all and send only the best to the evaluator.
+
+    Returns (candidate_text, evaluation, stats). The evaluation is unguarded like the sequential
+    path's, and is None when no candidate survived. `stats` carries the round's cost and latency counters.
+    """
+    started = time.monotonic()
+    hard_pass_score = float(settings.get("hard_pass_score") or 70.0)
+    evaluator_max_tokens = int(settings.get("evaluator_max_tokens") or DEFAULT_SETTINGS["evaluator_max_tokens"])
+    generation_cancel = _build_deadline_cancel_check(generation_deadline, cancel_check)
+
+    def _generate(index, variant):
+        begin = time.monotonic()
+        text, error = generate_fn(variant, generation_cancel)
+        text = "" if error else str(text or "")
+        return {
+            "index": index,
+            "temperature": variant.get("temperature"),
+            "seed": variant.get("seed"),
+            "latency_ms": int((time.monotonic() - begin) * 1000),
+            "token_estimate": _estimate_tokens(text) if text.strip() else 0,
+            "error": str(error) if error else ("" if text.strip() else "empty"),
+            "text": text,
+        }
+
+    rows = []
+    executor = ThreadPoolExecutor(max_workers=count, thread_name_prefix="validator-candidate")
+    try:
+        futures = [executor.submit(_generate, index, variant) for index, variant in enumerate(_speculative_payloads(candidate_payload, count, settings))]
+        # Requests watch the deadline themselves; the grace period only covers their shutdown
+        wait(futures, timeout=max(0.0, generation_deadline - time.monotonic()) + 0.5)
+        for index, future in enumerate(futures):
+            if future.done() and future.exception() is None:
+                rows.append(future.result())
+            else:
+                rows.append({"index": index, "latency_ms": None, "token_estimate": 0, "error": "deadline" if not future.done() else str(future.exception()), "text": ""})
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    generation_ms = int((time.monotonic() - started) * 1000)
+
+    ready = []
+    for row in rows:
+        if row["error"]:
+            continue
+        precheck = _deterministic_pre_evaluation(criteria, row["text"], score_payload, hard_pass_score)
+        guarded = _apply_quality_guards(precheck, row["text"], score_payload, settings=settings)
+        row["precheck_score"] = _normalize_candidate_score(guarded.get("total_score"), 0.0)
+        ready.append((row, precheck))
+    ready.sort(key=lambda pair: pair[0]["precheck_score"], reverse=True)
+
+    candidate_tokens = sum(row["token_estimate"] for row in rows)
+    slots = min(int(settings.get("speculative_evaluate_top") or 1), len(ready))
+    if evaluator_max_tokens > 0:
+        slots = min(slots, max(0, int(token_room) - candidate_tokens) // evaluator_max_tokens)
+
+    evaluation_started = time.monotonic()
+    evaluated = []
+    if slots > 0:
+        top = ready[:slots]
+        if len(top) == 1:
+            evaluated = [(top[0][0], evaluate_fn(top[0][0]["text"]))]
+        else:
+            executor = ThreadPoolExecutor(max_workers=len(top), thread_name_prefix="validator-evaluator")
+            try:
+                futures = [(row, executor.submit(evaluate_fn, row["text"])) for row, _ in top]
+                for row, future in futures:
+                    try:
+                        evaluated.append((row, future.result()))
+                    except Exception as exc:
+                        row["error"] = str(exc)
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+    evaluation_ms = int((time.monotonic() - evaluation_started) * 1000)
+
+    evaluator_calls = 0
+    ranked = []
+    for row, evaluation in evaluated:
+        if not evaluation.get("precheck_only"):
+            evaluator_calls += 1
+        guarded = _apply_quality_guards(evaluation, row["text"], score_payload, settings=settings)
+        row["evaluated"] = True
+        row["score"] = _normalize_candidate_score(guarded.get("total_score"), 0.0)
+        ranked.append((row["score"], row, evaluation))
+    if not ranked and ready:
+        row, precheck = ready[0]
+        ranked.append((row["precheck_score"], row, precheck))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+
+    best_row = ranked[0][1] if ranked else None
+    stats = {
+        "mode": "speculative",
+        "requests": count,
+        "succeeded": len(ready),
+        "evaluator_calls": evaluator_calls,
+        "candidate_tokens": candidate_tokens,
+        "evaluator_tokens": evaluator_calls * min(evaluator_max_tokens, max(20, evaluator_max_tokens // 2)),
+        "generation_ms": generation_ms,
+        "evaluation_ms": evaluation_ms,
+        "wall_ms": int((time.monotonic() - started) * 1000),
+        "selected_index": best_row["index"] if best_row else None,
+        "candidates": [{key: value for key, value in row.items() if key != "text"} for row in rows],
+    }
+    _debug(
+        context,
+        "speculative_round",
+        iteration=iteration,
+        requests=count,
+        succeeded=len(ready),
+        evaluator_calls=evaluator_calls,
+        selected_index=stats["selected_index"],
+        wall_ms=stats["wall_ms"],
+    )
+    if best_row is None:
+        return None, None, stats
+    return best_row["text"], ranked[0][2], stats
+
+
+def _speculative_error(stats):
+    for row in (stats or {}).get("candidates") or []:
+        if row.get("error") and row.get("error") != "empty":
+            return row["error"]
+    return None
+
+
+def _round_token_cost(candidate_text, stats):
+    if stats is None:
+        return _estimate_tokens(candidate_text)
+    return int(stats.get("candidate_tokens") or 0) + int(stats.get("evaluator_tokens") or 0)
+
+
 def _update_processing_status(chat_key, bot_name, chat_id, iteration, max_iterations, details=""):
     details_text = _truncate(str(details or ""), 520)
     _set_status(
@@ -1156,6 +1321,27 @@ def _validate_non_stream(prompt_pipeline, request_fn, settings, payload, cancel_
     last_iteration_score = None
     token_spent = 0
     reliable_evaluation_seen = False
+    speculative_count = _speculative_candidate_count(prompt_pipeline, local_settings)
+    speculative_stats = None
+    pre_evaluation = None
+
+    def _generate_candidate(candidate_payload, generation_cancel):
+        with _BypassValidator():
+            return request_fn(settings, candidate_payload, cancel_check=generation_cancel)
+
+    def _evaluate_candidate(text):
+        return _run_evaluator(
+            prompt_pipeline=prompt_pipeline,
+            request_fn=request_fn,
+            settings=local_settings,
+            base_payload=payload,
+            criteria=criteria,
+            candidate_text=text,
+            feedback_history=list(feedback_history),
+            cancel_check=_build_deadline_cancel_check(deadline, cancel_check),
+            context=validation_context,
+            remaining_budget_ms=_remaining_budget_ms(deadline),
+        )
 
     _prepare_temp_dir(temp_dir)
 
@@ -1165,9 +1351,14 @@ def _validate_non_stream(prompt_pipeline, request_fn, settings, payload, cancel_
         _update_processing_status(chat_key, bot_name, chat_id, 1, max_iterations, "Generating first candidate...")
         initial_payload = _build_initial_candidate_payload(payload, local_settings)
         generation_deadline = min(deadline, max(time.monotonic() + 0.25, deadline - (evaluator_reserved_ms / 1000.0)))
-        generation_cancel = _build_deadline_cancel_check(generation_deadline, cancel_check)
-        with _BypassValidator():
-            candidate_text, candidate_error = request_fn(settings, initial_payload, cancel_check=generation_cancel)
+        if speculative_count > 1:
+            candidate_text, pre_evaluation, speculative_stats = _run_speculative_round(
+                _generate_candidate, _evaluate_candidate, local_settings, initial_payload, payload, criteria,
+                speculative_count, max_token_budget - token_spent, generation_deadline, cancel_check, validation_context, 1,
+            )
+            candidate_error = None if candidate_text is not None else _speculative_error(speculative_stats)
+        else:
+            candidate_text, candidate_error = _generate_candidate(initial_payload, _build_deadline_cancel_check(generation_deadline, cancel_check))
         if candidate_error:
             _set_status(
                 chat_key,
@@ -1199,7 +1390,7 @@ def _validate_non_stream(prompt_pipeline, request_fn, settings, payload, cancel_
             )
             return None, "LLM returned an empty response."
 
-        token_spent += _estimate_tokens(candidate_text)
+        token_spent += _round_token_cost(candidate_text, speculative_stats)
 
         for iteration in range(1, max_iterations + 1):
             if cancel_check and cancel_check():
@@ -1225,9 +1416,14 @@ def _validate_non_stream(prompt_pipeline, request_fn, settings, payload, cancel_
                 _update_processing_status(chat_key, bot_name, chat_id, iteration, max_iterations, "Regenerating candidate with validator feedback...")
                 regen_payload = _build_regeneration_payload(payload, best_evaluation or {}, iteration, local_settings, previous_candidate=best_candidate)
                 generation_deadline = min(deadline, max(time.monotonic() + 0.2, deadline - (evaluator_reserved_ms / 1000.0)))
-                generation_cancel = _build_deadline_cancel_check(generation_deadline, cancel_check)
-                with _BypassValidator():
-                    candidate_text, candidate_error = request_fn(settings, regen_payload, cancel_check=generation_cancel)
+                if speculative_count > 1:
+                    candidate_text, pre_evaluation, speculative_stats = _run_speculative_round(
+                        _generate_candidate, _evaluate_candidate, local_settings, regen_payload, payload, criteria,
+                        speculative_count, max_token_budget - token_spent, generation_deadline, cancel_check, validation_context, iteration,
+                    )
+                    candidate_error = None if candidate_text is not None else _speculative_error(speculative_stats)
+                else:
+                    candidate_text, candidate_error = _generate_candidate(regen_payload, _build_deadline_cancel_check(generation_deadline, cancel_check))
                 if candidate_error:
                     stop_reason = "regeneration_error"
                     _debug(validation_context, "regeneration_error", iteration=iteration, error=candidate_error)
@@ -1235,10 +1431,14 @@ def _validate_non_stream(prompt_pipeline, request_fn, settings, payload, cancel_
                 if not str(candidate_text or "").strip():
                     stop_reason = "regeneration_empty"
                     break
-                token_spent += _estimate_tokens(candidate_text)
+                token_spent += _round_token_cost(candidate_text, speculative_stats)
 
             _update_processing_status(chat_key, bot_name, chat_id, iteration, max_iterations, "Scoring candidate against enabled criteria...")
-            if token_spent + evaluator_max_tokens > max_token_budget:
+            if pre_evaluation is not None:
+                # Scored inside the speculative round
+                evaluation = pre_evaluation
+                pre_evaluation = None
+            elif token_spent + evaluator_max_tokens > max_token_budget:
                 evaluation = _deterministic_pre_evaluation(
                     criteria=criteria,
                     candidate_text=candidate_text,
@@ -1291,9 +1491,11 @@ def _validate_non_stream(prompt_pipeline, request_fn, settings, payload, cancel_
                     "iteration": iteration,
                     "candidate": str(candidate_text),
                     "evaluation": evaluation,
+                    "speculative": speculative_stats,
                     "created_at": _now_iso(),
                 },
             )
+            speculative_stats = None
 
             if best_evaluation is None or score > _normalize_candidate_score(best_evaluation.get("total_score"), -1.0):
                 best_candidate = str(candidate_text)
@@ -1432,6 +1634,57 @@ def _collect_stream_text(stream_fn, settings, payload, cancel_check=None):
     return "".join(chunks), None
 
 
+def _live_red_flag(candidate_text):
+    if _count_meta_process_hits(candidate_text) > 0:
+        return "meta_process_narration"
+    if _count_generic_filler_hits(candidate_text) >= 2:
+        return "generic_filler"
+    return ""
+
+
+def _stream_live_candidate(stream_fn, settings, payload, cancel_check=None, check_every=28):
+    """Yield the first candidate as it arrives while re-running the cheap deterministic checks.
+
+    Returns (text, red_flag, error); a red flag stops the stream early.
+    """
+    chunks = []
+    checked_chars = 0
+    text_chars = 0
+    iterator = None
+    try:
+        with _BypassValidator():
+            iterator = iter(stream_fn(settings=settings, payload=payload, cancel_check=cancel_check))
+        while True:
+            # Bypass only around the pull; the consumer runs on this thread while we are suspended.
+            with _BypassValidator():
+                piece = next(iterator, None)
+            if piece is None:
+                break
+            if cancel_check and cancel_check():
+                return "".join(chunks), "", "Cancelled."
+            if not piece:
+                continue
+            chunks.append(piece)
+            text_chars += len(piece)
+            yield piece
+            if text_chars - checked_chars >= check_every:
+                checked_chars = text_chars
+                red_flag = _live_red_flag("".join(chunks))
+                if red_flag:
+                    return "".join(chunks), red_flag, None
+    except Exception as exc:
+        return "".join(chunks), "", str(exc)
+    finally:
+        close = getattr(iterator, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+    text = "".join(chunks)
+    return text, _live_red_flag(text), None
+
+
 def _chunk_text(text, chunk_size):
     raw = str(text or "")
     size = max(8, int(chunk_size or DEFAULT_SETTINGS["stream_emit_chunk_size"]))
@@ -1473,6 +1726,29 @@ def _validate_stream(prompt_pipeline, stream_fn, settings, payload, cancel_check
     last_iteration_score = None
     token_spent = 0
     reliable_evaluation_seen = False
+    speculative_count = _speculative_candidate_count(prompt_pipeline, local_settings)
+    speculative_stats = None
+    pre_evaluation = None
+    optimistic_stream = bool(local_settings.get("optimistic_stream_enabled"))
+    live_text = None
+    live_visible = False
+
+    def _generate_candidate(candidate_payload, generation_cancel):
+        return _collect_stream_text(stream_fn, settings, candidate_payload, cancel_check=generation_cancel)
+
+    def _evaluate_candidate(text):
+        return _run_evaluator(
+            prompt_pipeline=prompt_pipeline,
+            request_fn=getattr(prompt_pipeline, "_request_completion"),
+            settings=local_settings,
+            base_payload=payload,
+            criteria=criteria,
+            candidate_text=text,
+            feedback_history=list(feedback_history),
+            cancel_check=_build_deadline_cancel_check(deadline, cancel_check),
+            context=validation_context,
+            remaining_budget_ms=_remaining_budget_ms(deadline),
+        )
 
     _prepare_temp_dir(temp_dir)
 
@@ -1489,13 +1765,35 @@ def _validate_stream(prompt_pipeline, stream_fn, settings, payload, cancel_check
         _update_processing_status(chat_key, bot_name, chat_id, 1, max_iterations, "Generating first candidate...")
         initial_payload = _build_initial_candidate_payload(payload, local_settings)
         generation_deadline = min(deadline, max(time.monotonic() + 0.25, deadline - (evaluator_reserved_ms / 1000.0)))
-        generation_cancel = _build_deadline_cancel_check(generation_deadline, cancel_check)
-        candidate_text, candidate_error = _collect_stream_text(stream_fn, settings, initial_payload, cancel_check=generation_cancel)
+        if optimistic_stream:
+            # The draft is already on screen, so only the user may cut it short, not the latency budget.
+            live_text, red_flag, candidate_error = yield from _stream_live_candidate(
+                stream_fn, settings, initial_payload, cancel_check=cancel_check,
+                check_every=local_settings.get("stream_emit_chunk_size") or DEFAULT_SETTINGS["stream_emit_chunk_size"],
+            )
+            candidate_text = live_text
+            live_visible = bool(live_text)
+            if red_flag and not candidate_error:
+                pre_evaluation = _deterministic_pre_evaluation(
+                    criteria=criteria,
+                    candidate_text=candidate_text,
+                    payload=payload,
+                    hard_pass_score=float(local_settings.get("hard_pass_score") or 70.0),
+                )
+                _debug(validation_context, "optimistic_stream_red_flag", red_flag=red_flag, streamed_chars=len(live_text or ""))
+        elif speculative_count > 1:
+            candidate_text, pre_evaluation, speculative_stats = _run_speculative_round(
+                _generate_candidate, _evaluate_candidate, local_settings, initial_payload, payload, criteria,
+                speculative_count, max_token_budget - token_spent, generation_deadline, cancel_check, validation_context, 1,
+            )
+            candidate_error = None if candidate_text is not None else _speculative_error(speculative_stats)
+        else:
+            candidate_text, candidate_error = _generate_candidate(initial_payload, _build_deadline_cancel_check(generation_deadline, cancel_check))
         if candidate_error:
             raise RuntimeError(candidate_error)
         if not str(candidate_text or "").strip():
             raise RuntimeError("LLM returned an empty response.")
-        token_spent += _estimate_tokens(candidate_text)
+        token_spent += _round_token_cost(candidate_text, speculative_stats)
 
         for iteration in range(1, max_iterations + 1):
             if cancel_check and cancel_check():
@@ -1518,21 +1816,35 @@ def _validate_stream(prompt_pipeline, stream_fn, settings, payload, cancel_check
                 if remaining_ms <= evaluator_reserved_ms + 250:
                     stop_reason = "evaluator_budget_reserved"
                     break
+                if live_visible:
+                    # Retract the rejected draft now instead of leaving it readable while we regenerate.
+                    live_visible = False
+                    _debug(validation_context, "optimistic_stream_retracted", iteration=iteration - 1)
+                    yield {"type": "replace", "text": "", "reason": "validator_rejected"}
                 _update_processing_status(chat_key, bot_name, chat_id, iteration, max_iterations, "Regenerating candidate with validator feedback...")
                 regen_payload = _build_regeneration_payload(payload, best_evaluation or {}, iteration, local_settings, previous_candidate=best_candidate)
                 generation_deadline = min(deadline, max(time.monotonic() + 0.2, deadline - (evaluator_reserved_ms / 1000.0)))
-                generation_cancel = _build_deadline_cancel_check(generation_deadline, cancel_check)
-                candidate_text, candidate_error = _collect_stream_text(stream_fn, settings, regen_payload, cancel_check=generation_cancel)
+                if speculative_count > 1:
+                    candidate_text, pre_evaluation, speculative_stats = _run_speculative_round(
+                        _generate_candidate, _evaluate_candidate, local_settings, regen_payload, payload, criteria,
+                        speculative_count, max_token_budget - token_spent, generation_deadline, cancel_check, validation_context, iteration,
+                    )
+                    candidate_error = None if candidate_text is not None else _speculative_error(speculative_stats)
+                else:
+                    candidate_text, candidate_error = _generate_candidate(regen_payload, _build_deadline_cancel_check(generation_deadline, cancel_check))
                 if candidate_error:
                     stop_reason = "regeneration_error"
                     break
                 if not str(candidate_text or "").strip():
                     stop_reason = "regeneration_empty"
                     break
-                token_spent += _estimate_tokens(candidate_text)
+                token_spent += _round_token_cost(candidate_text, speculative_stats)
 
             _update_processing_status(chat_key, bot_name, chat_id, iteration, max_iterations, "Scoring candidate against enabled criteria...")
-            if token_spent + evaluator_max_tokens > max_token_budget:
+            if pre_evaluation is not None:
+                evaluation = pre_evaluation
+                pre_evaluation = None
+            elif token_spent + evaluator_max_tokens > max_token_budget:
                 evaluation = _deterministic_pre_evaluation(
                     criteria=criteria,
                     candidate_text=candidate_text,
@@ -1585,9 +1897,11 @@ def _validate_stream(prompt_pipeline, stream_fn, settings, payload, cancel_check
                     "iteration": iteration,
                     "candidate": str(candidate_text),
                     "evaluation": evaluation,
+                    "speculative": speculative_stats,
                     "created_at": _now_iso(),
                 },
             )
+            speculative_stats = None
 
             previous_best = _normalize_candidate_score((best_evaluation or {}).get("total_score"), -1.0)
             if best_evaluation is None or score > previous_best:
@@ -1684,6 +1998,12 @@ def _validate_stream(prompt_pipeline, stream_fn, settings, payload, cancel_check
             output_blocked=False,
         )
 
+        if live_visible:
+            # The accepted draft is already on screen; only resend it if final cleanup changed it.
+            if final_output != live_text:
+                yield {"type": "replace", "text": final_output, "reason": "validator_revised"}
+            return
+
         for piece in _chunk_text(final_output, local_settings.get("stream_emit_chunk_size")):
             if cancel_check and cancel_check():
                 return
@@ -1761,17 +2081,23 @@ def _install_prompt_patch(context):
             yield from original_stream(settings=settings, payload=payload, cancel_check=cancel_check)
             return
 
+        emitted = False
         try:
-            yield from _validate_stream(
+            for piece in _validate_stream(
                 prompt_pipeline=prompt_pipeline,
                 stream_fn=original_stream,
                 settings=settings,
                 payload=payload,
                 cancel_check=cancel_check,
                 validation_context=validation_context,
-            )
+            ):
+                emitted = True
+                yield piece
         except Exception as exc:
             _debug(validation_context, "validation_stream_wrapper_error", error=str(exc))
+            if emitted:
+                # An optimistic draft may already be on screen; clear it before the direct retry.
+                yield {"type": "replace", "text": "", "reason": "validator_error"}
             with _BypassValidator():
                 yield from original_stream(settings=settings, payload=payload, cancel_check=cancel_check)
 
@@ -19,6 +19,8 @@ Variable Tracking Module (Internal)
 - Use the latest tracked variable snapshot as factual context when relevant.
 - Prefer tracked values over guessed values if both exist.
 """.strip()
+MODULE_CONCURRENCY = "history_reader"
+MODULE_DEPENDS_ON = ()
 
 _LOCK = threading.RLock()
 _PATCHED_PIPELINES = set()
@@ -405,68 +407,23 @@ def _iter_message_candidates(content):
         yield {"name": name, "value": value}
 
 
-def _resolve_effective_content(payload):
-    if not isinstance(payload, dict):
-        return ""
-
-    role = str(payload.get("role") or "").strip().lower()
-    if role != "assistant":
-        return str(payload.get("content") or "")
-
-    variants = payload.get("variants")
-    if not isinstance(variants, list) or not variants:
-        return str(payload.get("content") or "")
-
-    selected_index = payload.get("selected_variant_index")
-    try:
-        selected_index = int(selected_index)
-    except Exception:
-        selected_index = len(variants) - 1
-
-    selected_index = max(0, min(selected_index, len(variants) - 1))
-    selected = variants[selected_index] if selected_index < len(variants) else None
-    if isinstance(selected, dict):
-        selected_content = str(selected.get("content") or "")
-        if selected_content.strip():
-            return selected_content
-
-    return str(payload.get("content") or "")
-
-
-def _load_iam_messages(chat_folder):
-    iam_dir = Path(chat_folder) / "IAM"
-    if not iam_dir.exists() or not iam_dir.is_dir():
-        return []
-
+def _load_iam_messages(context, chat_folder):
     rows = []
-    for iam_file in sorted(iam_dir.glob("*.txt"), key=lambda item: item.name.lower()):
-        payload = _safe_read_json(iam_file)
-        if not isinstance(payload, dict):
-            continue
-
-        role = str(payload.get("role") or "").strip().lower()
-        if role not in {"user", "assistant"}:
-            continue
-
-        content = _resolve_effective_content(payload)
-        if not str(content).strip():
+    prompt_pipeline = (context or {}).get("prompt_pipeline")
+    history = prompt_pipeline.module_history_messages(context, chat_folder) if prompt_pipeline is not None else []
+    for message in history:
+        content = str(message.get("content") or "")
+        if not content.strip():
             continue
 
-        order_value = payload.get("order")
-        try:
-            order_num = int(order_value)
-        except Exception:
-            order_num = 0
-
         rows.append({
-            "file": iam_file.name,
-            "role": role,
+            "file": message.get("file_name") or "",
+            "role": message.get("role"),
             "content": content,
-            "order": order_num,
-            "timestamp": str(payload.get("timestamp") or ""),
+            "order": int(message.get("order") or 0),
+            "timestamp": str(message.get("timestamp") or ""),
         })
 
-    rows.sort(key=lambda item: (item.get("order", 0), item.get("file", "")))
     return rows
 
 
@@ -721,7 +678,7 @@ def _execute_tracking(context):
         else:
             state["auto_tracking_enabled"] = bool(settings["auto_tracking_enabled"])
 
-        messages = _load_iam_messages(chat_path)
+        messages = _load_iam_messages(context, chat_path)
         selected = _select_latest_message(messages, track_assistant_messages=settings["track_assistant_messages"])
 
         meta = state.setdefault("_meta", {})
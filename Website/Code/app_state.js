@@ -20,6 +20,8 @@ let settingsDraft = {};
 let masonryResizeBound = false;
 const observedMasonryGrids = new WeakSet();
 let sectionLayoutResizeBound = false;
+// Mirrors BotManager.DEFAULT_DATASET_INJECTION_TOKEN_BUDGET; only used before the server value is known.
+const DEFAULT_DATASET_TOKEN_BUDGET = 1024;
 
 // Expose state to window for module access using getters
 Object.defineProperty(window, 'currentBotName', {
@@ -66,6 +68,11 @@ function estimateUiTokens(text) {
 	return Math.max(1, Math.ceil(raw.length / 4));
 }
 
+function normalizeDatasetTokenBudget(value) {
+	const parsed = Number.parseInt(value, 10);
+	return Number.isFinite(parsed) ? Math.max(0, parsed) : DEFAULT_DATASET_TOKEN_BUDGET;
+}
+
 function getCurrentGenerationMaxTokens() {
 	const draftValue = Number.parseInt((settingsDraft && settingsDraft.max_tokens), 10);
 	if (Number.isFinite(draftValue) && draftValue > 0) {
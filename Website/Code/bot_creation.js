@@ -442,6 +442,7 @@ function getEmptyBotCreationDraft() {
 		example_messages: '',
 		example_injection_threshold: 0,
 		dataset_injection_persistence: 6,
+		dataset_injection_token_budget: DEFAULT_DATASET_TOKEN_BUDGET,
 		cover_art: '',
 		icon_art: '',
 		cover_art_fit: { size: 100, x: 50, y: 50 },
@@ -473,6 +474,7 @@ function normalizeBotCreationDraft(raw) {
 		...draft,
 		active_dataset_id: normalizeDatasetSelection(draft?.active_dataset_id),
 		dataset_injection_persistence: Math.max(0, parseInt(draft?.dataset_injection_persistence, 10) || 6),
+		dataset_injection_token_budget: normalizeDatasetTokenBudget(draft?.dataset_injection_token_budget),
 		example_messages: `${draft?.example_messages ?? defaults.example_messages}`,
 		example_injection_threshold: Math.max(0, parseInt(draft?.example_injection_threshold, 10) || 0),
 		cover_art_fit: {
@@ -748,6 +750,7 @@ function updateCreationDraftFromForm() {
 	const exampleMessagesInput = document.getElementById('create-bot-example-messages');
 	const exampleThresholdInput = document.getElementById('create-bot-example-threshold');
 	const datasetPersistenceInput = document.getElementById('create-bot-dataset-injection-persistence');
+	const datasetTokenBudgetInput = document.getElementById('create-bot-dataset-token-budget');
 	const coverZoom = document.getElementById('create-cover-zoom');
 	const coverPosX = document.getElementById('create-cover-posX');
 	const coverPosY = document.getElementById('create-cover-posY');
@@ -778,6 +781,9 @@ function updateCreationDraftFromForm() {
 		const parsedPersistence = parseInt(datasetPersistenceInput.value, 10);
 		botCreationDraft.dataset_injection_persistence = Math.max(0, Number.isFinite(parsedPersistence) ? parsedPersistence : 6);
 	}
+	if (datasetTokenBudgetInput) {
+		botCreationDraft.dataset_injection_token_budget = normalizeDatasetTokenBudget(datasetTokenBudgetInput.value);
+	}
 	const datasetSelect = document.getElementById('create-bot-dataset');
 	if (datasetSelect) {
 		botCreationDraft.active_dataset_id = normalizeDatasetSelection(datasetSelect.value);
@@ -1065,6 +1071,7 @@ function cloneExistingBotIntoDraft(botName) {
 				prompt_order_enabled: normalizePromptOrderEnabled(bot.prompt_order_enabled),
 				active_dataset_id: '',
 				dataset_injection_persistence: Math.max(0, parseInt(bot.dataset_injection_persistence, 10) || 6),
+				dataset_injection_token_budget: normalizeDatasetTokenBudget(bot.dataset_injection_token_budget),
 				modules: normalizeModuleGroups(bot.modules),
 				module_settings: normalizeModuleSettings(bot.module_settings, availableModuleDefinitions),
 				example_messages: bot.example_messages || '',
@@ -1133,7 +1140,7 @@ function renderBotCreationView(advancedMode = false) {
 						<button type="button" class="action-btn" id="create-bot-add-iam-btn">Add Message</button>
 					</div>
 				</div>
-				${advancedMode ? `<div class="form-group"><label>Example Messages <span class="token-badge" id="create-example-token-count">0 tok</span></label><textarea id="create-bot-example-messages" class="text-input" rows="6">${botCreationDraft.example_messages || ''}</textarea><p style="margin-top:0.5rem;opacity:0.8;">Format with blocks starting at [Start], then lines like {{char}}: ... and {{user}}: ...</p></div><div class="form-group"><label>Example Injection Threshold</label><input type="number" id="create-bot-example-threshold" class="text-input" min="0" step="1" value="${Math.max(0, parseInt(botCreationDraft.example_injection_threshold, 10) || 0)}"><p style="margin-top:0.5rem;opacity:0.8;">0 = always inject. Values above 0 inject only for the first X user messages.</p></div><div class="form-group"><label>Dataset</label><label style="margin-top:0.5rem;display:block;opacity:0.85;">Injection persistance</label><input type="number" id="create-bot-dataset-injection-persistence" class="text-input" min="0" step="1" value="${Math.max(0, parseInt(botCreationDraft.dataset_injection_persistence, 10) || 6)}"><p style="margin-top:0.5rem;opacity:0.8;">Controls how many user turns dynamic dataset entries stay injected after a keyword trigger. Mentioning a keyword again resets the timer.</p></div>` : ''}
+				${advancedMode ? `<div class="form-group"><label>Example Messages <span class="token-badge" id="create-example-token-count">0 tok</span></label><textarea id="create-bot-example-messages" class="text-input" rows="6">${botCreationDraft.example_messages || ''}</textarea><p style="margin-top:0.5rem;opacity:0.8;">Format with blocks starting at [Start], then lines like {{char}}: ... and {{user}}: ...</p></div><div class="form-group"><label>Example Injection Threshold</label><input type="number" id="create-bot-example-threshold" class="text-input" min="0" step="1" value="${Math.max(0, parseInt(botCreationDraft.example_injection_threshold, 10) || 0)}"><p style="margin-top:0.5rem;opacity:0.8;">0 = always inject. Values above 0 inject only for the first X user messages.</p></div><div class="form-group"><label>Dataset</label><label style="margin-top:0.5rem;display:block;opacity:0.85;">Injection persistance</label><input type="number" id="create-bot-dataset-injection-persistence" class="text-input" min="0" step="1" value="${Math.max(0, parseInt(botCreationDraft.dataset_injection_persistence, 10) || 6)}"><p style="margin-top:0.5rem;opacity:0.8;">Controls how many user turns dynamic dataset entries stay injected after a keyword trigger. Mentioning a keyword again resets the timer.</p><label style="margin-top:0.5rem;display:block;opacity:0.85;">Injection token budget</label><input type="number" id="create-bot-dataset-token-budget" class="text-input" min="0" step="64" value="${normalizeDatasetTokenBudget(botCreationDraft.dataset_injection_token_budget)}"><p style="margin-top:0.5rem;opacity:0.8;">Maximum tokens of dataset context per reply. The strongest matches are kept when entries do not all fit. 0 = no limit.</p></div>` : ''}
 				${advancedMode ? `<div class="form-group"><label>Tabs</label><div class="prompt-tab-picker-list" id="create-prompt-tabs-list"></div></div><div class="form-group"><label>Prompt Order</label><div class="prompt-order-list" id="create-prompt-order-list"></div></div>` : ''}
 			</div>`;
 
@@ -1238,7 +1245,7 @@ function renderBotCreationView(advancedMode = false) {
 	}
 	refreshCreateDatasetOptions();
 
-	['create-bot-name', 'create-bot-description', 'create-bot-core', 'create-bot-scenario', 'create-bot-example-messages', 'create-bot-example-threshold', 'create-bot-dataset-injection-persistence', 'create-bot-dataset'].forEach(id => {
+	['create-bot-name', 'create-bot-description', 'create-bot-core', 'create-bot-scenario', 'create-bot-example-messages', 'create-bot-example-threshold', 'create-bot-dataset-injection-persistence', 'create-bot-dataset-token-budget', 'create-bot-dataset'].forEach(id => {
 		const input = document.getElementById(id);
 		if (input) {
 			const evt = input.tagName && input.tagName.toLowerCase() === 'select' ? 'change' : 'input';
@@ -1450,6 +1457,7 @@ function createBotFromDraft() {
 					module_settings: moduleSettingsPayload,
 					active_iam_set: normalizedIam.currentSet,
 					dataset_injection_persistence: Math.max(0, parseInt(draft.dataset_injection_persistence, 10) || 6),
+					dataset_injection_token_budget: normalizeDatasetTokenBudget(draft.dataset_injection_token_budget),
 					example_messages: draft.example_messages,
 					example_injection_threshold: Math.max(0, parseInt(draft.example_injection_threshold, 10) || 0)
 				})
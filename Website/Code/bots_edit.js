@@ -167,7 +167,7 @@ function renderBotEditor(bot, advancedMode) {
 						<button type="button" class="action-btn" id="bot-add-iam-btn">Add Message</button>
 					</div>
 				</div>
-				${advancedMode ? `<div class="form-group"><label>Example Messages <span class="token-badge" id="bot-example-token-count">0 tok</span></label><textarea id="bot-example-messages" class="text-input" rows="6">${bot.example_messages || ''}</textarea><p style="margin-top:0.5rem;opacity:0.8;">Format with blocks starting at [Start], then lines like {{char}}: ... and {{user}}: ...</p></div><div class="form-group"><label>Example Injection Threshold</label><input type="number" id="bot-example-threshold" class="text-input" min="0" step="1" value="${Math.max(0, parseInt(bot.example_injection_threshold, 10) || 0)}"><p style="margin-top:0.5rem;opacity:0.8;">0 = always inject. Values above 0 inject only for the first X user messages.</p></div><div class="form-group"><label>Dataset</label><label style="margin-top:0.5rem;display:block;opacity:0.85;">Injection persistance</label><input type="number" id="bot-dataset-injection-persistence" class="text-input" min="0" step="1" value="${Math.max(0, parseInt(bot.dataset_injection_persistence, 10) || 6)}"><p style="margin-top:0.5rem;opacity:0.8;">Controls how many user turns dynamic dataset entries stay injected after a keyword trigger. Mentioning a keyword again resets the timer.</p></div>` : ''}
+				${advancedMode ? `<div class="form-group"><label>Example Messages <span class="token-badge" id="bot-example-token-count">0 tok</span></label><textarea id="bot-example-messages" class="text-input" rows="6">${bot.example_messages || ''}</textarea><p style="margin-top:0.5rem;opacity:0.8;">Format with blocks starting at [Start], then lines like {{char}}: ... and {{user}}: ...</p></div><div class="form-group"><label>Example Injection Threshold</label><input type="number" id="bot-example-threshold" class="text-input" min="0" step="1" value="${Math.max(0, parseInt(bot.example_injection_threshold, 10) || 0)}"><p style="margin-top:0.5rem;opacity:0.8;">0 = always inject. Values above 0 inject only for the first X user messages.</p></div><div class="form-group"><label>Dataset</label><label style="margin-top:0.5rem;display:block;opacity:0.85;">Injection persistance</label><input type="number" id="bot-dataset-injection-persistence" class="text-input" min="0" step="1" value="${Math.max(0, parseInt(bot.dataset_injection_persistence, 10) || 6)}"><p style="margin-top:0.5rem;opacity:0.8;">Controls how many user turns dynamic dataset entries stay injected after a keyword trigger. Mentioning a keyword again resets the timer.</p><label style="margin-top:0.5rem;display:block;opacity:0.85;">Injection token budget</label><input type="number" id="bot-dataset-token-budget" class="text-input" min="0" step="64" value="${normalizeDatasetTokenBudget(bot.dataset_injection_token_budget)}"><p style="margin-top:0.5rem;opacity:0.8;">Maximum tokens of dataset context per reply. The strongest matches are kept when entries do not all fit. 0 = no limit.</p></div>` : ''}
 				${advancedMode ? `<div class="form-group"><label>Tabs</label><div class="prompt-tab-picker-list" id="prompt-tabs-list"></div></div><div class="form-group"><label>Prompt Order</label><div class="prompt-order-list" id="prompt-order-list"></div></div>` : ''}
 			</div>`;
 
@@ -392,6 +392,7 @@ function saveBotEdits(originalName) {
 	const exampleMessagesInput = document.getElementById('bot-example-messages');
 	const exampleThresholdInput = document.getElementById('bot-example-threshold');
 	const datasetPersistenceInput = document.getElementById('bot-dataset-injection-persistence');
+	const datasetTokenBudgetInput = document.getElementById('bot-dataset-token-budget');
 	const coverFit = readBotFitInputs('cover');
 	const iconFit = readBotFitInputs('icon');
 	if (!nameInput || !descInput || !coreInput || !scenarioInput) {
@@ -410,6 +411,7 @@ function saveBotEdits(originalName) {
 		active_iam_set: botEditorIamState.currentSet || DEFAULT_IAM_SET,
 		active_dataset_id: normalizeBotEditorDatasetId((document.getElementById('bot-dataset-select') || {}).value) || normalizeBotEditorDatasetId(currentBotInfo && currentBotInfo.active_dataset_id),
 		dataset_injection_persistence: Math.max(0, parseInt(datasetPersistenceInput ? datasetPersistenceInput.value : `${(currentBotInfo && currentBotInfo.dataset_injection_persistence) || 6}`, 10) || 6),
+		dataset_injection_token_budget: normalizeDatasetTokenBudget(datasetTokenBudgetInput ? datasetTokenBudgetInput.value : (currentBotInfo && currentBotInfo.dataset_injection_token_budget)),
 		example_messages: exampleMessagesInput ? exampleMessagesInput.value : '',
 		example_injection_threshold: Math.max(0, parseInt(exampleThresholdInput ? exampleThresholdInput.value : '0', 10) || 0)
 	};
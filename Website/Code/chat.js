@@ -5,6 +5,7 @@ function showLastChat() {
 let isGeneratingReply = false;
 let activeGenerationController = null;
 let activeGenerationToken = 0;
+let activeGenerationId = null;
 let isChatActionGenerating = false;
 let actionStreamingToken = 0;
 let activeChatActionController = null;
@@ -30,6 +31,12 @@ function getCurrentPersonaPayload() {
 	};
 }
 
+function beginGenerationId() {
+	const randomPart = Math.random().toString(36).slice(2, 10);
+	activeGenerationId = `gen-${Date.now().toString(36)}-${randomPart}`;
+	return activeGenerationId;
+}
+
 function postJson(url, payload, options = null) {
 	const fetchOptions = {
 		method: 'POST',
@@ -485,10 +492,15 @@ function stopMessageGeneration(force = false) {
 	syncGenerationUiLockState();
 	clearThinkingPlaceholder();
 	renderCurrentChat();
+	const stopPayload = { chat_id: currentChatId, bot_name: currentBotName };
+	if (activeGenerationId) {
+		stopPayload.generation_id = activeGenerationId;
+	}
+	activeGenerationId = null;
 	fetch('/api/stop-generation', {
 		method: 'POST',
 		headers: { 'Content-Type': 'application/json' },
-		body: JSON.stringify({ chat_id: currentChatId, bot_name: currentBotName })
+		body: JSON.stringify(stopPayload)
 	}).catch(() => {});
 }
 
@@ -598,6 +610,7 @@ function streamAssistantReplyFromBackend(text, generationToken) {
 		message: text,
 		chat_id: currentChatId,
 		bot_name: currentBotName,
+		generation_id: activeGenerationId,
 		...getCurrentPersonaPayload()
 	};
 
@@ -616,6 +629,8 @@ function streamAssistantReplyFromBackend(text, generationToken) {
 	let fullResponse = '';
 	let hasReceivedAnyChunk = false;
 	let chunkRenderChain = Promise.resolve();
+	// Bumped by a replace event so chunk renders still queued for the retracted text stop early.
+	let renderEpoch = 0;
 
 	const ensureAssistantMessage = () => {
 		if (assistantMessage) {
@@ -627,9 +642,9 @@ function streamAssistantReplyFromBackend(text, generationToken) {
 		renderCurrentChat();
 	};
 
-	const appendChunkProgressively = (part) => {
+	const appendChunkProgressively = (part, epoch = renderEpoch) => {
 		const chunkText = typeof part === 'string' ? part : String(part || '');
-		if (!chunkText) {
+		if (!chunkText || epoch !== renderEpoch) {
 			return Promise.resolve();
 		}
 		const total = chunkText.length;
@@ -641,7 +656,7 @@ function streamAssistantReplyFromBackend(text, generationToken) {
 		const assistantIndex = Math.max(0, currentChatMessages.length - 1);
 		return new Promise(resolve => {
 			const tick = () => {
-				if (generationToken !== activeGenerationToken) {
+				if (generationToken !== activeGenerationToken || epoch !== renderEpoch) {
 					resolve();
 					return;
 				}
@@ -675,7 +690,25 @@ function streamAssistantReplyFromBackend(text, generationToken) {
 			}
 			hasReceivedAnyChunk = true;
 			ensureAssistantMessage();
-			chunkRenderChain = chunkRenderChain.then(() => appendChunkProgressively(part));
+			const epoch = renderEpoch;
+			chunkRenderChain = chunkRenderChain.then(() => appendChunkProgressively(part, epoch));
+			return null;
+		}
+		if (type === 'replace') {
+			// The backend retracted what it streamed so far, e.g. a draft the validator rejected.
+			const part = typeof event.text === 'string' ? event.text : String(event.text || '');
+			hasReceivedAnyChunk = hasReceivedAnyChunk && Boolean(part);
+			ensureAssistantMessage();
+			renderEpoch += 1;
+			const epoch = renderEpoch;
+			chunkRenderChain = chunkRenderChain.then(() => {
+				fullResponse = '';
+				assistantMessage.content = '';
+				if (!updateMessageBubbleInDom(Math.max(0, currentChatMessages.length - 1), '', { clearThinking: true, keepAtBottom: true })) {
+					renderCurrentChat();
+				}
+				return appendChunkProgressively(part, epoch);
+			});
 			return null;
 		}
 		if (type === 'done') {
@@ -1033,6 +1066,9 @@ function runChatMessageAction(action, messageIndex, clientMessageCountOverride =
 		client_message_count: clientMessageCount,
 		...getCurrentPersonaPayload()
 	};
+	if (action === 'regenerate_message' || action === 'continue_message') {
+		payload.generation_id = beginGenerationId();
+	}
 	if (extraPayload && typeof extraPayload === 'object') {
 		Object.assign(payload, extraPayload);
 	}
@@ -1076,6 +1112,7 @@ function streamChatActionFromBackend(action, messageIndex, requestOptions = null
 		bot_name: currentBotName,
 		message_index: messageIndex,
 		client_message_count: clientMessageCount,
+		generation_id: beginGenerationId(),
 		...getCurrentPersonaPayload()
 	};
 
@@ -1088,6 +1125,7 @@ function streamChatActionFromBackend(action, messageIndex, requestOptions = null
 	let chunkRenderChain = Promise.resolve();
 	let progressiveQueueChars = 0;
 	let forceImmediateRender = false;
+	let renderEpoch = 0;
 
 	const getTargetMessage = () => {
 		if (!Array.isArray(currentChatMessages) || !Number.isInteger(targetIndex) || targetIndex < 0 || targetIndex >= currentChatMessages.length) {
@@ -1107,9 +1145,9 @@ function streamChatActionFromBackend(action, messageIndex, requestOptions = null
 		return true;
 	};
 
-	const appendChunkProgressively = (part) => {
+	const appendChunkProgressively = (part, epoch = renderEpoch) => {
 		const chunkText = typeof part === 'string' ? part : String(part || '');
-		if (!chunkText) {
+		if (!chunkText || epoch !== renderEpoch) {
 			return Promise.resolve();
 		}
 		if (forceImmediateRender || progressiveQueueChars > CHAT_ACTION_MAX_PROGRESSIVE_CHARS) {
@@ -1132,7 +1170,7 @@ function streamChatActionFromBackend(action, messageIndex, requestOptions = null
 		let previousCursor = 0;
 		return new Promise(resolve => {
 			const tick = () => {
-				if (localStreamingToken !== actionStreamingToken) {
+				if (localStreamingToken !== actionStreamingToken || epoch !== renderEpoch) {
 					progressiveQueueChars = Math.max(0, progressiveQueueChars - total);
 					resolve();
 					return;
@@ -1171,7 +1209,24 @@ function streamChatActionFromBackend(action, messageIndex, requestOptions = null
 				return null;
 			}
 			hasReceivedAnyChunk = true;
-			chunkRenderChain = chunkRenderChain.then(() => appendChunkProgressively(part));
+			const epoch = renderEpoch;
+			chunkRenderChain = chunkRenderChain.then(() => appendChunkProgressively(part, epoch));
+			return null;
+		}
+		if (type === 'replace') {
+			const part = typeof event.text === 'string' ? event.text : String(event.text || '');
+			hasReceivedAnyChunk = hasReceivedAnyChunk && Boolean(part);
+			renderEpoch += 1;
+			const epoch = renderEpoch;
+			chunkRenderChain = chunkRenderChain.then(() => {
+				fullResponse = '';
+				if (applyStreamTextToTarget()) {
+					if (!updateMessageBubbleInDom(targetIndex, baseText, { clearThinking: true, keepAtBottom: true })) {
+						renderCurrentChat();
+					}
+				}
+				return appendChunkProgressively(part, epoch);
+			});
 			return null;
 		}
 		if (type === 'done') {
@@ -2183,6 +2238,7 @@ function sendMessage() {
 	activeGenerationToken += 1;
 	const generationToken = activeGenerationToken;
 	activeGenerationController = new AbortController();
+	beginGenerationId();
 	const timestamp = new Date().toISOString();
 	addMessage(text, true, timestamp);
 	currentChatMessages = currentChatMessages || [];
@@ -2200,6 +2256,7 @@ function sendMessage() {
 			message: text,
 			chat_id: currentChatId,
 			bot_name: currentBotName,
+			generation_id: activeGenerationId,
 			...getCurrentPersonaPayload()
 		}, { signal: activeGenerationController.signal }).then(r => r.json());
 
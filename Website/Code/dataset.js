@@ -164,7 +164,7 @@ function datasetEntryRowMarkup(entry, index) {
 	const entryName = datasetEscapeHtml(`${entry?.name || ''}`);
 	const context = datasetEscapeHtml(`${entry?.context || ''}`);
 	const modeRaw = `${entry?.mode || 'static'}`.toLowerCase();
-	const mode = modeRaw === 'dynamic' || modeRaw === 'inactive' ? modeRaw : 'static';
+	const mode = ['dynamic', 'retrieval', 'inactive'].includes(modeRaw) ? modeRaw : 'static';
 	const keywords = Array.isArray(entry?.keywords) ? entry.keywords.join(', ') : `${entry?.keywords || ''}`;
 	return `
 		<div class="dataset-entry-row${isCollapsed ? ' collapsed' : ''}" data-entry-id="${datasetEscapeHtml(entryId)}" draggable="true">
@@ -193,10 +193,11 @@ function datasetEntryRowMarkup(entry, index) {
 						<select class="text-input dataset-entry-mode">
 							<option value="static" ${mode === 'static' ? 'selected' : ''}>Static</option>
 							<option value="dynamic" ${mode === 'dynamic' ? 'selected' : ''}>Dynamic</option>
+							<option value="retrieval" ${mode === 'retrieval' ? 'selected' : ''}>Retrieval</option>
 							<option value="inactive" ${mode === 'inactive' ? 'selected' : ''}>Inactive</option>
 						</select>
 					</div>
-					<div class="form-group dataset-entry-keywords-group${mode === 'dynamic' ? '' : ' is-inactive'}">
+					<div class="form-group dataset-entry-keywords-group${datasetModeUsesKeywords(mode) ? '' : ' is-inactive'}">
 						<label>Keywords</label>
 						<input type="text" class="text-input dataset-entry-keywords" value="${datasetEscapeHtml(keywords)}" placeholder="ai, hobby, weather">
 						<div class="dataset-entry-keywords-helper"></div>
@@ -219,7 +220,7 @@ function datasetEntryRowMarkup(entry, index) {
 function renderDatasetView() {
 	const scrollState = captureDatasetScrollState();
 	inputArea.classList.remove('visible');
-	chatHeader.innerHTML = '<div><div class="chat-title">Dataset</div><div class="chat-subtitle">Global static, dynamic, and inactive memory packs</div></div>';
+	chatHeader.innerHTML = '<div><div class="chat-title">Dataset</div><div class="chat-subtitle">Global static, dynamic, retrieval, and inactive memory packs</div></div>';
 	messagesContainer.innerHTML = `
 		<div class="bot-editor dataset-layout">
 			<div class="dataset-hero">
@@ -668,6 +669,11 @@ function bindEntryQualityHelpers(row) {
 	}
 }
 
+// Dynamic entries trigger on keywords; retrieval entries index them alongside the context.
+function datasetModeUsesKeywords(mode) {
+	return ['dynamic', 'retrieval'].includes(`${mode || ''}`.toLowerCase());
+}
+
 function bindEntryModeVisibilityEvents(row) {
 	const modeInput = row.querySelector('.dataset-entry-mode');
 	const keywordsGroup = row.querySelector('.dataset-entry-keywords-group');
@@ -677,10 +683,10 @@ function bindEntryModeVisibilityEvents(row) {
 	}
 
 	const applyVisibility = () => {
-		const isDynamic = `${modeInput.value || ''}`.toLowerCase() === 'dynamic';
-		keywordsGroup.classList.toggle('is-inactive', !isDynamic);
+		const usesKeywords = datasetModeUsesKeywords(modeInput.value);
+		keywordsGroup.classList.toggle('is-inactive', !usesKeywords);
 		if (keywordsInput) {
-			keywordsInput.disabled = !isDynamic;
+			keywordsInput.disabled = !usesKeywords;
 		}
 	};
 